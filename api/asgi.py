@@ -0,0 +1,8 @@
+from dotenv import load_dotenv
+
+from flask_app import create_app
+from flask_app.asgi import create_asgi_app
+
+
+load_dotenv()
+app = create_asgi_app(create_app())
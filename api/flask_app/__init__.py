@@ -4,9 +4,24 @@ from urllib.parse import quote_plus
 from flask import Flask
 from flask_cors import CORS
 
+from .activity import start_activity_writer
+from .archive import register_archiver
+from .attachments import register_attachments
+from .board_payload import register_board_payload
+from .cache import configure_payload_cache
+from .change_stream import register_change_stream
+from .connection_benchmark import register_connection_benchmark
 from .errors import register_error_handlers
 from .extensions import db
+from .guest_pool import start_guest_pool_provisioner
+from .idempotency import start_idempotency_key_cleanup
+from .memory_profile import register_memory_profiler
+from .reaper import register_reaper
+from .revocation import start_revocation_refresher
 from .routes import api
+from .slow_queries import configure_slow_query_log
+from .traffic import register_traffic_recorder
+from .webhooks import register_webhooks
 
 
 def _build_database_uri() -> str:
@@ -43,8 +58,24 @@ def create_app() -> Flask:
     register_error_handlers(app)
 
     app.register_blueprint(api)
+    register_traffic_recorder(app)
+    register_memory_profiler(app)
 
     with app.app_context():
+        configure_slow_query_log(app, db.engine)
         db.create_all()
 
+    configure_payload_cache()
+    start_activity_writer(app)
+    start_guest_pool_provisioner(app)
+    register_reaper(app)
+    register_archiver(app)
+    register_attachments(app)
+    register_board_payload(app)
+    start_idempotency_key_cleanup(app)
+    start_revocation_refresher(app)
+    register_webhooks(app)
+    register_change_stream(app)
+    register_connection_benchmark(app)
+
     return app
@@ -0,0 +1,294 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, g, has_request_context
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.orm import Session, attributes
+from sqlalchemy.orm.util import identity_key
+
+from . import metrics
+from .extensions import db
+from .models import Activity, Comment, Issue, utcnow
+
+
+ISSUE_TRACKED_FIELDS = [
+    "title",
+    "type",
+    "status",
+    "priority",
+    "listPosition",
+    "description",
+    "estimate",
+    "timeSpent",
+    "timeRemaining",
+    "reporterId",
+    "projectId",
+]
+COMMENT_TRACKED_FIELDS = ["body"]
+
+PENDING_ACTIVITY_KEY = "pending_activity"
+CHANGE_EVENTS_KEY = "change_events"
+
+
+def current_actor_id() -> Optional[int]:
+    if not has_request_context():
+        return None
+    user = getattr(g, "current_user", None)
+    if user is None:
+        return None
+    # Read the id from the identity key so an expired instance isn't refreshed mid-flush.
+    return inspect(user).identity[0]
+
+
+def _issue_project_id(session: Session, issue_id: int) -> Optional[int]:
+    issue = session.identity_map.get(identity_key(Issue, issue_id))
+    if issue is not None:
+        return issue.projectId
+    return session.connection().execute(select(Issue.projectId).where(Issue.id == issue_id)).scalar()
+
+
+def _user_ids(users) -> List[int]:
+    return sorted(user.id for user in users)
+
+
+def _event(entity: str, action: str, project_id: int, issue_id: int, **values) -> Dict[str, Any]:
+    return {
+        "entity": entity,
+        "action": action,
+        "field": values.get("field"),
+        "oldValue": values.get("oldValue"),
+        "newValue": values.get("newValue"),
+        "createdAt": utcnow(),
+        "projectId": project_id,
+        "issueId": issue_id,
+        "commentId": values.get("commentId"),
+        "userId": values.get("userId"),
+    }
+
+
+def _field_changes(instance, fields: List[str]):
+    for field in fields:
+        history = attributes.get_history(instance, field)
+        if not history.has_changes():
+            continue
+        old_value = history.deleted[0] if history.deleted else None
+        new_value = history.added[0] if history.added else None
+        if old_value != new_value:
+            yield field, old_value, new_value
+
+
+def collect_change_events(session: Session, actor_id: Optional[int]) -> List[Dict[str, Any]]:
+    """Turn the pending flush's new, dirty and deleted issues and comments into activity rows.
+
+    Must be called from `after_flush`, while attribute history still describes the flush.
+    """
+    events: List[Dict[str, Any]] = []
+
+    for instance in session.new:
+        if isinstance(instance, Issue):
+            events.append(_event("issue", "created", instance.projectId, instance.id, userId=actor_id))
+        elif isinstance(instance, Comment):
+            events.append(
+                _event(
+                    "comment",
+                    "created",
+                    _issue_project_id(session, instance.issueId),
+                    instance.issueId,
+                    commentId=instance.id,
+                    newValue=instance.body,
+                    userId=actor_id,
+                )
+            )
+
+    for instance in session.dirty:
+        if isinstance(instance, Issue):
+            for field, old_value, new_value in _field_changes(instance, ISSUE_TRACKED_FIELDS):
+                events.append(
+                    _event(
+                        "issue",
+                        "updated",
+                        instance.projectId,
+                        instance.id,
+                        field=field,
+                        oldValue=old_value,
+                        newValue=new_value,
+                        userId=actor_id,
+                    )
+                )
+
+            users_history = attributes.get_history(instance, "users")
+            if users_history.has_changes():
+                old_user_ids = _user_ids(users_history.unchanged + users_history.deleted)
+                new_user_ids = _user_ids(users_history.unchanged + users_history.added)
+                if old_user_ids != new_user_ids:
+                    events.append(
+                        _event(
+                            "issue",
+                            "updated",
+                            instance.projectId,
+                            instance.id,
+                            field="userIds",
+                            oldValue=old_user_ids,
+                            newValue=new_user_ids,
+                            userId=actor_id,
+                        )
+                    )
+        elif isinstance(instance, Comment):
+            for field, old_value, new_value in _field_changes(instance, COMMENT_TRACKED_FIELDS):
+                events.append(
+                    _event(
+                        "comment",
+                        "updated",
+                        _issue_project_id(session, instance.issueId),
+                        instance.issueId,
+                        commentId=instance.id,
+                        field=field,
+                        oldValue=old_value,
+                        newValue=new_value,
+                        userId=actor_id,
+                    )
+                )
+
+    for instance in session.deleted:
+        if isinstance(instance, Issue):
+            events.append(_event("issue", "deleted", instance.projectId, instance.id, userId=actor_id))
+        elif isinstance(instance, Comment):
+            events.append(
+                _event(
+                    "comment",
+                    "deleted",
+                    _issue_project_id(session, instance.issueId),
+                    instance.issueId,
+                    commentId=instance.id,
+                    userId=actor_id,
+                )
+            )
+
+    return events
+
+
+def flush_change_events(session: Session, flush_context, actor_id: Optional[int]) -> List[Dict[str, Any]]:
+    """`collect_change_events` for the current flush, computed once for every listener."""
+    events = flush_context.attributes.get(CHANGE_EVENTS_KEY)
+    if events is None:
+        events = flush_context.attributes[CHANGE_EVENTS_KEY] = collect_change_events(session, actor_id)
+    return events
+
+
+class ActivityWriter:
+    """Buffers activity rows in a bounded queue and inserts them in batches from a daemon thread."""
+
+    def __init__(self, app: Flask, max_pending: int, batch_size: int, flush_interval_seconds: float):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                metrics.increment("activity.dropped")
+                logging.warning("Activity buffer is full, dropping activity row")
+
+    def stop(self):
+        """Stop the writer thread and write out everything still buffered."""
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._drain()
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval_seconds)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _drain(self):
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(Activity), batch)
+                db.session.commit()
+                metrics.increment("activity.written", len(batch))
+            except Exception:
+                db.session.rollback()
+                metrics.increment("activity.failed", len(batch))
+                logging.exception("Failed to write %s activity rows", len(batch))
+
+
+_writer: Optional[ActivityWriter] = None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_activity(session: Session, flush_context):
+    if _writer is None:
+        return
+
+    actor_id = current_actor_id()
+    if actor_id is None:
+        return
+
+    events = flush_change_events(session, flush_context, actor_id)
+    if events:
+        session.info.setdefault(PENDING_ACTIVITY_KEY, []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_activity(session: Session):
+    rows = session.info.pop(PENDING_ACTIVITY_KEY, None)
+    if rows and _writer is not None:
+        _writer.submit(rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_activity(session: Session):
+    session.info.pop(PENDING_ACTIVITY_KEY, None)
+
+
+def start_activity_writer(app: Flask) -> ActivityWriter:
+    global _writer
+
+    _writer = ActivityWriter(
+        app,
+        max_pending=int(os.getenv("ACTIVITY_MAX_PENDING", "10000")),
+        batch_size=int(os.getenv("ACTIVITY_BATCH_SIZE", "500")),
+        flush_interval_seconds=int(os.getenv("ACTIVITY_FLUSH_INTERVAL_MS", "1000")) / 1000,
+    )
+    _writer.start()
+    return _writer
@@ -0,0 +1,333 @@
+"""Throughput, velocity, burndown, cycle time and estimate accuracy for a project.
+
+A project's issues are loaded as columns rather than rows: on Postgres one scan returns them
+as packed fixed-width binary records (`string_agg` of `int4send`/`timestamptz_send`), which
+NumPy views as arrays without creating a Python object per issue. Every report is then
+computed with array operations over all groups at once, so the cost does not depend on how
+many groups (assignees, types, priorities) there are.
+
+An issue's completion time is its `updatedAt` while its status is `done`, as in the archiver,
+and its cycle time runs from `createdAt` to that moment. Weekly buckets end at the next UTC
+midnight; burndown is the open estimate left at the end of each week.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select, text
+
+from .constants import ISSUE_PRIORITIES, ISSUE_STATUSES, ISSUE_TYPES
+from .extensions import db
+from .models import Issue, issue_users_user
+
+
+GROUP_BY_OPTIONS = {"project", "assignee", "type", "priority"}
+MAX_WEEKS = 104
+CYCLE_TIME_PERCENTILES = (50, 85, 95)
+
+TYPES = sorted(ISSUE_TYPES)
+STATUSES = sorted(ISSUE_STATUSES)
+PRIORITIES = sorted(ISSUE_PRIORITIES)
+DONE = STATUSES.index("done") + 1
+
+
+class IssueColumns:
+    """A project's issues as parallel arrays ordered by id; missing numbers are NaN.
+
+    `type`, `status` and `priority` hold 1-based positions in the sorted constant lists.
+    `assigneeIssues`/`assigneeUsers` are the assignment pairs, as row indexes into the arrays.
+    """
+
+    __slots__ = (
+        "id",
+        "createdAt",
+        "updatedAt",
+        "type",
+        "status",
+        "priority",
+        "estimate",
+        "timeSpent",
+        "assigneeIssues",
+        "assigneeUsers",
+    )
+
+
+# Each issue is packed into a fixed-width binary record; the text columns are grouped on
+# instead of being encoded per row, which is what makes the single scan cheap.
+_ISSUE_RECORDS_STATEMENT = text(
+    """
+    SELECT
+        i.type,
+        i.status,
+        i.priority,
+        string_agg(
+            int4send(i.id)
+            || timestamptz_send(i."createdAt")
+            || timestamptz_send(i."updatedAt")
+            || int4send(coalesce(i.estimate, -2147483648))
+            || int4send(coalesce(i."timeSpent", -2147483648)),
+            ''::bytea
+        ) AS records
+    FROM issue i
+    WHERE i."projectId" = :project_id
+    GROUP BY i.type, i.status, i.priority
+    """
+)
+
+_ASSIGNEE_RECORDS_STATEMENT = text(
+    """
+    SELECT string_agg(int4send(a."issueId") || int4send(a."userId"), ''::bytea) AS records
+    FROM issue_users_user a
+    JOIN issue i ON i.id = a."issueId"
+    WHERE i."projectId" = :project_id
+    """
+)
+
+ISSUE_RECORD = np.dtype(
+    [
+        ("id", ">i4"),
+        ("createdAt", ">i8"),
+        ("updatedAt", ">i8"),
+        ("estimate", ">i4"),
+        ("timeSpent", ">i4"),
+    ]
+)
+ASSIGNEE_RECORD = np.dtype([("issueId", ">i4"), ("userId", ">i4")])
+
+NULL_INTEGER = -2147483648
+# timestamptz_send counts microseconds from 2000-01-01 UTC.
+POSTGRES_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _nullable(values: np.ndarray) -> np.ndarray:
+    return np.where(values == NULL_INTEGER, np.nan, values.astype("f8"))
+
+
+def _load_columns_postgresql(project_id: int, include_assignees: bool) -> IssueColumns:
+    groups = db.session.execute(_ISSUE_RECORDS_STATEMENT, {"project_id": project_id}).all()
+
+    records = np.frombuffer(b"".join(group.records for group in groups), dtype=ISSUE_RECORD)
+    counts = [len(group.records) // ISSUE_RECORD.itemsize for group in groups]
+    order = np.argsort(records["id"], kind="stable")
+    records = records[order]
+
+    columns = IssueColumns()
+    columns.id = records["id"].astype("i8")
+    columns.createdAt = records["createdAt"] / 1e6 + POSTGRES_EPOCH
+    columns.updatedAt = records["updatedAt"] / 1e6 + POSTGRES_EPOCH
+    columns.estimate = _nullable(records["estimate"])
+    columns.timeSpent = _nullable(records["timeSpent"])
+    for name, options in (("type", TYPES), ("status", STATUSES), ("priority", PRIORITIES)):
+        codes = np.array([_position(options, getattr(group, name)) for group in groups], dtype="i8")
+        setattr(columns, name, np.repeat(codes, counts)[order])
+
+    assignees = None
+    if include_assignees:
+        assignees = db.session.execute(_ASSIGNEE_RECORDS_STATEMENT, {"project_id": project_id}).scalar()
+    pairs = np.frombuffer(assignees or b"", dtype=ASSIGNEE_RECORD)
+    columns.assigneeIssues = np.searchsorted(columns.id, pairs["issueId"].astype("i8"))
+    columns.assigneeUsers = pairs["userId"].astype("i8")
+    return columns
+
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _position(options: List[str], value: Any) -> int:
+    return options.index(value) + 1 if value in options else 0
+
+
+def _load_columns_generic(project_id: int, include_assignees: bool) -> IssueColumns:
+    rows = db.session.execute(
+        select(
+            Issue.id,
+            Issue.createdAt,
+            Issue.updatedAt,
+            Issue.type,
+            Issue.status,
+            Issue.priority,
+            Issue.estimate,
+            Issue.timeSpent,
+        )
+        .where(Issue.projectId == project_id)
+        .order_by(Issue.id)
+    ).all()
+    pairs = []
+    if include_assignees:
+        pairs = db.session.execute(
+            select(issue_users_user.c.issueId, issue_users_user.c.userId)
+            .join(Issue, Issue.id == issue_users_user.c.issueId)
+            .where(Issue.projectId == project_id)
+        ).all()
+
+    columns = IssueColumns()
+    columns.id = np.array([row.id for row in rows], dtype="i8")
+    columns.createdAt = np.array([_epoch(row.createdAt) for row in rows], dtype="f8")
+    columns.updatedAt = np.array([_epoch(row.updatedAt) for row in rows], dtype="f8")
+    columns.type = np.array([_position(TYPES, row.type) for row in rows], dtype="i8")
+    columns.status = np.array([_position(STATUSES, row.status) for row in rows], dtype="i8")
+    columns.priority = np.array([_position(PRIORITIES, row.priority) for row in rows], dtype="i8")
+    columns.estimate = np.array([row.estimate for row in rows], dtype="f8")
+    columns.timeSpent = np.array([row.timeSpent for row in rows], dtype="f8")
+    columns.assigneeIssues = np.searchsorted(columns.id, np.array([pair[0] for pair in pairs], dtype="i8"))
+    columns.assigneeUsers = np.array([pair[1] for pair in pairs], dtype="i8")
+    return columns
+
+
+def load_issue_columns(project_id: int, include_assignees: bool = True) -> IssueColumns:
+    """Load the project's issues; the assignment pairs, a second join, only when asked for."""
+    if db.engine.dialect.name == "postgresql":
+        columns = _load_columns_postgresql(project_id, include_assignees)
+    else:
+        columns = _load_columns_generic(project_id, include_assignees)
+    db.session.rollback()
+    return columns
+
+
+def _groups(columns: IssueColumns, group_by: str):
+    """Return (row indexes, group code per row, group keys); assignee groups repeat shared issues."""
+    count = len(columns.id)
+    if group_by == "assignee":
+        assigned = np.zeros(count, dtype=bool)
+        assigned[columns.assigneeIssues] = True
+        unassigned = np.flatnonzero(~assigned)
+        user_ids, codes = np.unique(columns.assigneeUsers, return_inverse=True)
+        rows = np.concatenate([columns.assigneeIssues, unassigned])
+        codes = np.concatenate([codes, np.full(len(unassigned), len(user_ids))])
+        return rows, codes, [int(user_id) for user_id in user_ids] + [None]
+
+    rows = np.arange(count)
+    if group_by == "project":
+        return rows, np.zeros(count, dtype="i8"), [None]
+
+    options = {"type": TYPES, "priority": PRIORITIES}[group_by]
+    # Unknown values (code 0) share a trailing `None` group.
+    codes = getattr(columns, group_by) - 1
+    codes = np.where(codes < 0, len(options), codes)
+    return rows, codes, [*options, None]
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _sorted_slices(values: np.ndarray, codes: np.ndarray, group_count: int):
+    """Yield each group's values in ascending order, sorting all groups in one pass."""
+    order = np.lexsort((values, codes))
+    sorted_values, sorted_codes = values[order], codes[order]
+    bounds = np.searchsorted(sorted_codes, np.arange(group_count + 1))
+    for group in range(group_count):
+        yield sorted_values[bounds[group] : bounds[group + 1]]
+
+
+def _per_week(codes: np.ndarray, buckets: np.ndarray, weeks: int, group_count: int, weights=None) -> np.ndarray:
+    inside = (buckets >= 0) & (buckets < weeks)
+    return np.bincount(
+        codes[inside] * weeks + buckets[inside],
+        weights=None if weights is None else weights[inside],
+        minlength=group_count * weeks,
+    ).reshape(group_count, weeks)
+
+
+def compute_analytics(columns: IssueColumns, group_by: str, weeks: int, now: datetime) -> Dict[str, Any]:
+    end = datetime(now.year, now.month, now.day, tzinfo=timezone.utc) + timedelta(days=1)
+    week_ends = np.array([(end - timedelta(weeks=weeks - index - 1)).timestamp() for index in range(weeks)])
+    week_starts = week_ends - timedelta(weeks=1).total_seconds()
+
+    rows, codes, keys = _groups(columns, group_by)
+    group_count = len(keys)
+
+    created = columns.createdAt[rows]
+    done = columns.status[rows] == DONE
+    done_at = np.where(done, columns.updatedAt[rows], np.inf)
+    estimate = columns.estimate[rows]
+    time_spent = columns.timeSpent[rows]
+    open_estimate = np.nan_to_num(estimate)
+
+    issues = np.bincount(codes, minlength=group_count)
+    done_count = np.bincount(codes, weights=done, minlength=group_count)
+
+    # Week of completion: the first week whose end is at or after `done_at`.
+    done_week = np.searchsorted(week_ends, done_at, side="left")
+    completed_in_window = done & (done_at > week_starts[0])
+    throughput = _per_week(codes[completed_in_window], done_week[completed_in_window], weeks, group_count)
+    velocity = _per_week(
+        codes[completed_in_window],
+        done_week[completed_in_window],
+        weeks,
+        group_count,
+        weights=open_estimate[completed_in_window],
+    )
+
+    # Open estimate at each week end: added from the week an issue was created, removed from
+    # the week it was done; a cumulative sum turns those steps into levels.
+    created_week = np.searchsorted(week_ends, created, side="left")
+    steps = _per_week(codes, created_week, weeks + 1, group_count, weights=open_estimate)
+    steps -= _per_week(codes, np.where(done, done_week, weeks), weeks + 1, group_count, weights=open_estimate)
+    burndown = np.cumsum(steps, axis=1)[:, :weeks]
+
+    cycle_hours = (done_at[done] - created[done]) / 3600
+    cycle_times = []
+    for values in _sorted_slices(cycle_hours, codes[done], group_count):
+        if len(values):
+            percentiles = np.percentile(values, CYCLE_TIME_PERCENTILES)
+            summary = {"mean": _round(values.mean())}
+            summary.update({f"p{p}": _round(value) for p, value in zip(CYCLE_TIME_PERCENTILES, percentiles)})
+        else:
+            summary = {"mean": None, **{f"p{p}": None for p in CYCLE_TIME_PERCENTILES}}
+        cycle_times.append(summary)
+
+    estimated = done & (estimate > 0) & ~np.isnan(time_spent)
+    ratio = time_spent[estimated] / estimate[estimated]
+    estimated_codes = codes[estimated]
+    samples = np.bincount(estimated_codes, minlength=group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        absolute_error = np.bincount(estimated_codes, weights=np.abs(ratio - 1), minlength=group_count) / samples
+        within = np.bincount(estimated_codes, weights=np.abs(ratio - 1) <= 0.2, minlength=group_count) / samples
+    median_ratio = [
+        _round(np.median(values)) if len(values) else None
+        for values in _sorted_slices(ratio, estimated_codes, group_count)
+    ]
+
+    groups = []
+    for index, key in enumerate(keys):
+        if not issues[index]:
+            continue
+        groups.append(
+            {
+                "key": key,
+                "issues": int(issues[index]),
+                "done": int(done_count[index]),
+                "throughput": [int(value) for value in throughput[index]],
+                "velocity": [_round(value) for value in velocity[index]],
+                "burndown": [_round(value) for value in burndown[index]],
+                "cycleTimeHours": cycle_times[index],
+                "estimateAccuracy": {
+                    "samples": int(samples[index]),
+                    "medianRatio": median_ratio[index],
+                    "meanAbsolutePercentError": _round(absolute_error[index] * 100),
+                    "withinTwentyPercent": _round(within[index], 3),
+                },
+            }
+        )
+
+    return {
+        "groupBy": group_by,
+        "weeks": weeks,
+        "weekEnds": [
+            datetime.fromtimestamp(value, timezone.utc).isoformat() for value in week_ends
+        ],
+        "groups": groups,
+    }
+
+
+def project_analytics(project_id: int, group_by: str, weeks: int, now: datetime) -> Dict[str, Any]:
+    columns = load_issue_columns(project_id, include_assignees=group_by == "assignee")
+    report = compute_analytics(columns, group_by, weeks, now)
+    if group_by == "project":
+        for group in report["groups"]:
+            group["key"] = project_id
+    return report
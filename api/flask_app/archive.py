@@ -0,0 +1,202 @@
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, literal, select
+
+from . import cache, metrics
+from .background import start_periodic_task
+from .extensions import db
+from .models import (
+    Comment,
+    Issue,
+    comment_archive,
+    issue_archive,
+    issue_users_user,
+    issue_users_user_archive,
+    utcnow,
+)
+
+
+def _settings() -> Dict[str, int]:
+    return {
+        "after_days": int(os.getenv("ISSUE_ARCHIVE_AFTER_DAYS", "30")),
+        "batch_size": int(os.getenv("ISSUE_ARCHIVE_BATCH_SIZE", "500")),
+        "batch_pause_ms": int(os.getenv("ISSUE_ARCHIVE_BATCH_PAUSE_MS", "100")),
+        "interval_ms": int(os.getenv("ISSUE_ARCHIVE_INTERVAL_MS", "0")),
+    }
+
+
+def _copy_rows(source, target, where, extra_values: Optional[Dict] = None):
+    extra_values = extra_values or {}
+    names = [column.name for column in source.columns]
+    selected = [*source.columns, *(literal(value) for value in extra_values.values())]
+    db.session.execute(
+        insert(target).from_select([*names, *extra_values], select(*selected).where(where))
+    )
+
+
+def _archive_issues(issue_ids: List[int]):
+    archived_at = utcnow()
+    _copy_rows(
+        Issue.__table__,
+        issue_archive,
+        Issue.id.in_(issue_ids),
+        {"archivedAt": archived_at},
+    )
+    _copy_rows(Comment.__table__, comment_archive, Comment.issueId.in_(issue_ids))
+    _copy_rows(issue_users_user, issue_users_user_archive, issue_users_user.c.issueId.in_(issue_ids))
+
+    db.session.execute(delete(issue_users_user).where(issue_users_user.c.issueId.in_(issue_ids)))
+    db.session.execute(
+        delete(Comment).where(Comment.issueId.in_(issue_ids)),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.execute(
+        delete(Issue).where(Issue.id.in_(issue_ids)),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def _restore_issue(issue_id: int):
+    live_issue_columns = [column.name for column in Issue.__table__.columns]
+    # Restoring counts as moving the issue, so the archiver leaves it alone for another period.
+    restored_at = literal(utcnow(), Issue.updatedAt.type).label("updatedAt")
+    db.session.execute(
+        insert(Issue.__table__).from_select(
+            live_issue_columns,
+            select(
+                *(
+                    restored_at if name == "updatedAt" else issue_archive.c[name]
+                    for name in live_issue_columns
+                )
+            ).where(issue_archive.c.id == issue_id),
+        )
+    )
+    _copy_rows(comment_archive, Comment.__table__, comment_archive.c.issueId == issue_id)
+    _copy_rows(
+        issue_users_user_archive,
+        issue_users_user,
+        issue_users_user_archive.c.issueId == issue_id,
+    )
+
+    db.session.execute(
+        delete(issue_users_user_archive).where(issue_users_user_archive.c.issueId == issue_id)
+    )
+    db.session.execute(delete(comment_archive).where(comment_archive.c.issueId == issue_id))
+    db.session.execute(delete(issue_archive).where(issue_archive.c.id == issue_id))
+
+
+def _invalidate(issues: List[Tuple[int, int]]):
+    # Set-based statements bypass the session events that invalidate cached payloads.
+    for issue_id, project_id in issues:
+        cache.invalidate("issue", issue_id)
+        cache.invalidate("project", project_id)
+
+
+def archive_done_issues(
+    older_than: timedelta,
+    batch_size: int,
+    max_batches: int = 0,
+    batch_pause_seconds: float = 0,
+) -> int:
+    """Move issues that have been done for longer than `older_than` into the archive tables.
+
+    `updatedAt` is used as the time the issue was last moved, so an issue that is edited
+    after being closed stays on the board for another `older_than`.
+    """
+    cutoff = utcnow() - older_than
+    archived = 0
+    batches = 0
+
+    while not max_batches or batches < max_batches:
+        issues = db.session.execute(
+            select(Issue.id, Issue.projectId)
+            .where(Issue.status == "done", Issue.updatedAt < cutoff)
+            .order_by(Issue.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+        if not issues:
+            db.session.rollback()
+            break
+
+        _archive_issues([issue_id for issue_id, _ in issues])
+        db.session.commit()
+        _invalidate(issues)
+
+        batches += 1
+        archived += len(issues)
+        metrics.increment("issue_archive.archived", len(issues))
+
+        if batch_pause_seconds > 0:
+            time.sleep(batch_pause_seconds)
+
+    return archived
+
+
+def unarchive_issue(issue_id: int, project_id: int) -> bool:
+    archived = db.session.execute(
+        select(issue_archive.c.id).where(
+            issue_archive.c.id == issue_id, issue_archive.c.projectId == project_id
+        )
+    ).first()
+    if not archived:
+        return False
+
+    _restore_issue(issue_id)
+    db.session.commit()
+    _invalidate([(issue_id, project_id)])
+    metrics.increment("issue_archive.restored")
+    return True
+
+
+def _archive_with_settings(settings: Dict[str, int]) -> int:
+    return archive_done_issues(
+        older_than=timedelta(days=settings["after_days"]),
+        batch_size=max(1, settings["batch_size"]),
+        batch_pause_seconds=settings["batch_pause_ms"] / 1000,
+    )
+
+
+def _run_scheduled(settings: Dict[str, int]):
+    archived = _archive_with_settings(settings)
+    if archived:
+        logging.info("Issue archiver: %s issues archived", archived)
+
+
+@click.command("archive-issues")
+@click.option("--after-days", type=int, default=None, help="Archive issues done for longer than this.")
+@click.option("--batch-size", type=int, default=None, help="Issues archived per transaction.")
+@with_appcontext
+def archive_issues_command(after_days, batch_size):
+    """Move old done issues into the archive tables."""
+    settings = _settings()
+    if after_days is not None:
+        settings["after_days"] = after_days
+    if batch_size is not None:
+        settings["batch_size"] = batch_size
+
+    click.echo(f"Archived {_archive_with_settings(settings)} issues.")
+
+
+def register_archiver(app: Flask) -> Optional[threading.Event]:
+    app.cli.add_command(archive_issues_command)
+
+    settings = _settings()
+    if settings["interval_ms"] <= 0:
+        return None
+
+    return start_periodic_task(
+        app,
+        "issue-archiver",
+        settings["interval_ms"] / 1000,
+        lambda: _run_scheduled(settings),
+    )
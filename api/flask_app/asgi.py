@@ -0,0 +1,230 @@
+"""ASGI serving mode for holding many long-lived connections.
+
+`GET /project/events` is answered on the event loop: the token is checked and the user
+loaded through an asyncpg-backed `AsyncSession`, and change notifications arrive over one
+asyncpg `LISTEN` connection per process. An idle stream therefore costs a socket and a queue
+instead of a thread. Every other request is handed to the Flask app unchanged through
+`a2wsgi`, which runs it on a pool of `ASGI_WSGI_THREADS` threads with the same routes,
+schemas, serializers and scoped sessions as the WSGI server.
+
+Run it with `uvicorn asgi:app` from the `api` directory.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from a2wsgi import WSGIMiddleware
+from flask import Flask
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from . import metrics
+from .auth import bearer_token, token_user_id, verify_token
+from .change_stream import (
+    CHANNEL,
+    HEARTBEAT,
+    LISTEN_RETRY_SECONDS,
+    STREAM_HEADERS,
+    AsyncSubscription,
+    ChangeBroadcaster,
+    heartbeat_seconds,
+    max_pending,
+)
+from .errors import ApiError, EntityNotFoundError, InvalidTokenError, error_body
+from .models import User
+from .revocation import might_be_revoked, record_revocation_check, revoked_token_select
+from .tenant import PROJECT_HEADER, membership_select, requested_project_id
+
+
+EVENTS_PATH = "/project/events"
+# What `CORS(app)` adds to the responses Flask serves.
+CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+
+
+def async_database_url(database_url) -> Tuple[Any, Dict[str, Any]]:
+    """The asyncpg form of a psycopg2 URL, and the connect arguments asyncpg names differently."""
+    url = make_url(database_url)
+    query = dict(url.query)
+    connect_args: Dict[str, Any] = {}
+    connect_timeout = query.pop("connect_timeout", None)
+    if connect_timeout:
+        connect_args["timeout"] = float(connect_timeout)
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+class AsgiApp:
+    def __init__(self, flask_app: Flask):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=int(os.getenv("ASGI_WSGI_THREADS", "16")))
+        self.broadcaster = ChangeBroadcaster()
+        self.engine: Optional[AsyncEngine] = None
+        self.sessions: Optional[async_sessionmaker] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == EVENTS_PATH and scope["method"] == "GET":
+            await self._stream_events(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as exc:
+                    logging.exception("ASGI startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        url, connect_args = async_database_url(self.flask_app.config["SQLALCHEMY_DATABASE_URI"])
+        self.engine = create_async_engine(url, connect_args=connect_args)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def shutdown(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    async def _listen(self):
+        """Relay notifications to the broadcaster, reconnecting whenever the connection drops."""
+
+        def relay(_connection, _pid, _channel, payload):
+            self.broadcaster.publish(payload)
+
+        while True:
+            try:
+                async with self.engine.connect() as connection:
+                    raw_connection = await connection.get_raw_connection()
+                    driver_connection = raw_connection.driver_connection
+                    closed = asyncio.get_running_loop().create_future()
+                    driver_connection.add_termination_listener(
+                        lambda _connection: closed.done() or closed.set_result(None)
+                    )
+                    await driver_connection.add_listener(CHANNEL, relay)
+                    try:
+                        await closed
+                    finally:
+                        if not driver_connection.is_closed():
+                            await driver_connection.remove_listener(CHANNEL, relay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Change listener lost its connection; reconnecting")
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    async def _authenticate(self, scope) -> Tuple[User, Optional[int]]:
+        """The token's user and the project selected with `X-Project-Id`, as `require_auth` checks them."""
+        headers = dict(scope["headers"])
+        token = bearer_token(headers.get(b"authorization", b"").decode("latin-1"))
+        if not token:
+            raise InvalidTokenError("Authentication token not found.")
+
+        payload = verify_token(token)
+        user_id = token_user_id(payload)
+
+        async with self.sessions() as session:
+            if might_be_revoked(payload["jti"]):
+                revoked = (await session.execute(revoked_token_select(payload["jti"]))).first() is not None
+                record_revocation_check(revoked)
+                if revoked:
+                    raise InvalidTokenError("Authentication token has been revoked.")
+
+            user = await session.get(User, user_id)
+            if not user:
+                raise InvalidTokenError("Authentication token is invalid: User not found.")
+
+            project_header = headers.get(PROJECT_HEADER.lower().encode("latin-1"), b"").decode("latin-1")
+            project_id = requested_project_id(project_header, user)
+            if project_id is None:
+                return user, user.projectId
+            if (await session.execute(membership_select(user.id, project_id))).first() is None:
+                raise EntityNotFoundError("Project")
+            return user, project_id
+
+    async def _stream_events(self, scope, receive, send):
+        try:
+            _user, project_id = await self._authenticate(scope)
+        except ApiError as error:
+            await _send_json(send, error.status, error_body(error))
+            return
+
+        subscription = self.broadcaster.subscribe(AsyncSubscription(project_id, max_pending()))
+        disconnected = asyncio.create_task(_wait_for_disconnect(receive))
+        interval = heartbeat_seconds()
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": _encode_headers(
+                        {"Content-Type": "text/event-stream; charset=utf-8", **STREAM_HEADERS, **CORS_HEADERS}
+                    ),
+                }
+            )
+            await send({"type": "http.response.body", "body": HEARTBEAT, "more_body": True})
+
+            received = asyncio.ensure_future(subscription.get())
+            while True:
+                done, _ = await asyncio.wait(
+                    {received, disconnected}, timeout=interval, return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected in done:
+                    break
+                payload = None
+                if received in done:
+                    payload = received.result()
+                    received = asyncio.ensure_future(subscription.get())
+                await send(
+                    {"type": "http.response.body", "body": subscription.event_for(payload), "more_body": True}
+                )
+            received.cancel()
+        except OSError:
+            metrics.increment("event_stream.send_failed")
+        finally:
+            disconnected.cancel()
+            self.broadcaster.unsubscribe(subscription)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def _encode_headers(headers: Dict[str, str]) -> List[Tuple[bytes, bytes]]:
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+
+
+async def _send_json(send, status: int, body: Dict[str, Any]):
+    data = json.dumps(body).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": _encode_headers(
+                {"Content-Type": "application/json", "Content-Length": str(len(data)), **CORS_HEADERS}
+            ),
+        }
+    )
+    await send({"type": "http.response.body", "body": data})
+
+
+def create_asgi_app(flask_app: Flask) -> AsgiApp:
+    return AsgiApp(flask_app)
@@ -0,0 +1,173 @@
+"""Issue attachments kept in a content-addressed store on local disk.
+
+Uploads are streamed from the request body to a temporary file in fixed-size chunks while
+being hashed, then moved to `<ATTACHMENT_STORAGE_DIR>/<sha256[:2]>/<sha256>`. A file that is
+already stored is not written twice: the new `attachment` row points at the existing blob.
+Blobs are never deleted with their rows, since other attachments may share them;
+`flask prune-attachments` removes the ones no row references any more.
+"""
+import os
+import tempfile
+import time
+from datetime import timedelta
+from hashlib import sha256
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from . import metrics
+from .errors import AttachmentTooLargeError
+from .extensions import db
+from .models import Attachment, Issue
+
+
+CHUNK_SIZE = 1024 * 1024
+# Unreferenced blobs younger than this may belong to an upload that has not committed yet.
+PRUNE_GRACE = timedelta(hours=1)
+
+
+def _settings() -> Dict[str, object]:
+    return {
+        "storage_dir": os.getenv("ATTACHMENT_STORAGE_DIR", "attachments"),
+        "max_bytes": int(os.getenv("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024))),
+    }
+
+
+class AttachmentStore:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.temp_dir = os.path.join(self.root, "tmp")
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def write(self, stream: BinaryIO, max_bytes: int) -> Tuple[str, int, bool]:
+        """Store the stream's contents; returns its sha256, its size and whether it was new."""
+        os.makedirs(self.temp_dir, exist_ok=True)
+        digest = sha256()
+        size = 0
+
+        handle, temp_path = tempfile.mkstemp(dir=self.temp_dir)
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise AttachmentTooLargeError(max_bytes)
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+
+            blob_path = self.path(digest.hexdigest())
+            if os.path.exists(blob_path):
+                # Touch it, so a prune running now treats the blob as recently written.
+                os.utime(blob_path)
+                return digest.hexdigest(), size, False
+
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(temp_path, blob_path)
+            return digest.hexdigest(), size, True
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def blobs(self) -> Iterator[Tuple[str, str]]:
+        for directory in os.scandir(self.root):
+            if not directory.is_dir() or len(directory.name) != 2:
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.is_file():
+                    yield entry.name, entry.path
+
+
+_store: Optional[AttachmentStore] = None
+
+
+def get_store() -> AttachmentStore:
+    global _store
+    if _store is None:
+        _store = AttachmentStore(str(_settings()["storage_dir"]))
+    return _store
+
+
+def save_attachment(
+    issue: Issue, stream: BinaryIO, filename: str, content_type: str, user_id: int
+) -> Attachment:
+    """Stream an upload into the store and record it on `issue`; the caller commits."""
+    digest, size, created = get_store().write(stream, int(_settings()["max_bytes"]))
+    metrics.increment("attachments.stored_bytes" if created else "attachments.deduplicated_bytes", size)
+
+    attachment = Attachment(
+        filename=filename,
+        contentType=content_type,
+        size=size,
+        sha256=digest,
+        issueId=issue.id,
+        projectId=issue.projectId,
+        userId=user_id,
+    )
+    db.session.add(attachment)
+    return attachment
+
+
+def attachment_path(attachment: Attachment) -> str:
+    return get_store().path(attachment.sha256)
+
+
+def prune_attachment_blobs(batch_size: int = 500) -> int:
+    """Delete stored blobs that no attachment row refers to."""
+    store = get_store()
+    if not os.path.isdir(store.root):
+        return 0
+
+    cutoff = time.time() - PRUNE_GRACE.total_seconds()
+    removed = 0
+    batch: List[Tuple[str, str]] = []
+
+    def prune(candidates: List[Tuple[str, str]]) -> int:
+        digests = [digest for digest, _ in candidates]
+        referenced = set(
+            db.session.execute(select(Attachment.sha256).where(Attachment.sha256.in_(digests))).scalars()
+        )
+        db.session.rollback()
+
+        count = 0
+        for digest, path in candidates:
+            if digest in referenced:
+                continue
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    count += 1
+            except FileNotFoundError:
+                pass
+        return count
+
+    for digest, path in store.blobs():
+        batch.append((digest, path))
+        if len(batch) >= batch_size:
+            removed += prune(batch)
+            batch = []
+    if batch:
+        removed += prune(batch)
+
+    metrics.increment("attachments.pruned", removed)
+    return removed
+
+
+@click.command("prune-attachments")
+@with_appcontext
+def prune_attachments_command():
+    """Remove stored attachment files that are no longer referenced."""
+    click.echo(f"Removed {prune_attachment_blobs()} unreferenced attachment files.")
+
+
+def register_attachments(app: Flask):
+    app.cli.add_command(prune_attachments_command)
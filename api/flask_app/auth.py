@@ -1,4 +1,5 @@
 import os
+import uuid
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from typing import Dict
@@ -8,47 +9,81 @@ from flask import g, request
 
 from .errors import InvalidTokenError
 from .models import User
+from .revocation import is_token_revoked
+from .tenant import PROJECT_HEADER, select_project
 
 
 JWT_ALGORITHM = "HS256"
 
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
 
-def sign_token(payload: Dict, expires_in_days: int = 180) -> str:
+
+def _access_token_ttl() -> timedelta:
+    return timedelta(minutes=int(os.getenv("ACCESS_TOKEN_TTL_MINUTES", "15")))
+
+
+def _refresh_token_ttl() -> timedelta:
+    return timedelta(days=int(os.getenv("REFRESH_TOKEN_TTL_DAYS", "180")))
+
+
+def _secret() -> str:
     secret = os.getenv("JWT_SECRET")
     if not secret:
         raise RuntimeError("JWT_SECRET must be set")
+    return secret
+
 
+def sign_token(payload: Dict, expires_in: timedelta, token_type: str = ACCESS_TOKEN) -> str:
     now = datetime.now(timezone.utc)
     complete_payload = {
         **payload,
+        "typ": token_type,
+        "jti": uuid.uuid4().hex,
         "iat": int(now.timestamp()),
-        "exp": int((now + timedelta(days=expires_in_days)).timestamp()),
+        "exp": int((now + expires_in).timestamp()),
     }
-    return jwt.encode(complete_payload, secret, algorithm=JWT_ALGORITHM)
+    return jwt.encode(complete_payload, _secret(), algorithm=JWT_ALGORITHM)
 
 
-def verify_token(token: str) -> Dict:
-    secret = os.getenv("JWT_SECRET")
-    if not secret:
-        raise RuntimeError("JWT_SECRET must be set")
+def issue_tokens(user_id: int) -> Dict[str, str]:
+    """A short-lived access token and the refresh token that renews it."""
+    subject = {"sub": str(user_id)}
+    return {
+        "authToken": sign_token(subject, _access_token_ttl(), ACCESS_TOKEN),
+        "refreshToken": sign_token(subject, _refresh_token_ttl(), REFRESH_TOKEN),
+    }
+
 
+def verify_token(token: str, token_type: str = ACCESS_TOKEN) -> Dict:
     try:
-        payload = jwt.decode(token, secret, algorithms=[JWT_ALGORITHM])
-        if isinstance(payload, dict):
-            return payload
-        raise InvalidTokenError()
+        payload = jwt.decode(token, _secret(), algorithms=[JWT_ALGORITHM])
     except jwt.InvalidTokenError as exc:
         raise InvalidTokenError() from exc
 
+    if not isinstance(payload, dict) or payload.get("typ") != token_type or not payload.get("jti"):
+        raise InvalidTokenError()
+    return payload
 
-def _get_auth_token_from_request() -> str | None:
-    header = request.headers.get("Authorization", "")
+
+def bearer_token(header: str) -> str | None:
     bearer, _, token = header.partition(" ")
     if bearer == "Bearer" and token:
         return token
     return None
 
 
+def _get_auth_token_from_request() -> str | None:
+    return bearer_token(request.headers.get("Authorization", ""))
+
+
+def token_user_id(payload: Dict) -> int:
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
+        raise InvalidTokenError("Authentication token is invalid.")
+
+
 def require_auth(handler):
     @wraps(handler)
     def wrapped(*args, **kwargs):
@@ -57,16 +92,18 @@ def require_auth(handler):
             raise InvalidTokenError("Authentication token not found.")
 
         payload = verify_token(token)
-        user_id = payload.get("sub")
+        user_id = token_user_id(payload)
 
-        if user_id is None:
-            raise InvalidTokenError("Authentication token is invalid.")
+        if is_token_revoked(payload["jti"]):
+            raise InvalidTokenError("Authentication token has been revoked.")
 
         user = User.query.get(user_id)
         if not user:
             raise InvalidTokenError("Authentication token is invalid: User not found.")
 
         g.current_user = user
+        g.token_payload = payload
+        g.project_id = select_project(request.headers.get(PROJECT_HEADER), user)
         return handler(*args, **kwargs)
 
     return wrapped
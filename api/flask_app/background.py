@@ -0,0 +1,32 @@
+import logging
+import threading
+from typing import Callable
+
+from flask import Flask
+
+
+def start_periodic_task(
+    app: Flask,
+    name: str,
+    interval_seconds: float,
+    task: Callable[[], None],
+) -> threading.Event:
+    """Run `task` inside an app context every `interval_seconds` on a daemon thread.
+
+    The task runs once immediately. Setting the returned event stops the loop.
+    """
+    stop = threading.Event()
+
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    task()
+                except Exception:
+                    logging.exception("Background task '%s' failed", name)
+            if stop.wait(interval_seconds):
+                return
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return stop
@@ -0,0 +1,236 @@
+"""The `GET /project` board document, built either by Postgres or by the Python serializers.
+
+On Postgres the whole document is assembled by one query and returned as text, so no
+records or intermediate dicts are created. Its output is the same bytes that
+`jsonify({"project": serialize_project(project, partial_issues=True)})` produces with the
+compact, sorted, ASCII-only encoding used outside debug mode; any other JSON settings, other
+databases, and list positions the two float formats would spell differently use the Python
+path. `BOARD_PAYLOAD_SOURCE=python` forces the Python path.
+"""
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+import click
+from flask import current_app, jsonify
+from flask.cli import with_appcontext
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import text
+
+from . import metrics
+from .errors import EntityNotFoundError
+from .extensions import db
+from .memory_profile import memory_phase
+from .read_models import load_project_record
+from .serializers import serialize_project
+
+
+# Characters json.dumps(ensure_ascii=True) escapes but Postgres leaves raw: non-ASCII and DEL.
+NON_ASCII_REGEX = re.compile(r"[^\x00-\x7e]")
+
+
+def _json(expression: str) -> str:
+    return f"coalesce(to_json({expression})::text, 'null')"
+
+
+def _timestamp(expression: str) -> str:
+    # Matches datetime.isoformat(): microseconds only when non-zero, offset as +HH:MM.
+    return (
+        f"coalesce('\"' || to_char({expression}, 'YYYY-MM-DD\"T\"HH24:MI:SS')"
+        f" || CASE WHEN date_part('microseconds', {expression})::bigint % 1000000 = 0"
+        f" THEN '' ELSE to_char({expression}, '.US') END"
+        f" || to_char({expression}, 'TZH:TZM') || '\"', 'null')"
+    )
+
+
+def _float(expression: str) -> str:
+    # float8 text drops the ".0" that repr() keeps on integral values.
+    return (
+        f"CASE WHEN {expression} = trunc({expression}) THEN {expression}::text || '.0'"
+        f" ELSE {expression}::text END"
+    )
+
+
+def _object(fields: List[tuple]) -> str:
+    parts = [f"'{{\"{fields[0][0]}\":' || {fields[0][1]}"]
+    parts.extend(f"',\"{name}\":' || {expression}" for name, expression in fields[1:])
+    return " || ".join(parts) + " || '}'"
+
+
+def _array(element: str, source: str, order_by: str) -> str:
+    return f"'[' || coalesce((SELECT string_agg({element}, ',' ORDER BY {order_by}) {source}), '') || ']'"
+
+
+@lru_cache(maxsize=1)
+def _board_statement():
+    # Keys are listed in sorted order, as the JSON provider writes them.
+    user = _object(
+        [
+            ("avatarUrl", _json('u."avatarUrl"')),
+            ("createdAt", _timestamp('u."createdAt"')),
+            ("email", _json("u.email")),
+            ("id", "u.id::text"),
+            ("name", _json("u.name")),
+            ("projectId", "coalesce(u.\"projectId\"::text, 'null')"),
+            ("updatedAt", _timestamp('u."updatedAt"')),
+        ]
+    )
+    assignee_ids = _array(
+        'a."userId"::text', 'FROM issue_users_user a WHERE a."issueId" = i.id', 'a."userId"'
+    )
+    issue = _object(
+        [
+            ("createdAt", _timestamp('i."createdAt"')),
+            ("id", "i.id::text"),
+            ("listPosition", _float('i."listPosition"')),
+            ("priority", _json("i.priority")),
+            ("status", _json("i.status")),
+            ("title", _json("i.title")),
+            ("type", _json("i.type")),
+            ("updatedAt", _timestamp('i."updatedAt"')),
+            ("userIds", assignee_ids),
+            ("version", "i.version::text"),
+        ]
+    )
+    project = _object(
+        [
+            ("category", _json("p.category")),
+            ("createdAt", _timestamp('p."createdAt"')),
+            ("description", _json("p.description")),
+            ("id", "p.id::text"),
+            ("issues", _array(issue, 'FROM issue i WHERE i."projectId" = p.id', "i.id")),
+            ("name", _json("p.name")),
+            ("updatedAt", _timestamp('p."updatedAt"')),
+            ("url", _json("p.url")),
+            (
+                "users",
+                _array(
+                    user,
+                    'FROM project_member m JOIN "user" u ON u.id = m."userId" WHERE m."projectId" = p.id',
+                    "u.id",
+                ),
+            ),
+            ("version", "p.version::text"),
+        ]
+    )
+    # Outside [1e-4, 1e15) repr() and float8 text disagree on when to use exponent notation.
+    positions_comparable = (
+        'SELECT coalesce(bool_and(i."listPosition" = 0'
+        ' OR (abs(i."listPosition") >= 1e-4 AND abs(i."listPosition") < 1e15)), true)'
+        ' FROM issue i WHERE i."projectId" = p.id'
+    )
+    return text(
+        f"SELECT '{{\"project\":' || {project} || '}}' AS body, ({positions_comparable}) AS comparable"
+        " FROM project p WHERE p.id = :project_id"
+    )
+
+
+def _escape_non_ascii(match: re.Match) -> str:
+    code = ord(match.group(0))
+    if code > 0xFFFF:
+        code -= 0x10000
+        return f"\\u{0xD800 | (code >> 10):04x}\\u{0xDC00 | (code & 0x3FF):04x}"
+    return f"\\u{code:04x}"
+
+
+def _database_encoding_matches() -> bool:
+    provider = current_app.json
+    if not isinstance(provider, DefaultJSONProvider):
+        return False
+    indented = provider.compact is False or (provider.compact is None and current_app.debug)
+    return provider.sort_keys and provider.ensure_ascii and not indented
+
+
+def can_build_in_database() -> bool:
+    return (
+        os.getenv("BOARD_PAYLOAD_SOURCE", "auto") != "python"
+        and db.engine.dialect.name == "postgresql"
+        and _database_encoding_matches()
+    )
+
+
+def build_board_payload_in_database(project_id: int) -> Optional[bytes]:
+    """Return the board document built by Postgres, or None when the Python path must be used."""
+    with memory_phase("load"):
+        row = db.session.execute(_board_statement(), {"project_id": project_id}).first()
+
+    if row is None:
+        raise EntityNotFoundError("Project")
+    if not row.comparable:
+        return None
+
+    with memory_phase("encode"):
+        return (NON_ASCII_REGEX.sub(_escape_non_ascii, row.body) + "\n").encode("ascii")
+
+
+def build_board_payload_in_python(project_id: int) -> bytes:
+    with memory_phase("load"):
+        project = load_project_record(project_id)
+
+    if not project:
+        raise EntityNotFoundError("Project")
+
+    with memory_phase("serialize"):
+        payload = {"project": serialize_project(project, partial_issues=True)}
+    with memory_phase("encode"):
+        return jsonify(payload).get_data()
+
+
+def load_board_payload(project_id: int) -> bytes:
+    if can_build_in_database():
+        body = build_board_payload_in_database(project_id)
+        if body is not None:
+            metrics.increment("board_payload.database")
+            return body
+
+    metrics.increment("board_payload.python")
+    return build_board_payload_in_python(project_id)
+
+
+def _time_builds(build: Callable[[], Optional[bytes]], iterations: int) -> List[float]:
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        build()
+        durations.append((time.perf_counter() - started) * 1000)
+    return sorted(durations)
+
+
+@click.command("benchmark-board")
+@click.option("--project-id", type=int, required=True, help="Project whose board is built.")
+@click.option("--iterations", type=int, default=50, show_default=True)
+@with_appcontext
+def benchmark_board_command(project_id, iterations):
+    """Compare the database-built and Python-built board documents for size, equality and speed."""
+    iterations = max(1, iterations)
+    with current_app.test_request_context():
+        python_body = build_board_payload_in_python(project_id)
+        builders = {"python": lambda: build_board_payload_in_python(project_id)}
+
+        if db.engine.dialect.name != "postgresql":
+            click.echo("Database-side assembly needs Postgres; timing the Python path only.")
+        elif not _database_encoding_matches():
+            click.echo("The app's JSON settings are not compact/sorted/ASCII; timing the Python path only.")
+        else:
+            database_body = build_board_payload_in_database(project_id)
+            if database_body is None:
+                click.echo("List positions fall outside the comparable range; timing the Python path only.")
+            elif database_body != python_body:
+                raise click.ClickException("Database and Python board documents differ.")
+            else:
+                click.echo(f"Documents are identical ({len(python_body)} bytes).")
+                builders["database"] = lambda: build_board_payload_in_database(project_id)
+
+        for name, build in builders.items():
+            durations = _time_builds(build, iterations)
+            click.echo(
+                f"{name:>8}: mean {sum(durations) / len(durations):8.2f} ms  "
+                f"p50 {durations[len(durations) // 2]:8.2f} ms  "
+                f"p95 {durations[min(len(durations) - 1, int(len(durations) * 0.95))]:8.2f} ms"
+            )
+
+
+def register_board_payload(app):
+    app.cli.add_command(benchmark_board_command)
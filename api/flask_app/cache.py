@@ -0,0 +1,254 @@
+"""Cache of serialized response bodies for issue and project reads.
+
+Entries are grouped by entity and keyed by a version token. Committing a change to an entity
+swaps its token and drops the entity's entries, variants included. Tokens and bodies are
+kept in `PAYLOAD_CACHE_SHARED_DIR`, shared by every worker on the host (standing in for a
+networked cache), so a commit in one worker invalidates the entry for all of them; each
+worker also keeps an LRU of the bodies it served, looked up under the shared token.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from hashlib import sha1
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+from . import metrics
+from .memory_profile import is_profiling
+from .models import Attachment, Comment, Issue, Project, User
+
+
+PENDING_INVALIDATIONS_KEY = "pending_cache_invalidations"
+VERSIONS_GROUP = "versions"
+
+
+class LRUCache:
+    """Thread-safe LRU of byte strings, bounded by the total size of the stored values.
+
+    Each entry belongs to a group, and `delete_group` drops all of a group's entries.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._groups: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, group: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get((group, key))
+            if value is not None:
+                self._entries.move_to_end((group, key))
+            return value
+
+    def set(self, group: str, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(group, key)
+            self._entries[(group, key)] = value
+            self._groups.setdefault(group, set()).add(key)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._pop(*next(iter(self._entries)))
+
+    def delete_group(self, group: str):
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._pop(group, key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self.size = 0
+
+    def _pop(self, group: str, key: str):
+        value = self._entries.pop((group, key), None)
+        if value is None:
+            return
+        self.size -= len(value)
+        keys = self._groups[group]
+        keys.discard(key)
+        if not keys:
+            del self._groups[group]
+
+
+class FileCacheStore:
+    """Shared tier kept as one file per key, in one directory per group."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _group_path(self, group: str) -> str:
+        return os.path.join(self.directory, sha1(group.encode("utf-8")).hexdigest())
+
+    def _path(self, group: str, key: str) -> str:
+        return os.path.join(self._group_path(group), sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, group: str, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(group, key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, group: str, key: str, value: bytes):
+        group_path = self._group_path(group)
+        try:
+            os.makedirs(group_path, exist_ok=True)
+            descriptor, temp_path = tempfile.mkstemp(dir=group_path)
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(value)
+            os.replace(temp_path, self._path(group, key))
+        except FileNotFoundError:
+            # The group was deleted while writing; the entry would have been stale anyway.
+            pass
+
+    def delete_group(self, group: str):
+        shutil.rmtree(self._group_path(group), ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+
+class PayloadCache:
+    def __init__(self, max_bytes: int, shared: FileCacheStore):
+        self.local = LRUCache(max_bytes)
+        self.shared = shared
+        self._hits = 0
+        self._misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _version(self, entity_key: str) -> str:
+        version = self.shared.get(VERSIONS_GROUP, entity_key)
+        return version.decode("ascii") if version else "0"
+
+    def _record(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            ratio = self._hits / (self._hits + self._misses)
+        metrics.increment("payload_cache.hits" if hit else "payload_cache.misses")
+        metrics.set_gauge("payload_cache.hit_ratio", ratio)
+        metrics.set_gauge("payload_cache.local_bytes", self.local.size)
+
+    def get_or_load(
+        self, kind: str, entity_id: int, load: Callable[[], bytes], variant: str = ""
+    ) -> bytes:
+        entity_key = f"{kind}:{entity_id}"
+        # Read the version before loading so a concurrent commit can only orphan the new entry.
+        key = f"{variant}@{self._version(entity_key)}"
+
+        value = self.local.get(entity_key, key)
+        if value is None:
+            value = self.shared.get(entity_key, key)
+            if value is not None:
+                self.local.set(entity_key, key, value)
+
+        if value is not None:
+            self._record(hit=True)
+            return value
+
+        self._record(hit=False)
+        value = load()
+        self.local.set(entity_key, key, value)
+        self.shared.set(entity_key, key, value)
+        return value
+
+    def invalidate(self, kind: str, entity_id: int):
+        entity_key = f"{kind}:{entity_id}"
+        self.shared.set(VERSIONS_GROUP, entity_key, uuid.uuid4().hex.encode("ascii"))
+        self.shared.delete_group(entity_key)
+        # Other workers' copies are keyed by the old version and age out of their LRUs.
+        self.local.delete_group(entity_key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+_cache: Optional[PayloadCache] = None
+
+
+def cached_payload(kind: str, entity_id: int, load: Callable[[], bytes], variant: str = "") -> bytes:
+    """`variant` caches another body derived from the same entity, invalidated along with it."""
+    # Profiled requests always load, so their report covers the query and serialization.
+    if _cache is None or is_profiling():
+        return load()
+    return _cache.get_or_load(kind, entity_id, load, variant)
+
+
+def invalidate(kind: str, entity_id: int):
+    if _cache is not None:
+        _cache.invalidate(kind, entity_id)
+
+
+def clear():
+    """Drop every entry, for when ids can be reused (the test database reset)."""
+    if _cache is not None:
+        _cache.clear()
+
+
+def _affected_entities(session: Session) -> Set[Tuple[str, int]]:
+    affected: Set[Tuple[str, int]] = set()
+
+    for instance in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(instance, Issue):
+            affected.add(("issue", instance.id))
+            project_ids = attributes.get_history(instance, "projectId").sum()
+            affected.update(("project", project_id) for project_id in project_ids if project_id)
+        elif isinstance(instance, Comment):
+            issue_ids = attributes.get_history(instance, "issueId").sum()
+            affected.update(("issue", issue_id) for issue_id in issue_ids if issue_id)
+        elif isinstance(instance, Attachment):
+            affected.add(("issue", instance.issueId))
+        elif isinstance(instance, Project):
+            affected.add(("project", instance.id))
+        elif isinstance(instance, User) and instance.projectId:
+            affected.add(("project", instance.projectId))
+
+    return affected
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_invalidations(session: Session, _flush_context):
+    if _cache is None:
+        return
+    session.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).update(_affected_entities(session))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session):
+    for kind, entity_id in session.info.pop(PENDING_INVALIDATIONS_KEY, ()):
+        invalidate(kind, entity_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session):
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+
+
+def configure_payload_cache() -> Optional[PayloadCache]:
+    global _cache
+
+    max_bytes = int(os.getenv("PAYLOAD_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    shared_dir = os.getenv("PAYLOAD_CACHE_SHARED_DIR", "")
+    # Off without a shared directory: versions kept per worker would only be swapped in the
+    # worker that committed, and the others would keep serving the old bodies.
+    if max_bytes <= 0 or not shared_dir:
+        _cache = None
+        return None
+
+    _cache = PayloadCache(max_bytes, FileCacheStore(shared_dir))
+    return _cache
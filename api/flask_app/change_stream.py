@@ -0,0 +1,304 @@
+"""Live notifications of issue and comment changes, streamed as server-sent events.
+
+The flush that changes an issue or comment also runs `pg_notify('project_changes', ...)`,
+so Postgres delivers the notification only if the transaction commits. Each worker holds one
+`LISTEN` connection and fans notifications out to the clients of `GET /project/events` that
+belong to the changed project. Notifications name what changed, not its new values: clients
+re-read what they display. A client that falls more than `EVENT_STREAM_MAX_PENDING`
+notifications behind gets a single `reset` event instead and should reload the project.
+
+Under the WSGI server every open stream occupies a worker thread; `flask_app.asgi` serves the
+same endpoint from an event loop, where an idle stream costs a socket and a queue.
+Postgres only: with other databases the stream carries nothing but heartbeats.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import select as select_module
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from flask import Flask
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from . import metrics
+from .activity import current_actor_id, flush_change_events
+from .extensions import db
+
+
+CHANNEL = "project_changes"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+MAX_NOTIFY_BYTES = 7900
+LISTEN_RETRY_SECONDS = 1.0
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Keep nginx from buffering the stream.
+    "X-Accel-Buffering": "no",
+}
+HEARTBEAT = b": keep-alive\n\n"
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        "heartbeat_ms": int(os.getenv("EVENT_STREAM_HEARTBEAT_MS", "15000")),
+        "max_pending": int(os.getenv("EVENT_STREAM_MAX_PENDING", "100")),
+    }
+
+
+def heartbeat_seconds() -> float:
+    return max(1, _settings()["heartbeat_ms"]) / 1000
+
+
+def max_pending() -> int:
+    return max(1, _settings()["max_pending"])
+
+
+def format_event(event_type: str, data: str) -> bytes:
+    return f"event: {event_type}\ndata: {data}\n\n".encode("utf-8")
+
+
+def change_notifications(events: List[Dict[str, Any]], actor_id: int) -> List[str]:
+    """One notification payload per project touched by the flush's change events."""
+    changes: Dict[int, Dict[tuple, Dict[str, Any]]] = {}
+    for change in events:
+        if change["projectId"] is None:
+            continue
+        key = (change["entity"], change["action"], change["issueId"], change["commentId"])
+        entry = changes.setdefault(change["projectId"], {}).setdefault(
+            key,
+            {
+                "type": f"{change['entity']}.{change['action']}",
+                "issueId": change["issueId"],
+                "commentId": change["commentId"],
+                "fields": [],
+            },
+        )
+        if change["field"] is not None and change["field"] not in entry["fields"]:
+            entry["fields"].append(change["field"])
+
+    payloads = []
+    for project_id, entries in changes.items():
+        payload = json.dumps(
+            {"projectId": project_id, "actorId": actor_id, "changes": list(entries.values())},
+            separators=(",", ":"),
+        )
+        if len(payload.encode("utf-8")) > MAX_NOTIFY_BYTES:
+            payload = json.dumps(
+                {"projectId": project_id, "actorId": actor_id, "truncated": True},
+                separators=(",", ":"),
+            )
+        payloads.append(payload)
+    return payloads
+
+
+_enabled = False
+
+
+@event.listens_for(Session, "after_flush")
+def _notify_changes(session: Session, flush_context):
+    if not _enabled:
+        return
+
+    actor_id = current_actor_id()
+    if actor_id is None:
+        return
+
+    connection = session.connection()
+    for payload in change_notifications(flush_change_events(session, flush_context, actor_id), actor_id):
+        connection.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+class Subscription(ABC):
+    """A client's queue of pending notifications; never blocks the publisher."""
+
+    def __init__(self, project_id: int, max_pending: int):
+        self.project_id = project_id
+        self.max_pending = max_pending
+        self.overflowed = False
+
+    @abstractmethod
+    def offer(self, payload: str):
+        """Queue a payload, or mark the subscription overflowed when its queue is full."""
+
+    def _overflow(self):
+        if not self.overflowed:
+            self.overflowed = True
+            metrics.increment("event_stream.overflowed")
+
+    def event_for(self, payload: Optional[str]) -> bytes:
+        """The bytes to send for a received payload, or for `None` after a quiet interval."""
+        if self.overflowed:
+            self.overflowed = False
+            self._discard_pending()
+            return format_event("reset", json.dumps({"projectId": self.project_id}))
+        if payload is None:
+            return HEARTBEAT
+        return format_event("change", payload)
+
+    @abstractmethod
+    def _discard_pending(self):
+        """Drop the queued payloads a `reset` replaces."""
+
+
+class ThreadSubscription(Subscription):
+    def __init__(self, project_id: int, max_pending: int):
+        super().__init__(project_id, max_pending)
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max_pending)
+
+    def offer(self, payload: str):
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            self._overflow()
+
+    def get(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _discard_pending(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class AsyncSubscription(Subscription):
+    """Must be offered payloads from the event loop it is read on."""
+
+    def __init__(self, project_id: int, max_pending: int):
+        super().__init__(project_id, max_pending)
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_pending)
+
+    def offer(self, payload: str):
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self._overflow()
+
+    async def get(self) -> str:
+        return await self._queue.get()
+
+    def _discard_pending(self):
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+
+class ChangeBroadcaster:
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def subscribe(self, subscription: Subscription) -> Subscription:
+        with self._lock:
+            self._subscriptions.setdefault(subscription.project_id, set()).add(subscription)
+            self.count += 1
+            metrics.set_gauge("event_stream.subscribers", self.count)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.project_id)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.project_id]
+            self.count -= 1
+            metrics.set_gauge("event_stream.subscribers", self.count)
+
+    def publish(self, payload: str):
+        try:
+            project_id = json.loads(payload)["projectId"]
+        except (ValueError, KeyError, TypeError):
+            logging.warning("Ignoring malformed change notification: %r", payload)
+            return
+
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(project_id, ()))
+        for subscription in subscriptions:
+            subscription.offer(payload)
+        metrics.increment("event_stream.notifications")
+        metrics.increment("event_stream.deliveries", len(subscriptions))
+
+
+class ChangeListener:
+    """Daemon thread relaying `LISTEN` notifications to a broadcaster, reconnecting on errors."""
+
+    def __init__(self, database_url, broadcaster: ChangeBroadcaster):
+        self.engine = create_engine(database_url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+        self.broadcaster = broadcaster
+        self._thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logging.exception("Change listener lost its connection; reconnecting")
+            time.sleep(LISTEN_RETRY_SECONDS)
+
+    def _listen(self):
+        raw_connection = self.engine.raw_connection()
+        try:
+            connection = raw_connection.dbapi_connection
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            while True:
+                if select_module.select([connection], [], [], 60) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    self.broadcaster.publish(connection.notifies.pop(0).payload)
+        finally:
+            raw_connection.close()
+
+
+_broadcaster = ChangeBroadcaster()
+_listener: Optional[ChangeListener] = None
+_listener_lock = threading.Lock()
+_database_url = None
+
+
+def subscribe(project_id: int) -> ThreadSubscription:
+    """Subscribe the calling thread to a project, starting this worker's listener if needed."""
+    global _listener
+    if _enabled and _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                _listener = ChangeListener(_database_url, _broadcaster)
+                _listener.start()
+
+    return _broadcaster.subscribe(ThreadSubscription(project_id, max_pending()))
+
+
+def stream_changes(subscription: ThreadSubscription) -> Iterator[bytes]:
+    """The SSE body for a subscription; closing the iterator unsubscribes it."""
+    interval = heartbeat_seconds()
+    try:
+        yield HEARTBEAT
+        while True:
+            yield subscription.event_for(subscription.get(interval))
+    finally:
+        _broadcaster.unsubscribe(subscription)
+
+
+def register_change_stream(app: Flask):
+    global _enabled, _database_url
+
+    with app.app_context():
+        _database_url = db.engine.url
+        _enabled = db.engine.dialect.name == "postgresql"
@@ -0,0 +1,261 @@
+"""Load generator comparing how the WSGI and ASGI servers cope with idle streaming clients.
+
+`flask benchmark-connections` opens `--idle` event streams (`GET /project/events`) for a
+second guest account, so they see nothing but heartbeats, then runs short CRUD requests
+from `--concurrency` keep-alive connections for `--duration` seconds and reports their
+throughput and latency. With `--same-project` the streams watch the project being edited
+instead. Run it once against each server, on the same machine, with the same options.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import click
+from flask import Flask
+
+from .traffic import percentile
+
+
+STREAM_OPEN_CONCURRENCY = 200
+
+
+class BenchmarkConnection:
+    """One keep-alive HTTP/1.1 connection on asyncio streams."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def send_head(self, method: str, path: str, token: Optional[str], body: Optional[bytes] = None):
+        await self._connect()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        if token:
+            lines.append(f"Authorization: Bearer {token}")
+        if body is not None:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await self._writer.drain()
+
+    async def readline(self) -> bytes:
+        return await self._reader.readline()
+
+    async def read_head(self) -> Tuple[int, Dict[str, str]]:
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by the server.")
+        headers = {}
+        while True:
+            line = (await self._reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return int(status_line.split()[1]), headers
+
+    async def _read_body(self, headers: Dict[str, str]) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    return b"".join(chunks)
+                chunks.append(chunk[:-2])
+        return await self._reader.readexactly(int(headers.get("content-length", "0")))
+
+    async def request(
+        self, method: str, path: str, token: Optional[str] = None, body: Optional[bytes] = None
+    ) -> Tuple[int, bytes]:
+        try:
+            await self.send_head(method, path, token, body)
+            status, headers = await asyncio.wait_for(self.read_head(), self.timeout)
+            data = await asyncio.wait_for(self._read_body(headers), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, data
+
+
+class StreamStats:
+    def __init__(self):
+        self.opened = 0
+        self.failed = 0
+        self.closed_early = 0
+        self.events = 0
+
+
+async def _hold_stream(
+    host: str, port: int, token: str, timeout: float, stats: StreamStats, ready: asyncio.Semaphore
+):
+    connection = BenchmarkConnection(host, port, timeout)
+    try:
+        async with ready:
+            await connection.send_head("GET", "/project/events", token)
+            status, _ = await asyncio.wait_for(connection.read_head(), timeout)
+        if status != 200:
+            stats.failed += 1
+            return
+        stats.opened += 1
+        while True:
+            line = await connection.readline()
+            if not line:
+                stats.closed_early += 1
+                return
+            if line.startswith(b"event: change"):
+                stats.events += 1
+    except (OSError, asyncio.TimeoutError, ValueError):
+        stats.failed += 1
+    finally:
+        connection.close()
+
+
+async def _run_benchmark(
+    base_url: str, idle: int, concurrency: int, duration: float, timeout: float, same_project: bool
+) -> Dict[str, Any]:
+    parts = urlsplit(base_url)
+    host, port = parts.hostname or "localhost", parts.port or 80
+
+    setup = BenchmarkConnection(host, port, timeout)
+
+    async def guest_token() -> str:
+        status, data = await setup.request("POST", "/authentication/guest")
+        if status != 200:
+            raise click.ClickException(f"Could not create a guest account (HTTP {status}).")
+        return json.loads(data)["authToken"]
+
+    token = await guest_token()
+    stream_token = token if same_project else await guest_token()
+    status, data = await setup.request("GET", "/project", token)
+    issue_ids = [issue["id"] for issue in json.loads(data)["project"]["issues"]]
+    setup.close()
+    if not issue_ids:
+        raise click.ClickException("The guest project has no issues to read.")
+
+    stats = StreamStats()
+    ready = asyncio.Semaphore(STREAM_OPEN_CONCURRENCY)
+    streams = [
+        asyncio.create_task(_hold_stream(host, port, stream_token, timeout, stats, ready)) for _ in range(idle)
+    ]
+    opening_started = time.monotonic()
+    while stats.opened + stats.failed < idle and time.monotonic() - opening_started < timeout:
+        await asyncio.sleep(0.1)
+    opening_seconds = time.monotonic() - opening_started
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    operations = ["GET /project", "GET /issues/:id", "GET /issues/:id", "PUT /issues/:id"]
+
+    async def worker(index: int):
+        connection = BenchmarkConnection(host, port, timeout)
+        step = index
+        while time.monotonic() < deadline:
+            operation = operations[step % len(operations)]
+            step += 1
+            issue_id = random.choice(issue_ids)
+            if operation == "GET /project":
+                request = ("GET", "/project", None)
+            elif operation == "GET /issues/:id":
+                request = ("GET", f"/issues/{issue_id}", None)
+            else:
+                body = json.dumps({"timeSpent": random.randint(0, 40)}).encode("utf-8")
+                request = ("PUT", f"/issues/{issue_id}", body)
+
+            started = time.perf_counter()
+            try:
+                status, _ = await connection.request(request[0], request[1], token, request[2])
+                failed = status >= 400
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                failed = True
+            latencies[operation].append((time.perf_counter() - started) * 1000)
+            if failed:
+                errors[operation] += 1
+        connection.close()
+
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.monotonic() - started
+    still_open = stats.opened - stats.closed_early
+
+    for stream in streams:
+        stream.cancel()
+    await asyncio.gather(*streams, return_exceptions=True)
+
+    rows = []
+    for operation in sorted(latencies):
+        values = sorted(latencies[operation])
+        rows.append(
+            {
+                "operation": operation,
+                "requests": len(values),
+                "errors": errors.get(operation, 0),
+                "perSecond": len(values) / elapsed,
+                "p50Ms": percentile(values, 0.5),
+                "p95Ms": percentile(values, 0.95),
+                "p99Ms": percentile(values, 0.99),
+            }
+        )
+    return {
+        "rows": rows,
+        "elapsed": elapsed,
+        "streams": stats,
+        "streamsStillOpen": still_open,
+        "openingSeconds": opening_seconds,
+    }
+
+
+@click.command("benchmark-connections")
+@click.option("--base-url", default="http://localhost:3000", show_default=True)
+@click.option("--idle", type=int, default=1000, show_default=True, help="Event streams held open during the run.")
+@click.option("--concurrency", type=int, default=8, show_default=True, help="Connections sending CRUD requests.")
+@click.option("--duration", type=float, default=20.0, show_default=True, help="Seconds of CRUD load.")
+@click.option("--timeout", type=float, default=30.0, show_default=True, help="Per-request timeout in seconds.")
+@click.option(
+    "--same-project",
+    is_flag=True,
+    help="Subscribe the streams to the project being edited, so every update fans out to all of them.",
+)
+def benchmark_connections_command(base_url, idle, concurrency, duration, timeout, same_project):
+    """Measure CRUD throughput against a running API while many event streams sit idle."""
+    result = asyncio.run(
+        _run_benchmark(base_url, max(0, idle), max(1, concurrency), duration, timeout, same_project)
+    )
+    streams = result["streams"]
+
+    click.echo(
+        f"Streams: {streams.opened}/{idle} opened in {result['openingSeconds']:.1f}s, "
+        f"{streams.failed} failed, {result['streamsStillOpen']} still open after the run, "
+        f"{streams.events} change events received"
+    )
+    click.echo(f"{'operation':<20} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for row in result["rows"]:
+        click.echo(
+            f"{row['operation']:<20} {row['requests']:>7} {row['errors']:>5} {row['perSecond']:>8.1f} "
+            f"{row['p50Ms']:>8.1f} {row['p95Ms']:>8.1f} {row['p99Ms']:>8.1f}"
+        )
+    total = sum(row["requests"] for row in result["rows"])
+    click.echo(f"\n{total} requests in {result['elapsed']:.1f}s ({total / result['elapsed']:.1f} req/s)")
+
+
+def register_connection_benchmark(app: Flask):
+    app.cli.add_command(benchmark_connections_command)
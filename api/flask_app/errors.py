@@ -37,27 +37,64 @@ class BadUserInputError(ApiError):
         )
 
 
+class IdempotencyKeyReusedError(ApiError):
+    def __init__(self):
+        super().__init__(
+            message="Idempotency-Key was already used for a different request.",
+            code="IDEMPOTENCY_KEY_REUSED",
+            status=422,
+        )
+
+
+class IdempotentRequestInProgressError(ApiError):
+    def __init__(self):
+        super().__init__(
+            message="A request with this Idempotency-Key is still being processed.",
+            code="IDEMPOTENT_REQUEST_IN_PROGRESS",
+            status=409,
+        )
+
+
+class VersionConflictError(ApiError):
+    def __init__(self, entity_name: str, current: Dict[str, Any]):
+        super().__init__(
+            message=f"{entity_name} was changed by someone else.",
+            code="VERSION_CONFLICT",
+            status=409,
+            data={"current": current},
+        )
+
+
 class InvalidTokenError(ApiError):
     def __init__(self, message: str = "Authentication token is invalid."):
         super().__init__(message=message, code="INVALID_TOKEN", status=401)
 
 
+class AttachmentTooLargeError(ApiError):
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            message=f"Attachments can be at most {max_bytes} bytes.",
+            code="ATTACHMENT_TOO_LARGE",
+            status=413,
+            data={"maxBytes": max_bytes},
+        )
+
+
+def error_body(error: ApiError) -> Dict[str, Any]:
+    return {
+        "error": {
+            "message": error.message,
+            "code": error.code,
+            "status": error.status,
+            "data": error.data,
+        }
+    }
+
+
 def register_error_handlers(app):
     @app.errorhandler(ApiError)
     def handle_api_error(error: ApiError):
-        return (
-            jsonify(
-                {
-                    "error": {
-                        "message": error.message,
-                        "code": error.code,
-                        "status": error.status,
-                        "data": error.data,
-                    }
-                }
-            ),
-            error.status,
-        )
+        return jsonify(error_body(error)), error.status
 
     @app.errorhandler(404)
     def handle_404(_error):
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from flask import Flask
+
+from . import metrics
+from .background import start_periodic_task
+from .extensions import db
+from .models import GuestAccount, utcnow
+from .seeds import create_guest_accounts
+
+
+def claim_guest_account() -> Optional[int]:
+    """Claim a pre-provisioned guest account and return its user id.
+
+    Concurrent claimers skip rows locked by each other instead of queueing on them.
+    Returns None when the pool is empty.
+    """
+    account = (
+        GuestAccount.query.filter(GuestAccount.claimedAt.is_(None))
+        .order_by(GuestAccount.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+
+    if not account:
+        db.session.rollback()
+        metrics.increment("guest_pool.misses")
+        return None
+
+    user_id = account.userId
+    account.claimedAt = utcnow()
+    db.session.commit()
+
+    metrics.increment("guest_pool.claims")
+    return user_id
+
+
+def get_guest_pool_size() -> int:
+    return GuestAccount.query.filter(GuestAccount.claimedAt.is_(None)).count()
+
+
+def refill_guest_pool(target_size: int, batch_size: int) -> int:
+    available = get_guest_pool_size()
+    metrics.set_gauge("guest_pool.size", available)
+
+    created = 0
+    while available + created < target_size:
+        count = min(batch_size, target_size - available - created)
+
+        started = time.monotonic()
+        create_guest_accounts(count)
+        elapsed = time.monotonic() - started
+
+        created += count
+        metrics.increment("guest_pool.provisioned", count)
+        metrics.set_gauge("guest_pool.refill_rate", count / elapsed if elapsed > 0 else count)
+        metrics.set_gauge("guest_pool.size", available + created)
+
+    return created
+
+
+def start_guest_pool_provisioner(app: Flask) -> Optional[threading.Event]:
+    target_size = int(os.getenv("GUEST_POOL_SIZE", "0"))
+    if target_size <= 0:
+        return None
+
+    batch_size = max(1, int(os.getenv("GUEST_POOL_BATCH_SIZE", "10")))
+    interval_ms = int(os.getenv("GUEST_POOL_REFILL_INTERVAL_MS", "1000"))
+
+    metrics.set_gauge("guest_pool.target_size", target_size)
+    return start_periodic_task(
+        app,
+        "guest-pool-provisioner",
+        interval_ms / 1000,
+        lambda: refill_guest_pool(target_size, batch_size),
+    )
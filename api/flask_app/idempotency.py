@@ -0,0 +1,186 @@
+import os
+import threading
+from datetime import timedelta
+from functools import wraps
+from hashlib import sha256
+from typing import Optional
+
+from flask import Flask, current_app, g, make_response, request
+from sqlalchemy import delete, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from . import metrics
+from .background import start_periodic_task
+from .errors import BadUserInputError, IdempotencyKeyReusedError, IdempotentRequestInProgressError
+from .extensions import db
+from .models import IdempotencyKey, utcnow
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def _ttl() -> timedelta:
+    return timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+
+
+def _lease() -> timedelta:
+    return timedelta(milliseconds=int(os.getenv("IDEMPOTENCY_LEASE_MS", "300000")))
+
+
+def _fingerprint() -> str:
+    digest = sha256(f"{request.method} {request.path}\n".encode("utf-8"))
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(record: IdempotencyKey, fingerprint: str):
+    if record.fingerprint != fingerprint:
+        raise IdempotencyKeyReusedError()
+    if record.responseStatus is None:
+        raise IdempotentRequestInProgressError()
+
+    metrics.increment("idempotency.replays")
+    response = current_app.response_class(
+        record.responseBody, status=record.responseStatus, mimetype="application/json"
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _find(user_id: int, key: str) -> Optional[IdempotencyKey]:
+    return IdempotencyKey.query.filter(
+        IdempotencyKey.userId == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.createdAt >= utcnow() - _ttl(),
+    ).first()
+
+
+def _take_over_expired_lease(record: IdempotencyKey, fingerprint: str, key_filter) -> bool:
+    """Claim a key whose request never stored a response (its worker died) once the lease ran out."""
+    if record.fingerprint != fingerprint or record.responseStatus is not None:
+        return False
+
+    now = utcnow()
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(
+            key_filter,
+            IdempotencyKey.responseStatus.is_(None),
+            or_(IdempotencyKey.lockedUntil.is_(None), IdempotencyKey.lockedUntil < now),
+        )
+        .values(lockedUntil=now + _lease()),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        return False
+    metrics.increment("idempotency.lease_takeovers")
+    return True
+
+
+def idempotent(handler):
+    """Replay the stored response for a repeated `Idempotency-Key` instead of re-running `handler`.
+
+    The key is reserved for `IDEMPOTENCY_LEASE_MS` before the handler runs, so concurrent
+    retries get a 409 rather than a second insert, and a retry after the lease runs out takes
+    over a key whose request died. Only successful responses are stored; a failed request
+    releases its key. Must be applied inside `require_auth`.
+    """
+
+    @wraps(handler)
+    def wrapped(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(*args, **kwargs)
+
+        if len(key) > 255:
+            raise BadUserInputError({"fields": {IDEMPOTENCY_HEADER: "Must be at most 255 characters"}})
+
+        user_id = g.current_user.id
+        fingerprint = _fingerprint()
+
+        key_filter = (IdempotencyKey.userId == user_id) & (IdempotencyKey.key == key)
+        record = _find(user_id, key)
+        if record is None:
+            try:
+                db.session.execute(
+                    delete(IdempotencyKey).where(key_filter, IdempotencyKey.createdAt < utcnow() - _ttl())
+                )
+                db.session.add(
+                    IdempotencyKey(
+                        userId=user_id, key=key, fingerprint=fingerprint, lockedUntil=utcnow() + _lease()
+                    )
+                )
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                record = _find(user_id, key)
+                if record is None:
+                    raise
+
+        if record is not None and not _take_over_expired_lease(record, fingerprint, key_filter):
+            return _replay(record, fingerprint)
+
+        try:
+            response = make_response(handler(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            db.session.execute(delete(IdempotencyKey).where(key_filter))
+            db.session.commit()
+            raise
+
+        if response.status_code < 300:
+            db.session.execute(
+                update(IdempotencyKey)
+                .where(key_filter)
+                .values(
+                    responseStatus=response.status_code, responseBody=response.get_data(), lockedUntil=None
+                )
+            )
+        else:
+            db.session.execute(delete(IdempotencyKey).where(key_filter))
+        db.session.commit()
+
+        return response
+
+    return wrapped
+
+
+def purge_expired_idempotency_keys(batch_size: int) -> int:
+    cutoff = utcnow() - _ttl()
+    deleted = 0
+
+    while True:
+        expired = (
+            select(IdempotencyKey.userId, IdempotencyKey.key)
+            .where(IdempotencyKey.createdAt < cutoff)
+            .limit(batch_size)
+        )
+        result = db.session.execute(
+            delete(IdempotencyKey).where(
+                tuple_(IdempotencyKey.userId, IdempotencyKey.key).in_(expired)
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        db.session.commit()
+
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    metrics.increment("idempotency.purged", deleted)
+    return deleted
+
+
+def start_idempotency_key_cleanup(app: Flask) -> Optional[threading.Event]:
+    interval_ms = int(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL_MS", "60000"))
+    if interval_ms <= 0:
+        return None
+
+    batch_size = max(1, int(os.getenv("IDEMPOTENCY_CLEANUP_BATCH_SIZE", "1000")))
+    return start_periodic_task(
+        app,
+        "idempotency-key-cleanup",
+        interval_ms / 1000,
+        lambda: purge_expired_idempotency_keys(batch_size),
+    )
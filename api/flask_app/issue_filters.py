@@ -0,0 +1,127 @@
+"""Server-side issue filters for `GET /issues?filter=...`.
+
+A filter is a whitespace separated list of `key:value[,value...]` clauses. Clauses are
+combined with AND, the values of one clause with OR:
+
+    status:backlog,selected type:bug assignee:me,12 priority:1,2 updated:3d
+
+The SQL statement only depends on which clauses are present, so compiled statements are
+cached per filter shape and every value is passed as a bound parameter.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from sqlalchemy import bindparam, or_, select
+from sqlalchemy.sql import Select
+
+from .constants import ISSUE_PRIORITIES, ISSUE_STATUSES, ISSUE_TYPES
+from .models import Issue, issue_users_user, utcnow
+from .read_models import issue_details_select
+
+
+CHOICE_FILTERS = {
+    "type": ISSUE_TYPES,
+    "status": ISSUE_STATUSES,
+    "priority": ISSUE_PRIORITIES,
+}
+FILTER_KEYS = sorted([*CHOICE_FILTERS, "assignee", "updated"])
+
+# ASCII digits only: str.isdigit() and \d also accept characters int() and timedelta reject.
+USER_ID_REGEX = re.compile(r"\d{1,10}", re.ASCII)
+MAX_USER_ID = 2**31 - 1
+UPDATED_WINDOW_REGEX = re.compile(r"(\d{1,9})([mhd])", re.ASCII)
+UPDATED_WINDOW_MINUTES = {"m": 1, "h": 60, "d": 24 * 60}
+MAX_UPDATED_WINDOW = timedelta(days=3650)
+
+_CHOICE_MESSAGES = {
+    key: f"'{key}' must be one of: {', '.join(sorted(options))}"
+    for key, options in CHOICE_FILTERS.items()
+}
+_UNKNOWN_KEY_MESSAGE = f"Must use clauses of the form key:value with key one of: {', '.join(FILTER_KEYS)}"
+
+
+@dataclass
+class IssueFilter:
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def shape(self) -> FrozenSet[str]:
+        return frozenset(self.params)
+
+
+def parse_issue_filter(value: str, current_user_id: int) -> Tuple[IssueFilter, Dict[str, str]]:
+    issue_filter = IssueFilter()
+    errors: Dict[str, str] = {}
+
+    for clause in value.split():
+        key, separator, raw_values = clause.partition(":")
+        values = [item for item in raw_values.split(",") if item]
+
+        if not separator or key not in FILTER_KEYS or not values:
+            errors["filter"] = _UNKNOWN_KEY_MESSAGE
+            break
+
+        if key in CHOICE_FILTERS:
+            if any(item not in CHOICE_FILTERS[key] for item in values):
+                errors["filter"] = _CHOICE_MESSAGES[key]
+                break
+            issue_filter.params[key] = sorted(set(values) | set(issue_filter.params.get(key, [])))
+        elif key == "assignee":
+            user_ids: List[int] = []
+            for item in values:
+                if item == "me":
+                    user_ids.append(current_user_id)
+                elif USER_ID_REGEX.fullmatch(item) and int(item) <= MAX_USER_ID:
+                    user_ids.append(int(item))
+                else:
+                    errors["filter"] = "'assignee' must be user ids or 'me'"
+                    break
+            issue_filter.params[key] = sorted(set(user_ids) | set(issue_filter.params.get(key, [])))
+        else:
+            match = UPDATED_WINDOW_REGEX.fullmatch(values[0]) if len(values) == 1 else None
+            if match:
+                window = timedelta(minutes=int(match.group(1)) * UPDATED_WINDOW_MINUTES[match.group(2)])
+            if not match or window > MAX_UPDATED_WINDOW:
+                errors["filter"] = (
+                    f"'updated' must be a time window of at most {MAX_UPDATED_WINDOW.days}d, "
+                    "such as 30m, 12h or 7d"
+                )
+                break
+            issue_filter.params[key] = utcnow() - window
+
+        if errors:
+            break
+
+    return issue_filter, errors
+
+
+_CONDITIONS = {
+    "type": lambda: Issue.type.in_(bindparam("type", expanding=True)),
+    "status": lambda: Issue.status.in_(bindparam("status", expanding=True)),
+    "priority": lambda: Issue.priority.in_(bindparam("priority", expanding=True)),
+    "assignee": lambda: Issue.id.in_(
+        select(issue_users_user.c.issueId).where(
+            issue_users_user.c.userId.in_(bindparam("assignee", expanding=True))
+        )
+    ),
+    "updated": lambda: Issue.updatedAt >= bindparam("updated"),
+}
+
+
+@lru_cache(maxsize=128)
+def compile_issue_query(shape: FrozenSet[str], has_search_term: bool) -> Select:
+    statement = issue_details_select().where(Issue.projectId == bindparam("project_id"))
+
+    if has_search_term:
+        search_pattern = bindparam("search_pattern")
+        statement = statement.where(
+            or_(Issue.title.ilike(search_pattern), Issue.descriptionText.ilike(search_pattern))
+        )
+
+    for key in sorted(shape):
+        statement = statement.where(_CONDITIONS[key]())
+
+    return statement
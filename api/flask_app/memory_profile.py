@@ -0,0 +1,201 @@
+"""Opt-in per-request memory profiling with tracemalloc.
+
+A request is profiled when it is sampled (`MEMORY_PROFILE_SAMPLE_RATE`) or sends
+`X-Memory-Profile: <ADMIN_TOKEN>`. Tracing runs only for the duration of a profiled request
+and only one request is traced at a time, since tracemalloc sees every thread. Handlers can
+mark phases with `memory_phase()` to split the peak between loading and serializing.
+Reports are kept in memory per worker and served from `GET /admin/memory-profiles`.
+"""
+import hmac
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from flask import Flask, g, request
+
+from . import metrics
+
+
+PROFILE_HEADER = "X-Memory-Profile"
+PEAK_HEADER = "X-Memory-Peak-Bytes"
+
+_IGNORED_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+_trace_lock = threading.Lock()
+_reports_lock = threading.Lock()
+_reports: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+
+class RequestProfile:
+    def __init__(self, top_sites: int):
+        self.top_sites = top_sites
+        self.peak = 0
+        self.phases: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def observe_peak(self) -> int:
+        _, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        return peak
+
+    def top_allocation_sites(
+        self, since: Optional[tracemalloc.Snapshot] = None
+    ) -> List[Dict[str, Any]]:
+        """Largest live allocations by line, or the largest growth since the `since` snapshot."""
+        snapshot = _snapshot()
+        if since is None:
+            stats = [(stat.traceback[0], stat.size, stat.count) for stat in snapshot.statistics("lineno")]
+        else:
+            stats = [
+                (stat.traceback[0], stat.size_diff, stat.count_diff)
+                for stat in snapshot.compare_to(since, "lineno")
+                if stat.size_diff > 0
+            ]
+        return [
+            {"site": f"{frame.filename}:{frame.lineno}", "bytes": size, "blocks": blocks}
+            for frame, size, blocks in stats[: self.top_sites]
+        ]
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+
+
+def _profile() -> Optional[RequestProfile]:
+    return g.get("memory_profile")
+
+
+def is_profiling() -> bool:
+    return _profile() is not None
+
+
+@contextmanager
+def memory_phase(name: str) -> Iterator[None]:
+    """Record the allocations made inside the block as a named phase of the current profile."""
+    profile = _profile()
+    if profile is None:
+        yield
+        return
+
+    profile.observe_peak()
+    before = _snapshot()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    yield
+    end, _ = tracemalloc.get_traced_memory()
+    peak = profile.observe_peak()
+    profile.phases.append(
+        {
+            "name": name,
+            "peakBytes": peak - start,
+            "netBytes": end - start,
+            "topSites": profile.top_allocation_sites(since=before),
+        }
+    )
+
+
+def _should_profile(sample_rate: float) -> bool:
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    requested = request.headers.get(PROFILE_HEADER)
+    if requested and admin_token and hmac.compare_digest(requested.encode(), admin_token.encode()):
+        return True
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _start(sample_rate: float, frames: int, top_sites: int):
+    if request.path.startswith("/admin/") or not _should_profile(sample_rate):
+        return
+    if not _trace_lock.acquire(blocking=False):
+        metrics.increment("memory_profile.skipped_busy")
+        return
+
+    tracemalloc.start(frames)
+    g.memory_profile = RequestProfile(top_sites)
+
+
+def _finish(response):
+    profile: Optional[RequestProfile] = g.pop("memory_profile", None)
+    if profile is None:
+        return response
+
+    try:
+        profile.observe_peak()
+        net, _ = tracemalloc.get_traced_memory()
+        report = {
+            "method": request.method,
+            "route": request.url_rule.rule if request.url_rule else request.path,
+            "status": response.status_code,
+            "durationMs": round((time.perf_counter() - profile.started) * 1000, 3),
+            "peakBytes": profile.peak,
+            "netBytes": net,
+            "phases": profile.phases,
+            "topSites": profile.top_allocation_sites(),
+        }
+    finally:
+        tracemalloc.stop()
+        _trace_lock.release()
+
+    with _reports_lock:
+        _reports.append(report)
+    metrics.increment("memory_profile.profiled")
+    response.headers[PEAK_HEADER] = str(profile.peak)
+    return response
+
+
+def _abandon(_error):
+    # after_request is skipped for unhandled errors; make sure tracing never outlives the request.
+    if g.pop("memory_profile", None) is not None:
+        tracemalloc.stop()
+        _trace_lock.release()
+
+
+def memory_profile_summary() -> Dict[str, Any]:
+    with _reports_lock:
+        reports = list(_reports)
+
+    by_route: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for report in reports:
+        by_route[f"{report['method']} {report['route']}"].append(report)
+
+    routes = [
+        {
+            "route": route,
+            "requests": len(route_reports),
+            "meanPeakBytes": sum(report["peakBytes"] for report in route_reports) // len(route_reports),
+            "maxPeakBytes": max(report["peakBytes"] for report in route_reports),
+            "meanNetBytes": sum(report["netBytes"] for report in route_reports) // len(route_reports),
+        }
+        for route, route_reports in by_route.items()
+    ]
+    routes.sort(key=lambda route: -route["maxPeakBytes"])
+    return {"routes": routes, "reports": reports[::-1]}
+
+
+def clear_memory_profiles():
+    with _reports_lock:
+        _reports.clear()
+
+
+def register_memory_profiler(app: Flask) -> bool:
+    global _reports
+
+    sample_rate = float(os.getenv("MEMORY_PROFILE_SAMPLE_RATE", "0"))
+    if sample_rate <= 0 and not os.getenv("ADMIN_TOKEN"):
+        return False
+
+    frames = max(1, int(os.getenv("MEMORY_PROFILE_FRAMES", "1")))
+    top_sites = max(1, int(os.getenv("MEMORY_PROFILE_TOP_SITES", "10")))
+    _reports = deque(maxlen=max(1, int(os.getenv("MEMORY_PROFILE_MAX_REPORTS", "100"))))
+
+    app.before_request(lambda: _start(sample_rate, frames, top_sites))
+    app.after_request(_finish)
+    app.teardown_request(_abandon)
+    return True
@@ -0,0 +1,22 @@
+import threading
+from typing import Dict
+
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+
+
+def increment(name: str, value: float = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
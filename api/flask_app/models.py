@@ -17,6 +17,17 @@ issue_users_user = db.Table(
     "issue_users_user",
     db.Column("issueId", db.Integer, db.ForeignKey("issue.id"), primary_key=True),
     db.Column("userId", db.Integer, db.ForeignKey("user.id"), primary_key=True),
+    # The primary key leads with issueId; this serves "issues assigned to a user" lookups.
+    db.Index("ix_issue_users_user_userId_issueId", "userId", "issueId"),
+)
+
+# Which projects a user can open; `User.projectId` is the one opened when none is selected.
+project_member = db.Table(
+    "project_member",
+    db.Column("projectId", db.Integer, db.ForeignKey("project.id"), primary_key=True),
+    db.Column("userId", db.Integer, db.ForeignKey("user.id"), primary_key=True),
+    # The primary key leads with projectId; this serves "projects of a user" lookups.
+    db.Index("ix_project_member_userId_projectId", "userId", "projectId"),
 )
 
 
@@ -37,8 +48,20 @@ class Project(db.Model):
         nullable=False,
     )
 
-    issues = db.relationship("Issue", back_populates="project", cascade="all, delete-orphan")
-    users = db.relationship("User", back_populates="project", cascade="all, delete-orphan")
+    # Bumped by every ORM UPDATE, which only matches the row at the version it was read at.
+    version = db.Column(db.Integer, default=1, server_default="1", nullable=False)
+    __mapper_args__ = {"version_id_col": version}
+
+    # Ordered so the serialized board is deterministic (see board_payload.py).
+    issues = db.relationship(
+        "Issue", back_populates="project", cascade="all, delete-orphan", order_by="Issue.id"
+    )
+    users = db.relationship(
+        "User", back_populates="project", cascade="all, delete-orphan", order_by="User.id"
+    )
+    members = db.relationship(
+        "User", secondary=project_member, back_populates="projects", order_by="User.id"
+    )
 
 
 class User(db.Model):
@@ -59,6 +82,7 @@ class User(db.Model):
 
     projectId = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=True)
     project = db.relationship("Project", back_populates="users")
+    projects = db.relationship("Project", secondary=project_member, back_populates="members")
 
     comments = db.relationship("Comment", back_populates="user")
     issues = db.relationship("Issue", secondary=issue_users_user, back_populates="users")
@@ -66,6 +90,12 @@ class User(db.Model):
 
 class Issue(db.Model):
     __tablename__ = "issue"
+    # Every query is scoped to a project, so indexes lead with projectId and a large project's
+    # rows are never scanned for another one's board, lookups or new list positions.
+    __table_args__ = (
+        db.Index("ix_issue_projectId_id", "projectId", "id"),
+        db.Index("ix_issue_projectId_status_listPosition", "projectId", "status", "listPosition"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -89,12 +119,21 @@ class Issue(db.Model):
         nullable=False,
     )
 
+    version = db.Column(db.Integer, default=1, server_default="1", nullable=False)
+    __mapper_args__ = {"version_id_col": version}
+
     reporterId = db.Column(db.Integer, nullable=False)
     projectId = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
 
     project = db.relationship("Project", back_populates="issues")
     comments = db.relationship("Comment", back_populates="issue", cascade="all, delete-orphan")
     users = db.relationship("User", secondary=issue_users_user, back_populates="issues")
+    attachments = db.relationship(
+        "Attachment",
+        primaryjoin="Issue.id == foreign(Attachment.issueId)",
+        cascade="all, delete-orphan",
+        order_by="Attachment.id",
+    )
 
 
 class Comment(db.Model):
@@ -111,6 +150,9 @@ class Comment(db.Model):
         nullable=False,
     )
 
+    version = db.Column(db.Integer, default=1, server_default="1", nullable=False)
+    __mapper_args__ = {"version_id_col": version}
+
     userId = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     issueId = db.Column(db.Integer, db.ForeignKey("issue.id", ondelete="CASCADE"), nullable=False)
 
@@ -118,6 +160,131 @@ class Comment(db.Model):
     issue = db.relationship("Issue", back_populates="comments")
 
 
+class Attachment(db.Model):
+    __tablename__ = "attachment"
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    contentType = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+
+    createdAt = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+
+    # No foreign key on issueId, so attachments stay linked while their issue is archived.
+    issueId = db.Column(db.Integer, nullable=False, index=True)
+    projectId = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    userId = db.Column(db.Integer, nullable=True)
+
+
+class GuestAccount(db.Model):
+    __tablename__ = "guest_account"
+
+    id = db.Column(db.Integer, primary_key=True)
+    createdAt = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+    claimedAt = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+
+    projectId = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    userId = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_key"
+
+    userId = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    responseStatus = db.Column(db.Integer, nullable=True)
+    responseBody = db.Column(db.LargeBinary, nullable=True)
+    # Until then a key without a response belongs to the request running it.
+    lockedUntil = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    createdAt = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False, index=True)
+
+
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_token"
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), nullable=False, unique=True)
+    # No foreign key: rows only matter until `expiresAt` and may outlive a reaped guest.
+    userId = db.Column(db.Integer, nullable=False)
+    expiresAt = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+    revokedAt = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False, index=True)
+
+
+class Activity(db.Model):
+    __tablename__ = "activity"
+    __table_args__ = (db.Index("ix_activity_issueId_id", "issueId", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String, nullable=False)
+    action = db.Column(db.String, nullable=False)
+    field = db.Column(db.String, nullable=True)
+    oldValue = db.Column(db.JSON, nullable=True)
+    newValue = db.Column(db.JSON, nullable=True)
+
+    createdAt = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+
+    # Plain columns rather than foreign keys so the trail outlives deleted issues and comments.
+    projectId = db.Column(db.Integer, nullable=False, index=True)
+    issueId = db.Column(db.Integer, nullable=False)
+    commentId = db.Column(db.Integer, nullable=True)
+    userId = db.Column(db.Integer, nullable=True)
+
+
+class WebhookOutbox(db.Model):
+    __tablename__ = "webhook_outbox"
+    __table_args__ = (
+        db.Index("ix_webhook_outbox_nextAttemptAt_id", "nextAttemptAt", "id"),
+        # Finds an issue's earlier events, which its later ones wait for.
+        db.Index("ix_webhook_outbox_issueId_id", "issueId", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    eventType = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    lastError = db.Column(db.Text, nullable=True)
+
+    createdAt = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+    nextAttemptAt = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+    failedAt = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    # Plain columns, as in `activity`: events outlive the rows they describe.
+    projectId = db.Column(db.Integer, nullable=False)
+    issueId = db.Column(db.Integer, nullable=False)
+
+
+def _archive_table(source: db.Table, name: str, *extra) -> db.Table:
+    """Copy `source`'s columns without foreign keys, so archived rows can outlive live ones."""
+    columns = [
+        db.Column(
+            column.name,
+            column.type,
+            primary_key=column.primary_key,
+            nullable=column.nullable,
+            autoincrement=False,
+        )
+        for column in source.columns
+    ]
+    return db.Table(name, db.metadata, *columns, *extra)
+
+
+issue_archive = _archive_table(
+    Issue.__table__,
+    "issue_archive",
+    db.Column("archivedAt", db.DateTime(timezone=True), nullable=False),
+    db.Index("ix_issue_archive_projectId_archivedAt", "projectId", "archivedAt"),
+)
+comment_archive = _archive_table(
+    Comment.__table__,
+    "comment_archive",
+    db.Index("ix_comment_archive_issueId", "issueId"),
+)
+issue_users_user_archive = _archive_table(issue_users_user, "issue_users_user_archive")
+
+
 @event.listens_for(Issue, "before_insert")
 @event.listens_for(Issue, "before_update")
 def set_issue_description_text(_mapper, _connection, target: Issue):
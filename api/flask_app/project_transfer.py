@@ -0,0 +1,362 @@
+"""Streaming export and import of a project's issues, assignees and comments.
+
+Exports are read with a server-side cursor in batches of `PROJECT_TRANSFER_BATCH_SIZE`
+issues and written as one record per line (NDJSON) or per row (CSV), each issue followed
+by its comments. Imports read the same formats line by line and write with batched bulk
+inserts in a single transaction, so neither direction holds the whole project in memory.
+"""
+import csv
+import io
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import IO, Any, Dict, Iterable, Iterator, List
+
+from sqlalchemy import insert, select
+
+from .extensions import db
+from .models import HTML_TAG_REGEX, Comment, Issue, issue_users_user, project_member
+from .schemas import COMMENT_BODY_SCHEMA, ISSUE_SCHEMA
+
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+ISSUE_EXPORT_COLUMNS = [
+    Issue.id,
+    Issue.title,
+    Issue.type,
+    Issue.status,
+    Issue.priority,
+    Issue.listPosition,
+    Issue.description,
+    Issue.estimate,
+    Issue.timeSpent,
+    Issue.timeRemaining,
+    Issue.reporterId,
+    Issue.createdAt,
+    Issue.updatedAt,
+]
+COMMENT_EXPORT_COLUMNS = [
+    Comment.id,
+    Comment.issueId,
+    Comment.userId,
+    Comment.body,
+    Comment.createdAt,
+    Comment.updatedAt,
+]
+
+CSV_COLUMNS = [
+    "record",
+    "id",
+    "issueId",
+    "title",
+    "type",
+    "status",
+    "priority",
+    "listPosition",
+    "description",
+    "estimate",
+    "timeSpent",
+    "timeRemaining",
+    "reporterId",
+    "userIds",
+    "userId",
+    "body",
+    "createdAt",
+    "updatedAt",
+]
+# Loaded issue values inserted as they are; the rest are filled in per import.
+IMPORTED_ISSUE_COLUMNS = [
+    "title",
+    "type",
+    "status",
+    "priority",
+    "description",
+    "estimate",
+    "timeSpent",
+    "timeRemaining",
+    "projectId",
+]
+CSV_INT_COLUMNS = {"id", "issueId", "estimate", "timeSpent", "timeRemaining", "reporterId", "userId"}
+SOURCE_ID_MESSAGE = "Must be a number"
+
+
+class InvalidImportRecordError(Exception):
+    def __init__(self, record_number: int, errors: Dict[str, str]):
+        super().__init__(f"Record {record_number} is invalid")
+        self.record_number = record_number
+        self.errors = errors
+
+
+def _batch_size() -> int:
+    return max(1, int(os.getenv("PROJECT_TRANSFER_BATCH_SIZE", "1000")))
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_export_records(project_id: int) -> Iterator[Dict[str, Any]]:
+    result = db.session.execute(
+        select(*ISSUE_EXPORT_COLUMNS)
+        .where(Issue.projectId == project_id)
+        .order_by(Issue.id)
+        .execution_options(yield_per=_batch_size())
+    )
+
+    for rows in result.partitions():
+        issue_ids = [row.id for row in rows]
+
+        user_ids = defaultdict(list)
+        for issue_id, user_id in db.session.execute(
+            select(issue_users_user.c.issueId, issue_users_user.c.userId)
+            .where(issue_users_user.c.issueId.in_(issue_ids))
+            .order_by(issue_users_user.c.issueId, issue_users_user.c.userId)
+        ):
+            user_ids[issue_id].append(user_id)
+
+        comments = defaultdict(list)
+        for comment in db.session.execute(
+            select(*COMMENT_EXPORT_COLUMNS)
+            .where(Comment.issueId.in_(issue_ids))
+            .order_by(Comment.issueId, Comment.id)
+        ):
+            comments[comment.issueId].append(comment)
+
+        for row in rows:
+            yield {
+                "record": "issue",
+                **{key: _json_value(value) for key, value in row._mapping.items()},
+                "userIds": user_ids[row.id],
+            }
+            for comment in comments[row.id]:
+                yield {
+                    "record": "comment",
+                    **{key: _json_value(value) for key, value in comment._mapping.items()},
+                }
+
+
+def stream_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def stream_csv(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+
+    for record in records:
+        if "userIds" in record:
+            record = {**record, "userIds": " ".join(str(user_id) for user_id in record["userIds"])}
+        writer.writerow(record)
+
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def read_ndjson(stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else {}
+
+
+def read_csv(stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    text_stream = io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8", newline="")
+    for row in csv.DictReader(text_stream):
+        record: Dict[str, Any] = {}
+        for key, value in row.items():
+            if key is None or value == "":
+                continue
+            if key in CSV_INT_COLUMNS:
+                try:
+                    record[key] = int(value)
+                except ValueError:
+                    record[key] = value
+            elif key == "listPosition":
+                try:
+                    record[key] = float(value)
+                except ValueError:
+                    record[key] = value
+            elif key == "userIds":
+                record[key] = value.split()
+            else:
+                record[key] = value
+        yield record
+
+
+def _is_source_id(value: Any) -> bool:
+    # Ids are matched by hash, so lists and objects are refused before they reach a set.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class ProjectImporter:
+    """Writes imported records with bulk inserts, `batch_size` issues or comments at a time.
+
+    Comments must come after the issue they belong to, as exports write them. Only the ids of
+    the current and previous batch of issues are remembered.
+    """
+
+    def __init__(self, project_id: int, fallback_user_id: int, batch_size: int):
+        self.project_id = project_id
+        self.fallback_user_id = fallback_user_id
+        self.batch_size = batch_size
+        self.project_user_ids = set(
+            db.session.execute(
+                select(project_member.c.userId).where(project_member.c.projectId == project_id)
+            ).scalars()
+        )
+
+        self.issue_count = 0
+        self.comment_count = 0
+        self._pending_issues: List[Dict[str, Any]] = []
+        self._pending_comments: List[Dict[str, Any]] = []
+        self._pending_source_ids: set = set()
+        self._previous_ids: Dict[Any, int] = {}
+        self._current_ids: Dict[Any, int] = {}
+
+    def _project_user_id(self, user_id: Any) -> int:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return self.fallback_user_id
+        return user_id if user_id in self.project_user_ids else self.fallback_user_id
+
+    def _assignee_ids(self, user_ids: Any) -> List[int]:
+        if not isinstance(user_ids, list):
+            return []
+        assignee_ids = set()
+        for user_id in user_ids:
+            try:
+                user_id = int(user_id)
+            except (TypeError, ValueError):
+                continue
+            if user_id in self.project_user_ids:
+                assignee_ids.add(user_id)
+        return sorted(assignee_ids)
+
+    def add(self, record_number: int, record: Dict[str, Any]):
+        kind = record.get("record")
+        if kind == "issue":
+            self._add_issue(record_number, record)
+        elif kind == "comment":
+            self._add_comment(record_number, record)
+        else:
+            raise InvalidImportRecordError(record_number, {"record": "Must be one of: comment, issue"})
+
+        pending = max(len(self._pending_issues), len(self._pending_comments))
+        if pending >= self.batch_size:
+            self.flush()
+
+    def _add_issue(self, record_number: int, record: Dict[str, Any]):
+        values, errors = ISSUE_SCHEMA.load({**record, "projectId": self.project_id})
+        source_id = record.get("id")
+        if source_id is not None and not _is_source_id(source_id):
+            errors["id"] = SOURCE_ID_MESSAGE
+        if errors:
+            raise InvalidImportRecordError(record_number, errors)
+
+        description = values["description"]
+        if source_id is not None:
+            self._pending_source_ids.add(source_id)
+        self._pending_issues.append(
+            {
+                "sourceId": source_id,
+                "userIds": self._assignee_ids(values["userIds"]),
+                "row": {
+                    **{column: values[column] for column in IMPORTED_ISSUE_COLUMNS},
+                    "listPosition": 1.0 if values["listPosition"] is None else values["listPosition"],
+                    "descriptionText": HTML_TAG_REGEX.sub("", description) if description is not None else None,
+                    "reporterId": self._project_user_id(values["reporterId"]),
+                },
+            }
+        )
+
+    def _add_comment(self, record_number: int, record: Dict[str, Any]):
+        values, errors = COMMENT_BODY_SCHEMA.load(record)
+        source_issue_id = record.get("issueId")
+        if source_issue_id is None:
+            errors["issueId"] = "This field is required"
+        elif not _is_source_id(source_issue_id):
+            errors["issueId"] = SOURCE_ID_MESSAGE
+        elif not self._is_known_issue(source_issue_id):
+            errors["issueId"] = "Must reference an issue that appears earlier in the file"
+        if errors:
+            raise InvalidImportRecordError(record_number, errors)
+
+        self._pending_comments.append(
+            {
+                "sourceIssueId": source_issue_id,
+                "row": {"body": values["body"], "userId": self._project_user_id(record.get("userId"))},
+            }
+        )
+
+    def _is_known_issue(self, source_issue_id: Any) -> bool:
+        return (
+            source_issue_id in self._current_ids
+            or source_issue_id in self._previous_ids
+            or source_issue_id in self._pending_source_ids
+        )
+
+    def flush(self):
+        inserted_ids: Dict[Any, int] = {}
+
+        if self._pending_issues:
+            new_ids = db.session.scalars(
+                insert(Issue).returning(Issue.id, sort_by_parameter_order=True),
+                [issue["row"] for issue in self._pending_issues],
+            ).all()
+
+            assignments = []
+            for issue, new_id in zip(self._pending_issues, new_ids):
+                if issue["sourceId"] is not None:
+                    inserted_ids[issue["sourceId"]] = new_id
+                assignments.extend(
+                    {"issueId": new_id, "userId": user_id} for user_id in issue["userIds"]
+                )
+
+            if assignments:
+                db.session.execute(insert(issue_users_user), assignments)
+
+            self.issue_count += len(self._pending_issues)
+            self._pending_issues = []
+            self._pending_source_ids = set()
+
+        if self._pending_comments:
+            known_ids = {**self._previous_ids, **self._current_ids, **inserted_ids}
+            db.session.execute(
+                insert(Comment),
+                [
+                    {**comment["row"], "issueId": known_ids[comment["sourceIssueId"]]}
+                    for comment in self._pending_comments
+                ],
+            )
+            self.comment_count += len(self._pending_comments)
+            self._pending_comments = []
+
+        if inserted_ids:
+            self._previous_ids = self._current_ids
+            self._current_ids = inserted_ids
+
+
+def import_project_records(
+    records: Iterable[Dict[str, Any]], project_id: int, fallback_user_id: int
+) -> ProjectImporter:
+    importer = ProjectImporter(project_id, fallback_user_id, _batch_size())
+    for record_number, record in enumerate(records, start=1):
+        importer.add(record_number, record)
+    importer.flush()
+    return importer
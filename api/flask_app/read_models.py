@@ -0,0 +1,172 @@
+"""Read-only records for the list endpoints, loaded with Core instead of ORM entities.
+
+The records only hold the selected columns in `__slots__`; there is no identity map, no
+attribute instrumentation and no relationship collection. Assignee ids are aggregated in SQL,
+so an issue's `userIds` arrives with its row. The serializers accept these records wherever
+they accept the corresponding ORM objects.
+"""
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from .extensions import db
+from .models import Issue, Project, User, issue_users_user, project_member
+
+
+class aggregated_ids(FunctionElement):
+    """`array_agg(column ORDER BY column)` on Postgres, `group_concat(column)` elsewhere."""
+
+    name = "aggregated_ids"
+    inherit_cache = True
+
+
+@compiles(aggregated_ids)
+def _compile_aggregated_ids(element, compiler, **kw):
+    return f"group_concat({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(aggregated_ids, "postgresql")
+def _compile_aggregated_ids_postgresql(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"array_agg({column} ORDER BY {column})"
+
+
+def assignee_ids_column():
+    return (
+        select(aggregated_ids(issue_users_user.c.userId))
+        .where(issue_users_user.c.issueId == Issue.id)
+        .correlate(Issue)
+        .scalar_subquery()
+        .label("userIds")
+    )
+
+
+def _id_list(value: Any) -> List[int]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return sorted(int(item) for item in value.split(","))
+    return list(value)
+
+
+USER_COLUMNS = [
+    User.id,
+    User.name,
+    User.email,
+    User.avatarUrl,
+    User.createdAt,
+    User.updatedAt,
+    User.projectId,
+]
+PROJECT_COLUMNS = [
+    Project.id,
+    Project.name,
+    Project.url,
+    Project.description,
+    Project.category,
+    Project.createdAt,
+    Project.updatedAt,
+    Project.version,
+]
+ISSUE_SUMMARY_COLUMNS = [
+    Issue.id,
+    Issue.title,
+    Issue.type,
+    Issue.status,
+    Issue.priority,
+    Issue.listPosition,
+    Issue.createdAt,
+    Issue.updatedAt,
+    Issue.version,
+]
+ISSUE_DETAIL_COLUMNS = [*ISSUE_SUMMARY_COLUMNS] + [
+    Issue.description,
+    Issue.descriptionText,
+    Issue.estimate,
+    Issue.timeSpent,
+    Issue.timeRemaining,
+    Issue.reporterId,
+    Issue.projectId,
+]
+
+
+def _field_names(columns) -> tuple:
+    return tuple(column.key for column in columns)
+
+
+class _Record:
+    """Holds a row's values by name; `_fields` lists them in select order."""
+
+    __slots__ = ()
+    _fields: tuple = ()
+
+    def __init__(self, row: Iterable[Any]):
+        for name, value in zip(self._fields, row):
+            setattr(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={getattr(self, 'id', None)!r})"
+
+
+class UserRecord(_Record):
+    __slots__ = _fields = _field_names(USER_COLUMNS)
+
+
+class IssueSummary(_Record):
+    __slots__ = _fields = (*_field_names(ISSUE_SUMMARY_COLUMNS), "userIds")
+
+    def __init__(self, row: Iterable[Any]):
+        super().__init__(row)
+        self.userIds = _id_list(self.userIds)
+
+
+class IssueDetail(IssueSummary):
+    __slots__ = _field_names(ISSUE_DETAIL_COLUMNS[len(ISSUE_SUMMARY_COLUMNS) :])
+    _fields = (*_field_names(ISSUE_DETAIL_COLUMNS), "userIds")
+
+
+class ProjectRecord(_Record):
+    __slots__ = (*_field_names(PROJECT_COLUMNS), "users", "issues")
+    _fields = _field_names(PROJECT_COLUMNS)
+
+
+def issue_summaries_select():
+    return select(*ISSUE_SUMMARY_COLUMNS, assignee_ids_column())
+
+
+def issue_details_select():
+    return select(*ISSUE_DETAIL_COLUMNS, assignee_ids_column())
+
+
+def issue_summaries(rows: Iterable[Any]) -> List[IssueSummary]:
+    return [IssueSummary(row) for row in rows]
+
+
+def issue_details(rows: Iterable[Any]) -> List[IssueDetail]:
+    return [IssueDetail(row) for row in rows]
+
+
+def load_project_record(project_id: int) -> Optional[ProjectRecord]:
+    """Load a project with its members and issue summaries, each ordered by id."""
+    row = db.session.execute(select(*PROJECT_COLUMNS).where(Project.id == project_id)).first()
+    if row is None:
+        return None
+
+    project = ProjectRecord(row)
+    project.users = [
+        UserRecord(user)
+        for user in db.session.execute(
+            select(*USER_COLUMNS)
+            .join(project_member, project_member.c.userId == User.id)
+            .where(project_member.c.projectId == project_id)
+            .order_by(User.id)
+        )
+    ]
+    project.issues = issue_summaries(
+        db.session.execute(
+            issue_summaries_select().where(Issue.projectId == project_id).order_by(Issue.id)
+        )
+    )
+    return project
@@ -0,0 +1,218 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+from sqlalchemy import delete, or_, select, text, update
+from sqlalchemy.exc import OperationalError
+
+from . import metrics
+from .background import start_periodic_task
+from .extensions import db
+from .models import (
+    Activity,
+    Attachment,
+    Comment,
+    GuestAccount,
+    IdempotencyKey,
+    Issue,
+    Project,
+    User,
+    comment_archive,
+    issue_archive,
+    issue_users_user,
+    issue_users_user_archive,
+    project_member,
+    utcnow,
+)
+
+
+@dataclass
+class ReapResult:
+    batches: int = 0
+    projects: int = 0
+    rows: Dict[str, int] = field(default_factory=dict)
+
+    def add_rows(self, table: str, count: int):
+        self.rows[table] = self.rows.get(table, 0) + count
+
+
+def _settings() -> Dict[str, int]:
+    return {
+        "ttl_hours": int(os.getenv("GUEST_REAPER_TTL_HOURS", "168")),
+        "batch_size": int(os.getenv("GUEST_REAPER_BATCH_SIZE", "50")),
+        "max_batches": int(os.getenv("GUEST_REAPER_MAX_BATCHES", "0")),
+        "batch_pause_ms": int(os.getenv("GUEST_REAPER_BATCH_PAUSE_MS", "100")),
+        "lock_timeout_ms": int(os.getenv("GUEST_REAPER_LOCK_TIMEOUT_MS", "2000")),
+        "interval_ms": int(os.getenv("GUEST_REAPER_INTERVAL_MS", "0")),
+    }
+
+
+def _delete_guest_projects(project_ids: List[int], result: ReapResult):
+    issue_ids = select(Issue.id).where(Issue.projectId.in_(project_ids))
+    archived_issue_ids = select(issue_archive.c.id).where(issue_archive.c.projectId.in_(project_ids))
+    # Guest users who were added to another project, or commented on its issues, keep their
+    # work there: they are detached from the reaped project instead of deleted.
+    retained = or_(
+        User.id.in_(
+            select(project_member.c.userId).where(project_member.c.projectId.not_in(project_ids))
+        ),
+        User.id.in_(select(Comment.userId).where(Comment.issueId.not_in(issue_ids))),
+    )
+    user_ids = select(User.id).where(User.projectId.in_(project_ids), ~retained)
+
+    statements = [
+        (
+            "comment_archive",
+            delete(comment_archive).where(comment_archive.c.issueId.in_(archived_issue_ids)),
+        ),
+        (
+            "issue_users_user_archive",
+            delete(issue_users_user_archive).where(
+                issue_users_user_archive.c.issueId.in_(archived_issue_ids)
+            ),
+        ),
+        ("issue_archive", delete(issue_archive).where(issue_archive.c.projectId.in_(project_ids))),
+        ("comment", delete(Comment).where(Comment.issueId.in_(issue_ids))),
+        ("issue_users_user", delete(issue_users_user).where(issue_users_user.c.issueId.in_(issue_ids))),
+        ("project_member", delete(project_member).where(project_member.c.projectId.in_(project_ids))),
+        ("idempotency_key", delete(IdempotencyKey).where(IdempotencyKey.userId.in_(user_ids))),
+        ("activity", delete(Activity).where(Activity.projectId.in_(project_ids))),
+        # Only the rows; `flask prune-attachments` removes the files nothing else refers to.
+        ("attachment", delete(Attachment).where(Attachment.projectId.in_(project_ids))),
+        ("guest_account", delete(GuestAccount).where(GuestAccount.projectId.in_(project_ids))),
+        ("issue", delete(Issue).where(Issue.projectId.in_(project_ids))),
+        ("user", delete(User).where(User.id.in_(user_ids))),
+        ("user_detached", update(User).where(User.projectId.in_(project_ids)).values(projectId=None)),
+        ("project", delete(Project).where(Project.id.in_(project_ids))),
+    ]
+
+    for table, statement in statements:
+        outcome = db.session.execute(statement, execution_options={"synchronize_session": False})
+        result.add_rows(table, outcome.rowcount)
+
+
+def reap_expired_guest_projects(
+    ttl: timedelta,
+    batch_size: int,
+    max_batches: int = 0,
+    batch_pause_seconds: float = 0,
+    lock_timeout_ms: int = 0,
+    on_progress: Optional[Callable[[ReapResult], None]] = None,
+) -> ReapResult:
+    """Delete guest projects claimed more than `ttl` ago, `batch_size` projects per transaction.
+
+    Rows are removed with set-based deletes in foreign key order, each batch is
+    committed on its own so locks are held briefly, and the run sleeps for
+    `batch_pause_seconds` between batches. `max_batches=0` runs until nothing is left.
+    """
+    result = ReapResult()
+    cutoff = utcnow() - ttl
+    is_postgres = db.engine.dialect.name == "postgresql"
+
+    while not max_batches or result.batches < max_batches:
+        try:
+            if is_postgres and lock_timeout_ms > 0:
+                db.session.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+
+            project_ids = (
+                db.session.execute(
+                    select(GuestAccount.projectId)
+                    .where(GuestAccount.claimedAt < cutoff)
+                    .order_by(GuestAccount.id)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                .scalars()
+                .all()
+            )
+
+            if not project_ids:
+                db.session.rollback()
+                break
+
+            _delete_guest_projects(project_ids, result)
+            db.session.commit()
+        except OperationalError:
+            db.session.rollback()
+            logging.warning("Guest reaper batch hit the lock timeout, stopping this run")
+            break
+
+        result.batches += 1
+        result.projects += len(project_ids)
+        metrics.increment("guest_reaper.projects_deleted", len(project_ids))
+
+        if on_progress:
+            on_progress(result)
+
+        if batch_pause_seconds > 0:
+            time.sleep(batch_pause_seconds)
+
+    return result
+
+
+def _reap_with_settings(settings: Dict[str, int], on_progress=None) -> ReapResult:
+    return reap_expired_guest_projects(
+        ttl=timedelta(hours=settings["ttl_hours"]),
+        batch_size=max(1, settings["batch_size"]),
+        max_batches=settings["max_batches"],
+        batch_pause_seconds=settings["batch_pause_ms"] / 1000,
+        lock_timeout_ms=settings["lock_timeout_ms"],
+        on_progress=on_progress,
+    )
+
+
+def _run_scheduled(settings: Dict[str, int]):
+    result = _reap_with_settings(settings)
+    if result.projects:
+        logging.info(
+            "Guest reaper: %s projects deleted in %s batches (%s)",
+            result.projects,
+            result.batches,
+            result.rows,
+        )
+
+
+@click.command("reap-guests")
+@click.option("--ttl-hours", type=int, default=None, help="Age after which claimed guest projects are deleted.")
+@click.option("--batch-size", type=int, default=None, help="Projects deleted per transaction.")
+@click.option("--max-batches", type=int, default=None, help="Stop after this many batches (0 = no limit).")
+@click.option("--batch-pause-ms", type=int, default=None, help="Pause between batches.")
+@with_appcontext
+def reap_guests_command(ttl_hours, batch_size, max_batches, batch_pause_ms):
+    """Delete expired guest projects in bounded batches."""
+    settings = _settings()
+    overrides = {
+        "ttl_hours": ttl_hours,
+        "batch_size": batch_size,
+        "max_batches": max_batches,
+        "batch_pause_ms": batch_pause_ms,
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+
+    def report(result: ReapResult):
+        click.echo(f"batch {result.batches}: {result.projects} projects deleted so far {result.rows}")
+
+    result = _reap_with_settings(settings, on_progress=report)
+    click.echo(f"Done: {result.projects} guest projects deleted in {result.batches} batches.")
+
+
+def register_reaper(app: Flask) -> Optional[threading.Event]:
+    app.cli.add_command(reap_guests_command)
+
+    settings = _settings()
+    if settings["interval_ms"] <= 0:
+        return None
+
+    return start_periodic_task(
+        app,
+        "guest-reaper",
+        settings["interval_ms"] / 1000,
+        lambda: _run_scheduled(settings),
+    )
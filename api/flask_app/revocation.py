@@ -0,0 +1,209 @@
+"""Revoked-token checks without a database read per request.
+
+Revoked token ids (`jti`) are stored in `revoked_token`. Each worker keeps a Bloom filter of
+them, filled at startup and topped up every `REVOCATION_REFRESH_INTERVAL_MS` with the rows
+revoked since the last refresh. A token the filter has never seen is accepted without a
+query; only a probable hit is confirmed against the table. Tokens revoked by this worker are
+added immediately, others once the next refresh runs.
+"""
+import math
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+from typing import Any, Dict, Iterable, Optional
+
+from flask import Flask
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from . import metrics
+from .background import start_periodic_task
+from .extensions import db
+from .models import RevokedToken, utcnow
+
+
+# Re-read rows revoked this long before the last refresh, so transactions that committed
+# after a refresh with an earlier `revokedAt` are still picked up.
+REFRESH_OVERLAP = timedelta(seconds=60)
+REBUILD_INTERVAL = timedelta(hours=1)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._refreshed_at: Optional[datetime] = None
+        self._rebuilt_at: Optional[datetime] = None
+
+    def might_contain(self, jti: str) -> bool:
+        return jti in self._bloom
+
+    def add(self, jti: str):
+        with self._lock:
+            self._bloom.add(jti)
+
+    def rebuild(self):
+        """Reload every unexpired revocation into a fresh, right-sized filter."""
+        now = utcnow()
+        jtis = db.session.execute(
+            select(RevokedToken.jti).where(RevokedToken.expiresAt > now)
+        ).scalars().all()
+        db.session.rollback()
+
+        bloom = BloomFilter(max(self.capacity, len(jtis) * 2), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+
+        with self._lock:
+            self._bloom = bloom
+            self._refreshed_at = now
+            self._rebuilt_at = now
+        metrics.set_gauge("revocation.filter_entries", bloom.count)
+
+    def refresh(self):
+        if self._rebuilt_at is None or utcnow() - self._rebuilt_at >= REBUILD_INTERVAL:
+            purge_expired_revocations()
+            self.rebuild()
+            return
+
+        now = utcnow()
+        jtis = db.session.execute(
+            select(RevokedToken.jti).where(RevokedToken.revokedAt >= self._refreshed_at - REFRESH_OVERLAP)
+        ).scalars().all()
+        db.session.rollback()
+
+        with self._lock:
+            for jti in jtis:
+                self._bloom.add(jti)
+            self._refreshed_at = now
+            count, capacity = self._bloom.count, self._bloom.capacity
+        metrics.set_gauge("revocation.filter_entries", count)
+
+        if count > capacity:
+            self.rebuild()
+
+
+_filter: Optional[RevocationFilter] = None
+
+
+def might_be_revoked(jti: str) -> bool:
+    """False when the filter rules the token out; otherwise the table has to be checked."""
+    return _filter is None or _filter.might_contain(jti)
+
+
+def revoked_token_select(jti: str):
+    return select(RevokedToken.id).where(RevokedToken.jti == jti)
+
+
+def record_revocation_check(revoked: bool):
+    if _filter is not None:
+        metrics.increment("revocation.confirmed" if revoked else "revocation.false_positives")
+
+
+def is_token_revoked(jti: str) -> bool:
+    if not might_be_revoked(jti):
+        return False
+
+    revoked = db.session.execute(revoked_token_select(jti)).first() is not None
+    record_revocation_check(revoked)
+    return revoked
+
+
+def _revoked_token(payload: Dict[str, Any]) -> RevokedToken:
+    return RevokedToken(
+        jti=payload["jti"],
+        userId=int(payload["sub"]),
+        expiresAt=datetime.fromtimestamp(payload["exp"], timezone.utc),
+    )
+
+
+def revoke_tokens(payloads: Iterable[Dict[str, Any]]):
+    """Record the given decoded tokens as revoked and commit."""
+    payloads = [payload for payload in payloads if payload.get("jti")]
+    for payload in payloads:
+        try:
+            with db.session.begin_nested():
+                db.session.add(_revoked_token(payload))
+        except IntegrityError:
+            # Already revoked, e.g. by a repeated logout.
+            pass
+    db.session.commit()
+
+    for payload in payloads:
+        if _filter is not None:
+            _filter.add(payload["jti"])
+    metrics.increment("revocation.revoked", len(payloads))
+
+
+def consume_token(payload: Dict[str, Any]) -> bool:
+    """Revoke a single-use token and commit; False when it had already been revoked.
+
+    The unique `jti` insert decides, not the filter, so a token replayed on a worker whose
+    filter is behind, or sent by two requests at once, is accepted only once.
+    """
+    db.session.add(_revoked_token(payload))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        metrics.increment("revocation.reused")
+        return False
+
+    if _filter is not None:
+        _filter.add(payload["jti"])
+    metrics.increment("revocation.revoked")
+    return True
+
+
+def purge_expired_revocations() -> int:
+    result = db.session.execute(
+        delete(RevokedToken).where(RevokedToken.expiresAt < utcnow()),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def start_revocation_refresher(app: Flask) -> Optional[threading.Event]:
+    """Check revocations through a refreshed in-memory filter; with no interval, query every time."""
+    global _filter
+
+    interval_ms = int(os.getenv("REVOCATION_REFRESH_INTERVAL_MS", "5000"))
+    if interval_ms <= 0:
+        _filter = None
+        return None
+
+    _filter = RevocationFilter(
+        int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000")),
+        float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001")),
+    )
+    with app.app_context():
+        _filter.rebuild()
+
+    return start_periodic_task(app, "revocation-filter-refresh", interval_ms / 1000, _filter.refresh)
@@ -1,38 +1,134 @@
 from __future__ import annotations
 
+import hmac
 import os
-from typing import Any, Dict, List
-
-from flask import Blueprint, g, jsonify, request
-from sqlalchemy import func, or_
-from sqlalchemy.orm import joinedload
-
-from .auth import require_auth, sign_token
-from .errors import BadUserInputError, EntityNotFoundError, RouteNotFoundError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Blueprint, current_app, g, jsonify, request, send_file, stream_with_context
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+from . import cache, change_stream, metrics
+from .analytics import GROUP_BY_OPTIONS, MAX_WEEKS, project_analytics
+from .archive import unarchive_issue
+from .attachments import attachment_path, save_attachment
+from .auth import REFRESH_TOKEN, issue_tokens, require_auth, verify_token
+from .board_payload import load_board_payload
+from .errors import (
+    BadUserInputError,
+    EntityNotFoundError,
+    InvalidTokenError,
+    RouteNotFoundError,
+    VersionConflictError,
+)
 from .extensions import db
-from .models import Comment, Issue, Project, User
+from .guest_pool import claim_guest_account
+from .idempotency import idempotent
+from .issue_filters import compile_issue_query, parse_issue_filter
+from .memory_profile import clear_memory_profiles, memory_phase, memory_profile_summary
+from .models import (
+    Activity,
+    Attachment,
+    Comment,
+    Issue,
+    Project,
+    User,
+    issue_archive,
+    issue_users_user,
+    issue_users_user_archive,
+    project_member,
+    utcnow,
+)
+from .project_transfer import (
+    EXPORT_FORMATS,
+    InvalidImportRecordError,
+    import_project_records,
+    iter_export_records,
+    read_csv,
+    read_ndjson,
+    stream_csv,
+    stream_ndjson,
+)
+from .read_models import issue_details, issue_summaries, issue_summaries_select
+from .revocation import consume_token, revoke_tokens
+from .schemas import (
+    ATTACHMENT_SCHEMA,
+    COMMENT_BODY_SCHEMA,
+    COMMENT_SCHEMA,
+    ISSUE_SCHEMA,
+    MEMBER_SCHEMA,
+    PROJECT_SCHEMA,
+)
 from .seeds import create_guest_account, create_test_account, reset_database
 from .serializers import (
+    serialize_activity,
+    serialize_archived_issue,
+    serialize_attachment,
     serialize_comment,
     serialize_issue,
-    serialize_project,
+    serialize_issue_partial,
     serialize_project_basic,
     serialize_user,
 )
-from .validators import (
-    validate_comment_payload,
-    validate_issue_payload,
-    validate_project_payload,
-)
+from .tenant import current_project_id, shares_project_filter, tenant_filter
 
 
 api = Blueprint("api", __name__)
 
+MAX_MULTI_GET_IDS = 200
+
+# Served inline; anything else is downloaded, so an uploaded page or SVG can't run scripts.
+INLINE_ATTACHMENT_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp"}
+
+MY_ISSUES_SORT_COLUMNS = {
+    "updatedAt": Issue.updatedAt,
+    "createdAt": Issue.createdAt,
+    "priority": Issue.priority,
+    "listPosition": Issue.listPosition,
+}
+
 
 @api.route("/authentication/guest", methods=["POST"])
 def authentication_guest():
-    user = create_guest_account()
-    return jsonify({"authToken": sign_token({"sub": user.id})})
+    user_id = claim_guest_account()
+    if user_id is None:
+        user_id = create_guest_account().id
+    return jsonify(issue_tokens(user_id))
+
+
+@api.route("/authentication/refresh", methods=["POST"])
+def authentication_refresh():
+    payload = _refresh_token_payload()
+    if payload is None:
+        raise InvalidTokenError("Refresh token not found.")
+    if not db.session.get(User, int(payload["sub"])):
+        raise InvalidTokenError("Refresh token is invalid.")
+
+    # Refresh tokens are single use: each refresh revokes the one it was given, and only the
+    # request whose revocation is inserted first gets a new pair.
+    if not consume_token(payload):
+        raise InvalidTokenError("Refresh token is invalid.")
+    return jsonify(issue_tokens(int(payload["sub"])))
+
+
+@api.route("/authentication/logout", methods=["POST"])
+@require_auth
+def authentication_logout():
+    revoked = [g.token_payload]
+    refresh_payload = _refresh_token_payload()
+    if refresh_payload and refresh_payload["sub"] == g.token_payload["sub"]:
+        revoked.append(refresh_payload)
+
+    revoke_tokens(revoked)
+    return jsonify(True)
+
+
+def _refresh_token_payload() -> Optional[Dict[str, Any]]:
+    token = (request.get_json(silent=True) or {}).get("refreshToken")
+    if not isinstance(token, str) or not token:
+        return None
+    return verify_token(token, REFRESH_TOKEN)
 
 
 @api.route("/currentUser", methods=["GET"])
@@ -41,201 +137,569 @@ def current_user():
     return jsonify({"currentUser": serialize_user(g.current_user)})
 
 
-@api.route("/project", methods=["GET"])
+@api.route("/users/me/issues", methods=["GET"])
 @require_auth
-def get_project():
-    project = (
-        Project.query.options(
-            joinedload(Project.users),
-            joinedload(Project.issues).joinedload(Issue.users),
+def get_my_issues():
+    limit, offset = _get_pagination()
+
+    sort = request.args.get("sort", "updatedAt")
+    order = request.args.get("order", "desc")
+
+    errors: Dict[str, str] = {}
+    if sort not in MY_ISSUES_SORT_COLUMNS:
+        errors["sort"] = f"Must be one of: {', '.join(sorted(MY_ISSUES_SORT_COLUMNS))}"
+    if order not in ("asc", "desc"):
+        errors["order"] = "Must be one of: asc, desc"
+    if errors:
+        raise BadUserInputError({"fields": errors})
+
+    sort_column = MY_ISSUES_SORT_COLUMNS[sort]
+    order_by = (
+        [sort_column.asc(), Issue.id.asc()]
+        if order == "asc"
+        else [sort_column.desc(), Issue.id.desc()]
+    )
+
+    issues = issue_summaries(
+        db.session.execute(
+            issue_summaries_select()
+            .join(issue_users_user, issue_users_user.c.issueId == Issue.id)
+            .where(issue_users_user.c.userId == g.current_user.id, tenant_filter(Issue))
+            .order_by(*order_by)
+            .offset(offset)
+            .limit(limit + 1)
         )
-        .filter(Project.id == g.current_user.projectId)
-        .first()
     )
 
-    if not project:
-        raise EntityNotFoundError("Project")
+    return jsonify(
+        {
+            "issues": [serialize_issue_partial(issue) for issue in issues[:limit]],
+            "pagination": {"limit": limit, "offset": offset, "hasMore": len(issues) > limit},
+        }
+    )
+
 
-    return jsonify({"project": serialize_project(project, partial_issues=True)})
+@api.route("/project", methods=["GET"])
+@require_auth
+def get_project():
+    project_id = current_project_id()
+    body = cache.cached_payload("project", project_id, lambda: load_board_payload(project_id))
+    return current_app.response_class(body, mimetype="application/json")
 
 
 @api.route("/project", methods=["PUT"])
 @require_auth
 def update_project():
-    payload = request.get_json(silent=True) or {}
-    errors = validate_project_payload(payload)
+    values, errors = PROJECT_SCHEMA.load(request.get_json(silent=True) or {})
+    if errors:
+        raise BadUserInputError({"fields": errors})
+
+    project = _commit_versioned(
+        Project.query.filter(tenant_filter(Project)),
+        lambda project: PROJECT_SCHEMA.apply(project, values),
+        serialize_project_basic,
+    )
+    return jsonify({"project": serialize_project_basic(project)})
+
+
+@api.route("/projects", methods=["GET"])
+@require_auth
+def get_projects():
+    member_of = select(project_member.c.projectId).where(project_member.c.userId == g.current_user.id)
+    projects = (
+        Project.query.filter(or_(Project.id == g.current_user.projectId, Project.id.in_(member_of)))
+        .order_by(Project.id)
+        .all()
+    )
+    return jsonify(
+        {
+            "projects": [serialize_project_basic(project) for project in projects],
+            "selectedProjectId": current_project_id(),
+        }
+    )
+
+
+@api.route("/project/members", methods=["POST"])
+@require_auth
+def add_project_member():
+    values, errors = MEMBER_SCHEMA.load(request.get_json(silent=True) or {})
     if errors:
         raise BadUserInputError({"fields": errors})
 
-    project = Project.query.filter(Project.id == g.current_user.projectId).first()
+    project = _selected_project()
+    # Only people the caller already works with; anyone else is reported as not found.
+    user = User.query.filter(User.id == values["userId"], shares_project_filter(g.current_user)).first()
+    if not user:
+        raise EntityNotFoundError("User")
+
+    if user not in project.members:
+        project.members.append(user)
+        db.session.commit()
+    return jsonify({"users": [serialize_user(member) for member in project.members]})
+
+
+@api.route("/project/members/<int:user_id>", methods=["DELETE"])
+@require_auth
+def remove_project_member(user_id: int):
+    project = _selected_project()
+    user = next((member for member in project.members if member.id == user_id), None)
+    if not user:
+        raise EntityNotFoundError("Project member")
+    if user.projectId == project.id:
+        raise BadUserInputError({"fields": {"userId": "Cannot be removed from their own project"}})
+
+    # Through the ORM, so unassigning is recorded and invalidated like any other issue update.
+    assigned = (
+        Issue.query.join(issue_users_user, issue_users_user.c.issueId == Issue.id)
+        .filter(issue_users_user.c.userId == user_id, tenant_filter(Issue))
+        .all()
+    )
+    for issue in assigned:
+        issue.users.remove(user)
+        issue.updatedAt = utcnow()
+    project.members.remove(user)
+    db.session.commit()
+
+    return jsonify({"users": [serialize_user(member) for member in project.members]})
+
+
+def _selected_project() -> Project:
+    project = Project.query.filter(tenant_filter(Project)).first()
     if not project:
         raise EntityNotFoundError("Project")
+    return project
 
-    project.name = payload.get("name")
-    project.url = payload.get("url")
-    project.description = payload.get("description")
-    project.category = payload.get("category")
+
+@api.route("/project/analytics", methods=["GET"])
+@require_auth
+def get_project_analytics():
+    group_by = request.args.get("groupBy", "project")
+
+    errors = {}
+    if group_by not in GROUP_BY_OPTIONS:
+        errors["groupBy"] = f"Must be one of: {', '.join(sorted(GROUP_BY_OPTIONS))}"
+    try:
+        weeks = int(request.args.get("weeks", 12))
+        if not 1 <= weeks <= MAX_WEEKS:
+            raise ValueError
+    except ValueError:
+        errors["weeks"] = f"Must be a number from 1 to {MAX_WEEKS}"
+    if errors:
+        raise BadUserInputError({"fields": errors})
+
+    project_id = current_project_id()
+    now = utcnow()
+
+    def load() -> bytes:
+        report = project_analytics(project_id, group_by, weeks, now)
+        return jsonify({"analytics": report}).get_data()
+
+    # Cached with the board, so any change to the project's issues recomputes it; the date
+    # in the variant moves the weekly buckets forward at midnight.
+    body = cache.cached_payload(
+        "project", project_id, load, variant=f"analytics:{group_by}:{weeks}:{now.date().isoformat()}"
+    )
+    return current_app.response_class(body, mimetype="application/json")
+
+
+@api.route("/project/events", methods=["GET"])
+@require_auth
+def stream_project_events():
+    subscription = change_stream.subscribe(current_project_id())
+    # The stream outlives the request context, so it holds no database connection.
+    return current_app.response_class(
+        change_stream.stream_changes(subscription),
+        mimetype="text/event-stream",
+        headers=change_stream.STREAM_HEADERS,
+    )
+
+
+@api.route("/project/export", methods=["GET"])
+@require_auth
+def export_project():
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        raise BadUserInputError(
+            {"fields": {"format": f"Must be one of: {', '.join(sorted(EXPORT_FORMATS))}"}}
+        )
+
+    records = iter_export_records(current_project_id())
+    chunks = stream_csv(records) if export_format == "csv" else stream_ndjson(records)
+
+    response = current_app.response_class(
+        stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format]
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename=project.{export_format}"
+    return response
+
+
+@api.route("/project/import", methods=["POST"])
+@require_auth
+def import_project():
+    import_format = request.args.get("format", "ndjson")
+    if import_format not in EXPORT_FORMATS:
+        raise BadUserInputError(
+            {"fields": {"format": f"Must be one of: {', '.join(sorted(EXPORT_FORMATS))}"}}
+        )
+
+    project_id = current_project_id()
+    records = read_csv(request.stream) if import_format == "csv" else read_ndjson(request.stream)
+
+    try:
+        importer = import_project_records(records, project_id, g.current_user.id)
+    except InvalidImportRecordError as error:
+        db.session.rollback()
+        raise BadUserInputError({"record": error.record_number, "fields": error.errors})
 
     db.session.commit()
-    return jsonify({"project": serialize_project_basic(project)})
+    # Bulk inserts bypass the session events that invalidate cached payloads.
+    cache.invalidate("project", project_id)
+
+    return jsonify({"imported": {"issues": importer.issue_count, "comments": importer.comment_count}})
 
 
 @api.route("/issues", methods=["GET"])
 @require_auth
 def get_issues():
+    if "ids" in request.args:
+        ids = [item.strip() for item in request.args["ids"].split(",") if item.strip()]
+        include_comments = request.args.get("includeComments") == "true"
+        return _multi_get_issues(ids, include_comments)
+
     search_term = (request.args.get("searchTerm") or "").strip()
 
-    query = Issue.query.options(joinedload(Issue.users)).filter(
-        Issue.projectId == g.current_user.projectId
-    )
+    issue_filter, errors = parse_issue_filter(request.args.get("filter") or "", g.current_user.id)
+    if errors:
+        raise BadUserInputError({"fields": errors})
 
+    params = {**issue_filter.params, "project_id": current_project_id()}
     if search_term:
-        search_pattern = f"%{search_term}%"
-        query = query.filter(
-            or_(Issue.title.ilike(search_pattern), Issue.descriptionText.ilike(search_pattern))
-        )
+        params["search_pattern"] = f"%{search_term}%"
 
-    issues = query.all()
+    statement = compile_issue_query(issue_filter.shape, bool(search_term))
+    issues = issue_details(db.session.execute(statement, params))
     return jsonify({"issues": [serialize_issue(issue) for issue in issues]})
 
 
+@api.route("/issues/lookup", methods=["POST"])
+@require_auth
+def lookup_issues():
+    payload = request.get_json(silent=True) or {}
+    ids = payload.get("ids")
+    if not isinstance(ids, list):
+        raise BadUserInputError({"fields": {"ids": "Must be an array"}})
+    return _multi_get_issues(ids, payload.get("includeComments") is True)
+
+
+def _multi_get_issues(raw_ids: List[Any], include_comments: bool):
+    issue_ids: List[int] = []
+    seen = set()
+    for raw_id in raw_ids:
+        try:
+            issue_id = int(raw_id)
+        except (TypeError, ValueError):
+            raise BadUserInputError({"fields": {"ids": "Must be a list of issue ids"}})
+        if issue_id not in seen:
+            seen.add(issue_id)
+            issue_ids.append(issue_id)
+
+    if len(issue_ids) > MAX_MULTI_GET_IDS:
+        raise BadUserInputError({"fields": {"ids": f"Must contain at most {MAX_MULTI_GET_IDS} ids"}})
+
+    options = [selectinload(Issue.users)]
+    if include_comments:
+        options.append(selectinload(Issue.comments).joinedload(Comment.user))
+
+    issues = (
+        Issue.query.options(*options)
+        .filter(Issue.id.in_(issue_ids), tenant_filter(Issue))
+        .all()
+        if issue_ids
+        else []
+    )
+    issues_by_id = {issue.id: issue for issue in issues}
+
+    return jsonify(
+        {
+            "issues": [
+                serialize_issue(
+                    issues_by_id[issue_id], include_users=True, include_comments=include_comments
+                )
+                for issue_id in issue_ids
+                if issue_id in issues_by_id
+            ],
+            "missingIds": [issue_id for issue_id in issue_ids if issue_id not in issues_by_id],
+        }
+    )
+
+
 @api.route("/issues/<int:issue_id>", methods=["GET"])
 @require_auth
 def get_issue(issue_id: int):
-    issue = (
-        Issue.query.options(
-            joinedload(Issue.users),
-            joinedload(Issue.comments).joinedload(Comment.user),
-        )
-        .filter(Issue.id == issue_id)
-        .first()
+    # Per project, so a cached body is never served to members of another project.
+    body = cache.cached_payload(
+        "issue", issue_id, lambda: _load_issue_body(issue_id), variant=f"project:{current_project_id()}"
     )
+    return current_app.response_class(body, mimetype="application/json")
+
+
+def _load_issue_body(issue_id: int) -> bytes:
+    with memory_phase("load"):
+        issue = (
+            Issue.query.options(
+                joinedload(Issue.users),
+                joinedload(Issue.comments).joinedload(Comment.user),
+                selectinload(Issue.attachments),
+            )
+            .filter(Issue.id == issue_id, tenant_filter(Issue))
+            .first()
+        )
 
     if not issue:
         raise EntityNotFoundError("Issue")
 
-    return jsonify({"issue": serialize_issue(issue, include_users=True, include_comments=True)})
+    with memory_phase("serialize"):
+        payload = {
+            "issue": serialize_issue(
+                issue, include_users=True, include_comments=True, include_attachments=True
+            )
+        }
+    with memory_phase("encode"):
+        return jsonify(payload).get_data()
+
+
+@api.route("/issues/archived", methods=["GET"])
+@require_auth
+def get_archived_issues():
+    limit, offset = _get_pagination()
+    search_term = (request.args.get("searchTerm") or "").strip()
+
+    statement = select(issue_archive).where(tenant_filter(issue_archive))
+    if search_term:
+        search_pattern = f"%{search_term}%"
+        statement = statement.where(
+            or_(
+                issue_archive.c.title.ilike(search_pattern),
+                issue_archive.c.descriptionText.ilike(search_pattern),
+            )
+        )
+
+    rows = db.session.execute(
+        statement.order_by(issue_archive.c.archivedAt.desc(), issue_archive.c.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+    ).all()
+
+    user_ids: Dict[int, List[int]] = {row.id: [] for row in rows[:limit]}
+    if user_ids:
+        for issue_id, user_id in db.session.execute(
+            select(issue_users_user_archive.c.issueId, issue_users_user_archive.c.userId).where(
+                issue_users_user_archive.c.issueId.in_(list(user_ids))
+            )
+        ):
+            user_ids[issue_id].append(user_id)
+
+    return jsonify(
+        {
+            "issues": [serialize_archived_issue(row, user_ids[row.id]) for row in rows[:limit]],
+            "pagination": {"limit": limit, "offset": offset, "hasMore": len(rows) > limit},
+        }
+    )
+
+
+@api.route("/issues/<int:issue_id>/unarchive", methods=["POST"])
+@require_auth
+def unarchive_issue_route(issue_id: int):
+    if not unarchive_issue(issue_id, current_project_id()):
+        raise EntityNotFoundError("Archived issue")
+
+    issue = _issue_with_users(issue_id).first()
+    return jsonify({"issue": serialize_issue(issue, include_users=True)})
+
+
+@api.route("/issues/<int:issue_id>/activity", methods=["GET"])
+@require_auth
+def get_issue_activity(issue_id: int):
+    limit, offset = _get_pagination()
+
+    activities = (
+        Activity.query.filter(
+            Activity.issueId == issue_id,
+            tenant_filter(Activity),
+        )
+        .order_by(Activity.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+
+    return jsonify(
+        {
+            "activity": [serialize_activity(activity) for activity in activities[:limit]],
+            "pagination": {"limit": limit, "offset": offset, "hasMore": len(activities) > limit},
+        }
+    )
 
 
 @api.route("/issues", methods=["POST"])
 @require_auth
+@idempotent
 def create_issue():
     payload = request.get_json(silent=True) or {}
-    errors = validate_issue_payload(payload, partial=False)
+    values, errors = ISSUE_SCHEMA.load(payload)
+    _check_selected_project(values, errors)
     if errors:
         raise BadUserInputError({"fields": errors})
 
-    project_id = int(payload["projectId"])
-    status = payload["status"]
-
     min_list_position = (
         db.session.query(func.min(Issue.listPosition))
-        .filter(Issue.projectId == project_id, Issue.status == status)
+        .filter(Issue.projectId == values["projectId"], Issue.status == values["status"])
         .scalar()
     )
+    values["listPosition"] = float(min_list_position - 1) if min_list_position is not None else 1.0
 
-    list_position = (min_list_position - 1) if min_list_position is not None else 1
-
-    issue = Issue(
-        title=payload.get("title"),
-        type=payload.get("type"),
-        status=status,
-        priority=payload.get("priority"),
-        listPosition=float(list_position),
-        description=payload.get("description"),
-        estimate=payload.get("estimate"),
-        timeSpent=payload.get("timeSpent"),
-        timeRemaining=payload.get("timeRemaining"),
-        reporterId=int(payload.get("reporterId")),
-        projectId=project_id,
-    )
-
+    issue = Issue()
+    ISSUE_SCHEMA.apply(issue, values)
     issue.users = _resolve_users(payload)
 
     db.session.add(issue)
     db.session.commit()
 
-    issue = Issue.query.options(joinedload(Issue.users)).filter(Issue.id == issue.id).first()
+    issue = _issue_with_users(issue.id).first()
     return jsonify({"issue": serialize_issue(issue, include_users=True)})
 
 
 @api.route("/issues/<int:issue_id>", methods=["PUT"])
 @require_auth
 def update_issue(issue_id: int):
-    issue = Issue.query.options(joinedload(Issue.users)).filter(Issue.id == issue_id).first()
-    if not issue:
-        raise EntityNotFoundError("Issue")
-
     payload = request.get_json(silent=True) or {}
-    errors = validate_issue_payload(payload, partial=True)
+    values, errors = ISSUE_SCHEMA.load(payload, partial=True)
+    _check_selected_project(values, errors)
     if errors:
         raise BadUserInputError({"fields": errors})
 
-    if "title" in payload:
-        issue.title = payload.get("title")
-    if "type" in payload:
-        issue.type = payload.get("type")
-    if "status" in payload:
-        issue.status = payload.get("status")
-    if "priority" in payload:
-        issue.priority = payload.get("priority")
-    if "listPosition" in payload:
-        issue.listPosition = float(payload.get("listPosition"))
-    if "description" in payload:
-        issue.description = payload.get("description")
-    if "estimate" in payload:
-        issue.estimate = payload.get("estimate")
-    if "timeSpent" in payload:
-        issue.timeSpent = payload.get("timeSpent")
-    if "timeRemaining" in payload:
-        issue.timeRemaining = payload.get("timeRemaining")
-    if "reporterId" in payload:
-        issue.reporterId = int(payload.get("reporterId"))
-    if "projectId" in payload and payload.get("projectId") is not None:
-        issue.projectId = int(payload.get("projectId"))
-
-    if "userIds" in payload or "users" in payload:
-        issue.users = _resolve_users(payload)
+    def update(issue: Issue):
+        ISSUE_SCHEMA.apply(issue, values)
+        if "userIds" in payload or "users" in payload:
+            users = _resolve_users(payload)
+            if sorted(user.id for user in users) != sorted(user.id for user in issue.users):
+                issue.users = users
+                # Assignees live in another table; touching the row checks and bumps its version.
+                issue.updatedAt = utcnow()
 
-    db.session.commit()
+    _commit_versioned(_issue_with_users(issue_id), update, _serialize_with_users)
 
-    issue = Issue.query.options(joinedload(Issue.users)).filter(Issue.id == issue.id).first()
+    issue = _issue_with_users(issue_id).first()
     return jsonify({"issue": serialize_issue(issue, include_users=True)})
 
 
 @api.route("/issues/<int:issue_id>", methods=["DELETE"])
 @require_auth
 def delete_issue(issue_id: int):
-    issue = Issue.query.options(joinedload(Issue.users)).filter(Issue.id == issue_id).first()
+    deleted: Dict[str, Any] = {}
+
+    def delete(issue: Issue):
+        deleted["issue"] = serialize_issue(issue, include_users=True)
+        db.session.delete(issue)
+
+    _commit_versioned(_issue_with_users(issue_id), delete, _serialize_with_users)
+    return jsonify(deleted)
+
+
+def _check_selected_project(values: Dict[str, Any], errors: Dict[str, str]):
+    # Issues stay in the project they were created in; moving them between projects isn't supported.
+    if "projectId" in values and values["projectId"] != current_project_id():
+        errors["projectId"] = "Must be the selected project"
+
+
+def _issue_with_users(issue_id: int):
+    return Issue.query.options(joinedload(Issue.users)).filter(Issue.id == issue_id, tenant_filter(Issue))
+
+
+def _serialize_with_users(issue: Issue) -> Dict[str, Any]:
+    return serialize_issue(issue, include_users=True)
+
+
+@api.route("/issues/<int:issue_id>/attachments", methods=["POST"])
+@require_auth
+def upload_attachment(issue_id: int):
+    issue = Issue.query.filter(Issue.id == issue_id, tenant_filter(Issue)).first()
     if not issue:
         raise EntityNotFoundError("Issue")
 
-    issue_data = serialize_issue(issue, include_users=True)
-    db.session.delete(issue)
+    values, errors = ATTACHMENT_SCHEMA.load(
+        {
+            "filename": request.args.get("filename"),
+            "contentType": request.mimetype or "application/octet-stream",
+        }
+    )
+    if errors:
+        raise BadUserInputError({"fields": errors})
+
+    attachment = save_attachment(
+        issue, request.stream, values["filename"], values["contentType"], g.current_user.id
+    )
     db.session.commit()
 
-    return jsonify({"issue": issue_data})
+    return jsonify({"attachment": serialize_attachment(attachment)})
 
 
-@api.route("/comments", methods=["POST"])
+@api.route("/attachments/<int:attachment_id>", methods=["GET"])
 @require_auth
-def create_comment():
-    payload = request.get_json(silent=True) or {}
-    errors = validate_comment_payload(payload, partial=False)
+def download_attachment(attachment_id: int):
+    attachment = _find_attachment(attachment_id)
+    try:
+        response = send_file(
+            attachment_path(attachment),
+            mimetype=attachment.contentType,
+            as_attachment=attachment.contentType not in INLINE_ATTACHMENT_TYPES,
+            download_name=attachment.filename,
+            etag=attachment.sha256,
+            max_age=86400,
+        )
+    except FileNotFoundError:
+        raise EntityNotFoundError("Attachment")
+
+    # send_file marks responses with a max_age as public; these are per-user.
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+@api.route("/attachments/<int:attachment_id>", methods=["DELETE"])
+@require_auth
+def delete_attachment(attachment_id: int):
+    attachment = _find_attachment(attachment_id)
+    attachment_data = serialize_attachment(attachment)
+    db.session.delete(attachment)
+    db.session.commit()
+
+    return jsonify({"attachment": attachment_data})
+
 
-    if payload.get("issueId") is None:
-        errors["issueId"] = "This field is required"
-    if payload.get("userId") is None:
-        errors["userId"] = "This field is required"
+def _find_attachment(attachment_id: int) -> Attachment:
+    attachment = Attachment.query.filter(
+        Attachment.id == attachment_id, tenant_filter(Attachment)
+    ).first()
+    if not attachment:
+        raise EntityNotFoundError("Attachment")
+    return attachment
 
+
+@api.route("/comments", methods=["POST"])
+@require_auth
+@idempotent
+def create_comment():
+    values, errors = COMMENT_SCHEMA.load(request.get_json(silent=True) or {})
     if errors:
         raise BadUserInputError({"fields": errors})
+    issue_in_project = select(Issue.id).where(Issue.id == values["issueId"], tenant_filter(Issue))
+    if db.session.execute(issue_in_project).first() is None:
+        raise EntityNotFoundError("Issue")
 
-    comment = Comment(
-        body=payload.get("body"),
-        issueId=int(payload.get("issueId")),
-        userId=int(payload.get("userId")),
-    )
+    comment = Comment()
+    COMMENT_SCHEMA.apply(comment, values)
     db.session.add(comment)
     db.session.commit()
 
@@ -245,40 +709,56 @@ def create_comment():
 @api.route("/comments/<int:comment_id>", methods=["PUT"])
 @require_auth
 def update_comment(comment_id: int):
-    comment = Comment.query.filter(Comment.id == comment_id).first()
-    if not comment:
-        raise EntityNotFoundError("Comment")
-
-    payload = request.get_json(silent=True) or {}
-    errors = validate_comment_payload(payload, partial=False)
-
+    values, errors = COMMENT_BODY_SCHEMA.load(request.get_json(silent=True) or {})
     if errors:
         raise BadUserInputError({"fields": errors})
 
-    comment.body = payload.get("body")
-    db.session.commit()
-
+    comment = _commit_versioned(
+        Comment.query.filter(Comment.id == comment_id, tenant_filter(Comment)),
+        lambda comment: COMMENT_BODY_SCHEMA.apply(comment, values),
+        serialize_comment,
+    )
     return jsonify({"comment": serialize_comment(comment)})
 
 
 @api.route("/comments/<int:comment_id>", methods=["DELETE"])
 @require_auth
 def delete_comment(comment_id: int):
-    comment = Comment.query.filter(Comment.id == comment_id).first()
-    if not comment:
-        raise EntityNotFoundError("Comment")
+    deleted: Dict[str, Any] = {}
 
-    comment_data = serialize_comment(comment)
-    db.session.delete(comment)
-    db.session.commit()
+    def delete(comment: Comment):
+        deleted["comment"] = serialize_comment(comment)
+        db.session.delete(comment)
+
+    _commit_versioned(
+        Comment.query.filter(Comment.id == comment_id, tenant_filter(Comment)), delete, serialize_comment
+    )
+    return jsonify(deleted)
 
-    return jsonify({"comment": comment_data})
+
+@api.route("/metrics", methods=["GET"])
+def get_metrics():
+    return jsonify({"metrics": metrics.snapshot()})
+
+
+@api.route("/admin/memory-profiles", methods=["GET"])
+def get_memory_profiles():
+    _assert_admin()
+    return jsonify(memory_profile_summary())
+
+
+@api.route("/admin/memory-profiles", methods=["DELETE"])
+def delete_memory_profiles():
+    _assert_admin()
+    clear_memory_profiles()
+    return jsonify(True)
 
 
 @api.route("/test/reset-database", methods=["DELETE"])
 def test_reset_database():
     _assert_test_mode()
     reset_database()
+    cache.clear()
     return jsonify(True)
 
 
@@ -286,7 +766,7 @@ def test_reset_database():
 def test_create_account():
     _assert_test_mode()
     user = create_test_account()
-    return jsonify({"authToken": sign_token({"sub": user.id})})
+    return jsonify(issue_tokens(user.id))
 
 
 
@@ -295,12 +775,89 @@ def _assert_test_mode():
         raise RouteNotFoundError(request.path)
 
 
+def _assert_admin():
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    provided = request.headers.get("X-Admin-Token", "")
+    if not admin_token or not hmac.compare_digest(provided.encode(), admin_token.encode()):
+        raise RouteNotFoundError(request.path)
+
+
+def _get_pagination(default_limit: int = 50, max_limit: int = 100) -> Tuple[int, int]:
+    errors: Dict[str, str] = {}
+
+    try:
+        limit = int(request.args.get("limit", default_limit))
+        if not 1 <= limit <= max_limit:
+            raise ValueError
+    except ValueError:
+        errors["limit"] = f"Must be a number between 1 and {max_limit}"
+        limit = default_limit
+
+    try:
+        offset = int(request.args.get("offset", 0))
+        if offset < 0:
+            raise ValueError
+    except ValueError:
+        errors["offset"] = "Must be a non-negative number"
+        offset = 0
+
+    if errors:
+        raise BadUserInputError({"fields": errors})
+
+    return limit, offset
+
+
+def _if_match_version() -> Optional[int]:
+    """The version sent as `If-Match: "3"` (quotes and `W/` optional); None when absent or `*`."""
+    value = request.headers.get("If-Match", "").strip()
+    if value in ("", "*"):
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise BadUserInputError({"fields": {"If-Match": "Must be a version number"}})
+
+
+def _commit_versioned(query, change: Callable[[Any], None], serialize: Callable[[Any], Dict[str, Any]]) -> Any:
+    """Load a versioned row with `query`, apply `change` and commit it.
+
+    The flush writes with `UPDATE`/`DELETE ... WHERE id = ? AND version = ?`, so no lock is held
+    between reading and writing. With `If-Match` the row must still be at that version, or the
+    request fails with 409 and its current state. Without it the change is last-writer-wins: if
+    another commit got in first, the row is read again `FOR UPDATE` and the change reapplied.
+    """
+    model = query.column_descriptions[0]["entity"]
+    expected_version = _if_match_version()
+    locked = False
+    while True:
+        instance = (query.with_for_update(of=model) if locked else query).first()
+        if not instance:
+            raise EntityNotFoundError(model.__name__)
+        if expected_version is not None and instance.version != expected_version:
+            metrics.increment("version_conflicts")
+            raise VersionConflictError(model.__name__, serialize(instance))
+
+        change(instance)
+        try:
+            db.session.commit()
+            return instance
+        except StaleDataError:
+            db.session.rollback()
+            if locked:
+                raise
+            metrics.increment("version_retries")
+            locked = True
+
+
 def _resolve_users(payload: Dict[str, Any]) -> List[User]:
     user_ids = _extract_user_ids(payload)
     if not user_ids:
         return []
 
-    users = User.query.filter(User.id.in_(user_ids)).all()
+    # Only members of the project can be assigned.
+    users = User.query.filter(User.id.in_(user_ids), tenant_filter(User)).all()
 
     users_by_id = {user.id: user for user in users}
     return [users_by_id[user_id] for user_id in user_ids if user_id in users_by_id]
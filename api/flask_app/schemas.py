@@ -0,0 +1,330 @@
+"""Declarative payload schemas for issues, comments, projects, users, attachments and activity.
+
+Each entity's fields are declared once. `Schema.load` validates and coerces a request payload
+in one pass over the fields, `Schema.apply` copies the loaded values onto a model, and
+`Schema.serializer` builds the function that turns a model or read-model record into a
+response dict. Routes, the project import and the serializers all go through these
+declarations, so create, update and bulk paths accept the same input and report the same
+messages.
+"""
+import re
+from datetime import datetime
+from typing import Any, Callable, Collection, Dict, Optional, Tuple
+
+from .constants import ISSUE_PRIORITIES, ISSUE_STATUSES, ISSUE_TYPES, PROJECT_CATEGORIES
+
+
+EMAIL_REGEX = re.compile(r".+@.+\..+")
+URL_REGEX = re.compile(
+    r"^(?:http(s)?://)?[\w.-]+(?:\.[\w.-]+)+[\w\-._~:/?#[\]@!$&'()*+,;=.]+$"
+)
+
+REQUIRED_MESSAGE = "This field is required"
+
+
+class Invalid:
+    """Returned by `Field.parse` instead of a value; built once per message."""
+
+    __slots__ = ("message",)
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+REQUIRED = Invalid(REQUIRED_MESSAGE)
+
+
+def serialize_datetime(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat()
+
+
+def _is_nil_or_empty(value: Any) -> bool:
+    return value is None or value == ""
+
+
+class Field:
+    """A model attribute as it appears in payloads and responses.
+
+    `required` fields missing from a full payload are parsed as `None`; other missing fields
+    load as `None` unchecked. Partial payloads only load the fields they contain, and with
+    `null_keeps_value` a `null` leaves the attribute unchanged. `read_only` fields are never
+    loaded and `write=False` ones are loaded but not applied to models.
+    """
+
+    dump: Optional[Callable[[Any], Any]] = None
+
+    def __init__(
+        self,
+        required: bool = False,
+        read_only: bool = False,
+        write: bool = True,
+        null_keeps_value: bool = False,
+    ):
+        self.required = required
+        self.read_only = read_only
+        self.write = write
+        self.null_keeps_value = null_keeps_value
+
+    def parse(self, value: Any) -> Any:
+        return value
+
+
+class DateTime(Field):
+    dump = staticmethod(serialize_datetime)
+
+    def __init__(self):
+        super().__init__(read_only=True)
+
+
+class Text(Field):
+    def __init__(self, required: bool = False, max_length: Optional[int] = None, **options):
+        super().__init__(required=required, **options)
+        self.max_length = max_length
+        self.too_long = Invalid(f"Must be at most {max_length} characters")
+
+    def parse(self, value: Any) -> Any:
+        if value is None or value == "":
+            return REQUIRED if self.required else value
+        if self.max_length is not None:
+            length = len(value) if value.__class__ is str else len(str(value))
+            if length > self.max_length:
+                return self.too_long
+        return value
+
+
+class Pattern(Text):
+    def __init__(self, pattern: re.Pattern, message: str, **options):
+        super().__init__(**options)
+        self.pattern = pattern
+        self.mismatch = Invalid(message)
+
+    def parse(self, value: Any) -> Any:
+        value = super().parse(value)
+        if isinstance(value, Invalid) or _is_nil_or_empty(value):
+            return value
+        return value if self.pattern.match(str(value)) else self.mismatch
+
+
+class Filename(Text):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.separator = Invalid("Must not contain path separators")
+
+    def parse(self, value: Any) -> Any:
+        value = super().parse(value)
+        if isinstance(value, Invalid) or _is_nil_or_empty(value):
+            return value
+        return self.separator if any(character in str(value) for character in "/\\\0") else value
+
+
+class Choice(Field):
+    """A required string from a fixed set; the value is loaded as a string."""
+
+    def __init__(self, options: Collection[str], **kwargs):
+        super().__init__(required=True, **kwargs)
+        self.options = frozenset(options)
+        self.not_an_option = Invalid(f"Must be one of: {', '.join(sorted(options))}")
+
+    def parse(self, value: Any) -> Any:
+        if value is None or value == "":
+            return REQUIRED
+        if value.__class__ is not str:
+            value = str(value)
+        return value if value in self.options else self.not_an_option
+
+
+class Integer(Field):
+    """Without `nullable`, a missing or non-numeric value is reported as required."""
+
+    NOT_A_NUMBER = Invalid("Must be a number")
+
+    def __init__(self, nullable: bool = False, **options):
+        super().__init__(**options)
+        self.nullable = nullable
+
+    def parse(self, value: Any) -> Any:
+        if value.__class__ is int:
+            return value
+        if value is None and self.nullable:
+            return None
+        if value is not None and value != "":
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                pass
+        return self.NOT_A_NUMBER if self.nullable else REQUIRED
+
+
+class Number(Field):
+    def parse(self, value: Any) -> Any:
+        if value.__class__ is float:
+            return value
+        if value is not None and value != "":
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                pass
+        return REQUIRED
+
+
+class Array(Field):
+    NOT_AN_ARRAY = Invalid("Must be an array")
+
+    def parse(self, value: Any) -> Any:
+        return value if isinstance(value, list) else self.NOT_AN_ARRAY
+
+
+class Schema:
+    def __init__(self, **fields: Field):
+        self.fields = fields
+        loaded = {name: field for name, field in fields.items() if not field.read_only}
+        self._load_full = _loader(loaded, partial=False)
+        self._load_partial = _loader(loaded, partial=True)
+        self._written = tuple(name for name, field in loaded.items() if field.write)
+
+    def only(self, *names: str) -> "Schema":
+        return Schema(**{name: self.fields[name] for name in names})
+
+    def load(self, payload: Dict[str, Any], partial: bool = False) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """The payload's coerced values and, per field, the first validation error."""
+        return (self._load_partial if partial else self._load_full)(payload)
+
+    def apply(self, instance: Any, values: Dict[str, Any]):
+        for name in self._written:
+            if name in values:
+                setattr(instance, name, values[name])
+
+    def serializer(self, *names: str, **computed: Callable[[Any], Any]) -> Callable[[Any], Dict[str, Any]]:
+        """A function returning `{name: instance.name, ...}` for the given fields.
+
+        Fields with a `dump` (dates) are formatted; `computed` entries are added after them,
+        each called with the instance.
+        """
+        dumps = tuple((name, self.fields[name].dump) for name in names)
+        computed_items = tuple(computed.items())
+
+        def serialize(instance: Any) -> Dict[str, Any]:
+            data = {}
+            for name, dump in dumps:
+                value = getattr(instance, name)
+                data[name] = value if dump is None else dump(value)
+            for name, compute in computed_items:
+                data[name] = compute(instance)
+            return data
+
+        return serialize
+
+
+def _loader(fields: Dict[str, Field], partial: bool) -> Callable[[Dict[str, Any]], Tuple[Dict, Dict]]:
+    """`load` for one schema and mode, walking the fields in declaration order."""
+    specs = tuple(
+        (name, field.parse, field.required, partial and field.null_keeps_value)
+        for name, field in fields.items()
+    )
+
+    def load(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        values: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for name, parse, required, null_keeps_value in specs:
+            if name in payload:
+                value = payload[name]
+                if value is None and null_keeps_value:
+                    continue
+            elif partial:
+                continue
+            elif required:
+                value = None
+            else:
+                values[name] = None
+                continue
+
+            result = parse(value)
+            if result.__class__ is Invalid:
+                errors[name] = result.message
+            else:
+                values[name] = result
+        return values, errors
+
+    return load
+
+
+ISSUE_SCHEMA = Schema(
+    id=Field(read_only=True),
+    title=Text(required=True, max_length=200),
+    type=Choice(ISSUE_TYPES),
+    status=Choice(ISSUE_STATUSES),
+    priority=Choice(ISSUE_PRIORITIES),
+    listPosition=Number(),
+    description=Text(),
+    descriptionText=Field(read_only=True),
+    estimate=Integer(nullable=True),
+    timeSpent=Integer(nullable=True),
+    timeRemaining=Integer(nullable=True),
+    createdAt=DateTime(),
+    updatedAt=DateTime(),
+    version=Field(read_only=True),
+    reporterId=Integer(required=True),
+    projectId=Integer(required=True, null_keeps_value=True),
+    # Resolved to users by the routes, together with the older `users` form.
+    userIds=Array(write=False),
+)
+
+COMMENT_SCHEMA = Schema(
+    id=Field(read_only=True),
+    body=Text(required=True, max_length=50000),
+    createdAt=DateTime(),
+    updatedAt=DateTime(),
+    version=Field(read_only=True),
+    userId=Integer(required=True),
+    issueId=Integer(required=True),
+)
+COMMENT_BODY_SCHEMA = COMMENT_SCHEMA.only("body")
+
+PROJECT_SCHEMA = Schema(
+    id=Field(read_only=True),
+    name=Text(required=True, max_length=100),
+    url=Pattern(URL_REGEX, "Must be a valid URL"),
+    description=Text(),
+    category=Choice(PROJECT_CATEGORIES),
+    createdAt=DateTime(),
+    updatedAt=DateTime(),
+    version=Field(read_only=True),
+)
+
+USER_SCHEMA = Schema(
+    id=Field(read_only=True),
+    name=Text(required=True, max_length=100),
+    email=Pattern(EMAIL_REGEX, "Must be a valid email", required=True, max_length=200),
+    avatarUrl=Field(),
+    createdAt=DateTime(),
+    updatedAt=DateTime(),
+    projectId=Field(read_only=True),
+)
+
+MEMBER_SCHEMA = Schema(userId=Integer(required=True))
+
+ACTIVITY_SCHEMA = Schema(
+    id=Field(read_only=True),
+    entity=Field(read_only=True),
+    action=Field(read_only=True),
+    field=Field(read_only=True),
+    oldValue=Field(read_only=True),
+    newValue=Field(read_only=True),
+    createdAt=DateTime(),
+    projectId=Field(read_only=True),
+    issueId=Field(read_only=True),
+    commentId=Field(read_only=True),
+    userId=Field(read_only=True),
+)
+
+ATTACHMENT_SCHEMA = Schema(
+    id=Field(read_only=True),
+    filename=Filename(required=True, max_length=255),
+    contentType=Text(max_length=255),
+    size=Field(read_only=True),
+    createdAt=DateTime(),
+    userId=Field(read_only=True),
+    issueId=Field(read_only=True),
+)
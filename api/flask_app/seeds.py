@@ -1,5 +1,141 @@
+from datetime import datetime
+from typing import List, Optional
+
 from .extensions import db
-from .models import Comment, Issue, Project, User
+from .models import Comment, GuestAccount, Issue, Project, User, utcnow
+
+
+GUEST_PROJECT = {
+    "name": "singularity 1.0",
+    "url": "https://www.atlassian.com/software/jira",
+    "description": (
+        "Plan, track, and manage your agile and software development projects in Jira. "
+        "Customize your workflow, collaborate, and release great software."
+    ),
+    "category": "software",
+}
+
+GUEST_USERS = [
+    {
+        "email": "rick@jira.guest",
+        "name": "Pickle Rick",
+        "avatarUrl": "https://i.ibb.co/7JM1P2r/picke-rick.jpg",
+    },
+    {
+        "email": "yoda@jira.guest",
+        "name": "Baby Yoda",
+        "avatarUrl": "https://i.ibb.co/6n0hLML/baby-yoda.jpg",
+    },
+    {
+        "email": "gaben@jira.guest",
+        "name": "Lord Gaben",
+        "avatarUrl": "https://i.ibb.co/6RJ5hq6/gaben.jpg",
+    },
+]
+
+# `reporter` and `users` are indexes into GUEST_USERS.
+GUEST_ISSUES = [
+    {
+        "title": "This is an issue of type: Task.",
+        "type": "task",
+        "status": "backlog",
+        "priority": "4",
+        "listPosition": 1,
+        "description": "<p>Issue description for task.</p>",
+        "estimate": 8,
+        "timeSpent": 4,
+        "timeRemaining": 4,
+        "reporter": 1,
+        "users": [0],
+    },
+    {
+        "title": "Click on an issue to see what's behind it.",
+        "type": "task",
+        "status": "backlog",
+        "priority": "2",
+        "listPosition": 2,
+        "description": "<p>Open issue details modal for full context.</p>",
+        "estimate": 5,
+        "timeSpent": 2,
+        "timeRemaining": 3,
+        "reporter": 2,
+        "users": [0],
+    },
+    {
+        "title": "Try dragging issues to different columns.",
+        "type": "story",
+        "status": "selected",
+        "priority": "3",
+        "listPosition": 1,
+        "description": "<p>Move me across columns to update status.</p>",
+        "estimate": 15,
+        "timeSpent": 7,
+        "timeRemaining": 8,
+        "reporter": 1,
+        "users": [1],
+    },
+    {
+        "title": "Each issue can have multiple assignees.",
+        "type": "story",
+        "status": "selected",
+        "priority": "5",
+        "listPosition": 2,
+        "description": "<p>Assign both Pickle Rick and Lord Gaben.</p>",
+        "estimate": 10,
+        "timeSpent": 5,
+        "timeRemaining": 5,
+        "reporter": 0,
+        "users": [0, 2],
+    },
+    {
+        "title": "Track spent and remaining time.",
+        "type": "task",
+        "status": "inprogress",
+        "priority": "1",
+        "listPosition": 1,
+        "description": "<p>Time tracking is available in issue details.</p>",
+        "estimate": 12,
+        "timeSpent": 11,
+        "timeRemaining": 1,
+        "reporter": 0,
+        "users": [2],
+    },
+    {
+        "title": "Try leaving a comment on this issue.",
+        "type": "task",
+        "status": "done",
+        "priority": "3",
+        "listPosition": 1,
+        "description": "<p>Comments help teams collaborate asynchronously.</p>",
+        "estimate": 6,
+        "timeSpent": 6,
+        "timeRemaining": 0,
+        "reporter": 2,
+        "users": [1],
+    },
+]
+
+# `issue` is an index into GUEST_ISSUES, `user` an index into GUEST_USERS.
+GUEST_COMMENTS = [
+    {
+        "body": "An old silent pond...\nA frog jumps into the pond,\nsplash! Silence again.",
+        "issue": 0,
+        "user": 2,
+    },
+    {
+        "body": "Autumn moonlight-\na worm digs silently\ninto the chestnut.",
+        "issue": 1,
+        "user": 2,
+    },
+    {
+        "body": "In the twilight rain\nthese brilliant-hued hibiscus -\nA lovely sunset.",
+        "issue": 2,
+        "user": 1,
+    },
+]
+
+# The user a guest is signed in as, as an index into GUEST_USERS.
+GUEST_SIGN_IN_USER = 2
 
 
 def reset_database():
@@ -18,175 +154,79 @@ def _create_users(project: Project, users):
         )
         db.session.add(persisted)
         persisted_users.append(persisted)
+    project.members = persisted_users
     db.session.flush()
     return persisted_users
 
 
-def create_guest_account() -> User:
-    project = Project(
-        name="singularity 1.0",
-        url="https://www.atlassian.com/software/jira",
-        description=(
-            "Plan, track, and manage your agile and software development projects in Jira. "
-            "Customize your workflow, collaborate, and release great software."
-        ),
-        category="software",
-    )
-    db.session.add(project)
-    db.session.flush()
+def create_guest_accounts(count: int, claimed_at: Optional[datetime] = None) -> List[User]:
+    """Seed `count` guest projects in one batch and return the users guests sign in as.
 
-    users = _create_users(
-        project,
-        [
-            {
-                "email": "rick@jira.guest",
-                "name": "Pickle Rick",
-                "avatarUrl": "https://i.ibb.co/7JM1P2r/picke-rick.jpg",
-            },
-            {
-                "email": "yoda@jira.guest",
-                "name": "Baby Yoda",
-                "avatarUrl": "https://i.ibb.co/6n0hLML/baby-yoda.jpg",
-            },
-            {
-                "email": "gaben@jira.guest",
-                "name": "Lord Gaben",
-                "avatarUrl": "https://i.ibb.co/6RJ5hq6/gaben.jpg",
-            },
-        ],
-    )
+    Every table is written with a single flush for the whole batch, so provisioning
+    many accounts costs the same number of round-trips as provisioning one.
+    Accounts created with `claimed_at=None` are left in the guest pool.
+    """
+    projects = [Project(**GUEST_PROJECT) for _ in range(count)]
+    db.session.add_all(projects)
+    db.session.flush()
 
-    issues_input = [
-        {
-            "title": "This is an issue of type: Task.",
-            "type": "task",
-            "status": "backlog",
-            "priority": "4",
-            "listPosition": 1,
-            "description": "<p>Issue description for task.</p>",
-            "estimate": 8,
-            "timeSpent": 4,
-            "timeRemaining": 4,
-            "reporterId": users[1].id,
-            "users": [users[0]],
-        },
-        {
-            "title": "Click on an issue to see what's behind it.",
-            "type": "task",
-            "status": "backlog",
-            "priority": "2",
-            "listPosition": 2,
-            "description": "<p>Open issue details modal for full context.</p>",
-            "estimate": 5,
-            "timeSpent": 2,
-            "timeRemaining": 3,
-            "reporterId": users[2].id,
-            "users": [users[0]],
-        },
-        {
-            "title": "Try dragging issues to different columns.",
-            "type": "story",
-            "status": "selected",
-            "priority": "3",
-            "listPosition": 1,
-            "description": "<p>Move me across columns to update status.</p>",
-            "estimate": 15,
-            "timeSpent": 7,
-            "timeRemaining": 8,
-            "reporterId": users[1].id,
-            "users": [users[1]],
-        },
-        {
-            "title": "Each issue can have multiple assignees.",
-            "type": "story",
-            "status": "selected",
-            "priority": "5",
-            "listPosition": 2,
-            "description": "<p>Assign both Pickle Rick and Lord Gaben.</p>",
-            "estimate": 10,
-            "timeSpent": 5,
-            "timeRemaining": 5,
-            "reporterId": users[0].id,
-            "users": [users[0], users[2]],
-        },
-        {
-            "title": "Track spent and remaining time.",
-            "type": "task",
-            "status": "inprogress",
-            "priority": "1",
-            "listPosition": 1,
-            "description": "<p>Time tracking is available in issue details.</p>",
-            "estimate": 12,
-            "timeSpent": 11,
-            "timeRemaining": 1,
-            "reporterId": users[0].id,
-            "users": [users[2]],
-        },
-        {
-            "title": "Try leaving a comment on this issue.",
-            "type": "task",
-            "status": "done",
-            "priority": "3",
-            "listPosition": 1,
-            "description": "<p>Comments help teams collaborate asynchronously.</p>",
-            "estimate": 6,
-            "timeSpent": 6,
-            "timeRemaining": 0,
-            "reporterId": users[2].id,
-            "users": [users[1]],
-        },
-    ]
-
-    issues = []
-    for issue_data in issues_input:
-        issue = Issue(
-            title=issue_data["title"],
-            type=issue_data["type"],
-            status=issue_data["status"],
-            priority=issue_data["priority"],
-            listPosition=issue_data["listPosition"],
-            description=issue_data["description"],
-            estimate=issue_data["estimate"],
-            timeSpent=issue_data["timeSpent"],
-            timeRemaining=issue_data["timeRemaining"],
-            reporterId=issue_data["reporterId"],
-            project=project,
-        )
-        issue.users = issue_data["users"]
-        db.session.add(issue)
-        issues.append(issue)
+    users_by_project = []
+    for project in projects:
+        users = [
+            User(name=user["name"], email=user["email"], avatarUrl=user["avatarUrl"], project=project)
+            for user in GUEST_USERS
+        ]
+        db.session.add_all(users)
+        project.members = users
+        users_by_project.append(users)
+    db.session.flush()
 
+    issues_by_project = []
+    for project, users in zip(projects, users_by_project):
+        issues = []
+        for issue_data in GUEST_ISSUES:
+            issue = Issue(
+                title=issue_data["title"],
+                type=issue_data["type"],
+                status=issue_data["status"],
+                priority=issue_data["priority"],
+                listPosition=issue_data["listPosition"],
+                description=issue_data["description"],
+                estimate=issue_data["estimate"],
+                timeSpent=issue_data["timeSpent"],
+                timeRemaining=issue_data["timeRemaining"],
+                reporterId=users[issue_data["reporter"]].id,
+                project=project,
+            )
+            issue.users = [users[index] for index in issue_data["users"]]
+            issues.append(issue)
+        db.session.add_all(issues)
+        issues_by_project.append(issues)
     db.session.flush()
 
-    comments = [
-        {
-            "body": "An old silent pond...\nA frog jumps into the pond,\nsplash! Silence again.",
-            "issue": issues[0],
-            "user": users[2],
-        },
-        {
-            "body": "Autumn moonlight-\na worm digs silently\ninto the chestnut.",
-            "issue": issues[1],
-            "user": users[2],
-        },
-        {
-            "body": "In the twilight rain\nthese brilliant-hued hibiscus -\nA lovely sunset.",
-            "issue": issues[2],
-            "user": users[1],
-        },
-    ]
-
-    for comment_data in comments:
-        db.session.add(
-            Comment(
-                body=comment_data["body"],
-                issue=comment_data["issue"],
-                user=comment_data["user"],
+    sign_in_users = []
+    for project, users, issues in zip(projects, users_by_project, issues_by_project):
+        for comment_data in GUEST_COMMENTS:
+            db.session.add(
+                Comment(
+                    body=comment_data["body"],
+                    issue=issues[comment_data["issue"]],
+                    user=users[comment_data["user"]],
+                )
             )
+
+        sign_in_user = users[GUEST_SIGN_IN_USER]
+        db.session.add(
+            GuestAccount(projectId=project.id, userId=sign_in_user.id, claimedAt=claimed_at)
         )
+        sign_in_users.append(sign_in_user)
 
     db.session.commit()
-    return users[2]
+    return sign_in_users
+
+
+def create_guest_account() -> User:
+    return create_guest_accounts(1, claimed_at=utcnow())[0]
 
 
 def create_test_account() -> User:
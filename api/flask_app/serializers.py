@@ -1,78 +1,100 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict, List, Optional
-
-from .models import Comment, Issue, Project, User
-
-
-def _serialize_datetime(value: Optional[datetime]) -> Optional[str]:
-    if value is None:
-        return None
-    return value.isoformat()
-
-
-def serialize_user(user: User) -> Dict:
-    return {
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "avatarUrl": user.avatarUrl,
-        "createdAt": _serialize_datetime(user.createdAt),
-        "updatedAt": _serialize_datetime(user.updatedAt),
-        "projectId": user.projectId,
-    }
+from typing import Any, Callable, Dict, List, Union
+
+from .models import Activity, Attachment, Comment, Issue, Project, User
+from .read_models import IssueDetail, IssueSummary, ProjectRecord, UserRecord
+from .schemas import (
+    ACTIVITY_SCHEMA,
+    ATTACHMENT_SCHEMA,
+    COMMENT_SCHEMA,
+    ISSUE_SCHEMA,
+    PROJECT_SCHEMA,
+    USER_SCHEMA,
+    serialize_datetime,
+)
+
+
+def _assignee_ids(issue: Union[Issue, IssueSummary]) -> List[int]:
+    # Read-model records arrive with their assignee ids already aggregated and sorted.
+    if isinstance(issue, IssueSummary):
+        return issue.userIds
+    return sorted([user.id for user in issue.users])
+
+
+ISSUE_COLUMNS = (
+    "id",
+    "title",
+    "type",
+    "status",
+    "priority",
+    "listPosition",
+    "description",
+    "descriptionText",
+    "estimate",
+    "timeSpent",
+    "timeRemaining",
+    "createdAt",
+    "updatedAt",
+    "version",
+    "reporterId",
+    "projectId",
+)
+
+serialize_user: Callable[[Union[User, UserRecord]], Dict] = USER_SCHEMA.serializer(
+    "id", "name", "email", "avatarUrl", "createdAt", "updatedAt", "projectId"
+)
+serialize_attachment: Callable[[Attachment], Dict] = ATTACHMENT_SCHEMA.serializer(
+    "id",
+    "filename",
+    "contentType",
+    "size",
+    "createdAt",
+    "userId",
+    "issueId",
+    url=lambda attachment: f"/attachments/{attachment.id}",
+)
+serialize_issue_partial: Callable[[Union[Issue, IssueSummary]], Dict] = ISSUE_SCHEMA.serializer(
+    "id",
+    "title",
+    "type",
+    "status",
+    "priority",
+    "listPosition",
+    "createdAt",
+    "updatedAt",
+    "version",
+    userIds=_assignee_ids,
+)
+_serialize_comment = COMMENT_SCHEMA.serializer(
+    "id", "body", "createdAt", "updatedAt", "version", "userId", "issueId"
+)
+_serialize_issue = ISSUE_SCHEMA.serializer(*ISSUE_COLUMNS, userIds=_assignee_ids)
+_serialize_archived_issue = ISSUE_SCHEMA.serializer(
+    *ISSUE_COLUMNS, archivedAt=lambda row: serialize_datetime(row.archivedAt)
+)
+serialize_project_basic: Callable[[Union[Project, ProjectRecord]], Dict] = PROJECT_SCHEMA.serializer(
+    "id", "name", "url", "description", "category", "createdAt", "updatedAt", "version"
+)
+serialize_activity: Callable[[Activity], Dict] = ACTIVITY_SCHEMA.serializer(*ACTIVITY_SCHEMA.fields)
 
 
 def serialize_comment(comment: Comment, include_user: bool = False) -> Dict:
-    data = {
-        "id": comment.id,
-        "body": comment.body,
-        "createdAt": _serialize_datetime(comment.createdAt),
-        "updatedAt": _serialize_datetime(comment.updatedAt),
-        "userId": comment.userId,
-        "issueId": comment.issueId,
-    }
+    data = _serialize_comment(comment)
     if include_user:
         data["user"] = serialize_user(comment.user)
     return data
 
 
-def serialize_issue_partial(issue: Issue) -> Dict:
-    return {
-        "id": issue.id,
-        "title": issue.title,
-        "type": issue.type,
-        "status": issue.status,
-        "priority": issue.priority,
-        "listPosition": issue.listPosition,
-        "createdAt": _serialize_datetime(issue.createdAt),
-        "updatedAt": _serialize_datetime(issue.updatedAt),
-        "userIds": sorted([user.id for user in issue.users]),
-    }
-
-
-def serialize_issue(issue: Issue, include_users: bool = False, include_comments: bool = False) -> Dict:
-    user_ids = sorted([user.id for user in issue.users])
-
-    data = {
-        "id": issue.id,
-        "title": issue.title,
-        "type": issue.type,
-        "status": issue.status,
-        "priority": issue.priority,
-        "listPosition": issue.listPosition,
-        "description": issue.description,
-        "descriptionText": issue.descriptionText,
-        "estimate": issue.estimate,
-        "timeSpent": issue.timeSpent,
-        "timeRemaining": issue.timeRemaining,
-        "createdAt": _serialize_datetime(issue.createdAt),
-        "updatedAt": _serialize_datetime(issue.updatedAt),
-        "reporterId": issue.reporterId,
-        "projectId": issue.projectId,
-        "userIds": user_ids,
-    }
+def serialize_issue(
+    issue: Union[Issue, IssueDetail],
+    include_users: bool = False,
+    include_comments: bool = False,
+    include_attachments: bool = False,
+) -> Dict:
+    """Serialize an issue; the `include_*` options need an ORM `Issue`."""
+    data = _serialize_issue(issue)
 
     if include_users:
         data["users"] = [serialize_user(user) for user in issue.users]
@@ -83,36 +105,26 @@ def serialize_issue(issue: Issue, include_users: bool = False, include_comments:
             for comment in sorted(issue.comments, key=lambda c: c.createdAt or datetime.min)
         ]
 
+    if include_attachments:
+        data["attachments"] = [serialize_attachment(attachment) for attachment in issue.attachments]
+
     return data
 
 
-def serialize_project(project: Project, partial_issues: bool = True) -> Dict:
+def serialize_archived_issue(row: Any, user_ids: List[int]) -> Dict:
+    data = _serialize_archived_issue(row)
+    data["userIds"] = sorted(user_ids)
+    return data
+
+
+def serialize_project(project: Union[Project, ProjectRecord], partial_issues: bool = True) -> Dict:
     issues: List[Dict]
     if partial_issues:
         issues = [serialize_issue_partial(issue) for issue in project.issues]
     else:
         issues = [serialize_issue(issue) for issue in project.issues]
 
-    return {
-        "id": project.id,
-        "name": project.name,
-        "url": project.url,
-        "description": project.description,
-        "category": project.category,
-        "createdAt": _serialize_datetime(project.createdAt),
-        "updatedAt": _serialize_datetime(project.updatedAt),
-        "users": [serialize_user(user) for user in project.users],
-        "issues": issues,
-    }
-
-
-def serialize_project_basic(project: Project) -> Dict:
-    return {
-        "id": project.id,
-        "name": project.name,
-        "url": project.url,
-        "description": project.description,
-        "category": project.category,
-        "createdAt": _serialize_datetime(project.createdAt),
-        "updatedAt": _serialize_datetime(project.updatedAt),
-    }
+    data = serialize_project_basic(project)
+    data["users"] = [serialize_user(user) for user in project.users]
+    data["issues"] = issues
+    return data
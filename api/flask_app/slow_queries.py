@@ -0,0 +1,211 @@
+"""Slow-query log for the SQLAlchemy engine.
+
+Statements slower than `SLOW_QUERY_THRESHOLD_MS` are written as JSON lines to a rotating
+log at `SLOW_QUERY_LOG_PATH`, together with the route that issued them and the shape of
+their bound parameters. Outside production, slow Postgres SELECTs are also re-run under
+`EXPLAIN (ANALYZE, BUFFERS)` and the plan is stored with the entry.
+`flask slow-query-report` groups the log by normalized statement.
+"""
+import glob
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional
+
+import click
+from flask import Flask, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import metrics
+from .models import utcnow
+
+
+STRING_LITERAL_REGEX = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_REGEX = re.compile(r"\b\d+(?:\.\d+)?\b")
+BIND_PARAMETER_REGEX = re.compile(r"%\(\w+\)s|%s|\?")
+IN_LIST_REGEX = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_statement(statement: str) -> str:
+    """Reduce a statement to its shape: literals and parameters become `?`, IN lists collapse."""
+    shape = STRING_LITERAL_REGEX.sub("?", statement)
+    shape = BIND_PARAMETER_REGEX.sub("?", shape)
+    shape = NUMBER_LITERAL_REGEX.sub("?", shape)
+    shape = IN_LIST_REGEX.sub("(...)", shape)
+    return WHITESPACE_REGEX.sub(" ", shape).strip()
+
+
+def _value_shape(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def parameter_shapes(parameters: Any, executemany: bool) -> Any:
+    if executemany:
+        rows = len(parameters)
+        shape = parameter_shapes(parameters[0], False) if parameters else None
+        return {"rows": rows, "row": shape}
+
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_shape(value) for value in parameters]
+    return _value_shape(parameters)
+
+
+def _explain(cursor, statement: str, parameters: Any) -> Any:
+    """Plan a statement inside a savepoint that is always rolled back.
+
+    A failing EXPLAIN would otherwise abort the caller's transaction, and anything the
+    re-executed statement changed is undone.
+    """
+    explain_cursor = cursor.connection.cursor()
+    explain_cursor.execute("SAVEPOINT slow_query_explain")
+    try:
+        explain_cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters)
+        return explain_cursor.fetchone()[0]
+    except Exception as error:
+        return {"error": str(error)}
+    finally:
+        explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+        explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        explain_cursor.close()
+
+
+def _route() -> Optional[Dict[str, Optional[str]]]:
+    if not has_request_context():
+        return None
+    return {
+        "method": request.method,
+        "rule": request.url_rule.rule if request.url_rule else None,
+        "endpoint": request.endpoint,
+    }
+
+
+def attach_slow_query_log(engine: Engine, threshold_ms: float, capture_explain: bool):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, _cursor, _statement, _parameters, _context, _executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_if_slow(conn, cursor, statement, parameters, _context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["slow_query_started"].pop()) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+
+        entry = {
+            "timestamp": utcnow().isoformat(),
+            "durationMs": round(elapsed_ms, 3),
+            "statement": statement,
+            "shape": normalize_statement(statement),
+            "route": _route(),
+            "parameterShapes": parameter_shapes(parameters, executemany),
+        }
+
+        # EXPLAIN ANALYZE runs the statement again, so only plain SELECTs: a WITH can hide
+        # data-modifying CTEs.
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        if capture_explain and is_select and not executemany:
+            entry["explain"] = _explain(cursor, statement, parameters)
+
+        metrics.increment("slow_queries.count")
+        logger.info(json.dumps(entry, default=str))
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(context):
+        # A failed statement never reaches `after_cursor_execute`.
+        started = context.connection.info.get("slow_query_started") if context.connection else None
+        if started:
+            started.pop()
+
+
+def configure_slow_query_log(app: Flask, engine: Engine) -> bool:
+    app.cli.add_command(slow_query_report_command)
+
+    threshold_ms = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "0"))
+    if threshold_ms <= 0:
+        return False
+
+    handler = RotatingFileHandler(
+        _log_path(),
+        maxBytes=int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backupCount=int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5")),
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    capture_explain = (
+        os.getenv("NODE_ENV", "development") != "production" and engine.dialect.name == "postgresql"
+    )
+    attach_slow_query_log(engine, threshold_ms, capture_explain)
+    return True
+
+
+def _log_path() -> str:
+    return os.getenv("SLOW_QUERY_LOG_PATH", "slow_queries.log")
+
+
+def read_slow_query_log(path: str) -> Iterator[Dict[str, Any]]:
+    for file_path in sorted(glob.glob(f"{glob.escape(path)}*")):
+        with open(file_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(entries: Iterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    groups: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"durations": [], "routes": defaultdict(int)})
+    for entry in entries:
+        group = groups[entry["shape"]]
+        group["durations"].append(entry["durationMs"])
+        route = entry.get("route") or {}
+        group["routes"][f"{route.get('method', '-')} {route.get('rule', '-')}"] += 1
+
+    summary = []
+    for shape, group in groups.items():
+        durations = sorted(group["durations"])
+        summary.append(
+            {
+                "shape": shape,
+                "count": len(durations),
+                "totalMs": sum(durations),
+                "meanMs": sum(durations) / len(durations),
+                "p95Ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                "maxMs": durations[-1],
+                "routes": sorted(group["routes"].items(), key=lambda item: -item[1]),
+            }
+        )
+    return summary
+
+
+@click.command("slow-query-report")
+@click.option("--path", default=None, help="Slow-query log to read (defaults to SLOW_QUERY_LOG_PATH).")
+@click.option("--sort", type=click.Choice(["totalMs", "meanMs", "count", "maxMs"]), default="totalMs")
+@click.option("--limit", type=int, default=20, help="Number of statement shapes to show.")
+def slow_query_report_command(path, sort, limit):
+    """Summarize the slow-query log by normalized statement."""
+    summary = summarize(read_slow_query_log(path or _log_path()))
+    summary.sort(key=lambda group: -group[sort])
+
+    for group in summary[:limit]:
+        click.echo(
+            f"{group['count']:>6}x  total {group['totalMs']:>10.1f} ms  mean {group['meanMs']:>8.1f} ms  "
+            f"p95 {group['p95Ms']:>8.1f} ms  max {group['maxMs']:>8.1f} ms"
+        )
+        click.echo(f"        {group['shape']}")
+        for route, count in group["routes"][:3]:
+            click.echo(f"        {count:>6}x from {route}")
+        click.echo("")
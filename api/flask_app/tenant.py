@@ -0,0 +1,70 @@
+"""The project a request works in, and the filter that confines its queries to that project.
+
+A user can be a member of several projects (`project_member`). Requests pick one with the
+`X-Project-Id` header; without it they work in the user's own project (`User.projectId`), as
+before memberships existed. `require_auth` stores the selection in `g.project_id`, and routes
+build every query on project data with `tenant_filter`, so each one is answered from
+`projectId`-leading indexes and never reads another project's rows.
+"""
+from typing import Any, Optional
+
+from flask import g
+from sqlalchemy import Table, select
+
+from .errors import BadUserInputError, EntityNotFoundError
+from .extensions import db
+from .models import Comment, Issue, Project, User, project_member
+
+
+PROJECT_HEADER = "X-Project-Id"
+
+
+def requested_project_id(header: Optional[str], user: User) -> Optional[int]:
+    """The project named by `X-Project-Id` when membership must be checked; None for the user's own."""
+    if not header:
+        return None
+    try:
+        project_id = int(header)
+    except ValueError:
+        raise BadUserInputError({"fields": {PROJECT_HEADER: "Must be a number"}})
+    return None if project_id == user.projectId else project_id
+
+
+def membership_select(user_id: int, project_id: int):
+    return select(project_member.c.projectId).where(
+        project_member.c.projectId == project_id, project_member.c.userId == user_id
+    )
+
+
+def select_project(header: Optional[str], user: User) -> Optional[int]:
+    project_id = requested_project_id(header, user)
+    if project_id is None:
+        return user.projectId
+    if db.session.execute(membership_select(user.id, project_id)).first() is None:
+        raise EntityNotFoundError("Project")
+    return project_id
+
+
+def shares_project_filter(user: User):
+    """The criterion limiting `User` to people who are members of a project `user` belongs to."""
+    projects = select(project_member.c.projectId).where(project_member.c.userId == user.id)
+    return User.id.in_(select(project_member.c.userId).where(project_member.c.projectId.in_(projects)))
+
+
+def current_project_id() -> Optional[int]:
+    return g.project_id
+
+
+def tenant_filter(model: Any, project_id: Optional[int] = None):
+    """The criterion limiting `model` (a mapped class or archive table) to the current project."""
+    if project_id is None:
+        project_id = current_project_id()
+    if model is Project:
+        return Project.id == project_id
+    if model is User:
+        return User.id.in_(select(project_member.c.userId).where(project_member.c.projectId == project_id))
+    if model is Comment:
+        # Comments have no projectId of their own; their issue ids come from the project's index.
+        return Comment.issueId.in_(select(Issue.id).where(Issue.projectId == project_id))
+    columns = model.c if isinstance(model, Table) else model
+    return columns.projectId == project_id
@@ -0,0 +1,519 @@
+"""Recording of anonymized API traffic and a replay load generator.
+
+With `TRAFFIC_RECORD_PATH` set, every API request is appended to that file as one JSON
+line: the route rule, query parameters, the shape of the JSON body, the response status and
+how long the handler took. Free text is reduced to its length and ids are replaced with
+salted hashes, so a trace carries the mix and timing of production traffic but none of its
+content.
+
+`flask replay-traffic` plays a trace against a running API. Each recorded session gets its
+own guest account, hashed ids are mapped onto that account's issues, users and comments,
+and throughput and latency percentiles are reported per route.
+"""
+import glob
+import gzip
+import hmac
+import http.client
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import click
+from flask import Flask, g, request
+
+from . import metrics
+
+
+ID_KINDS = {
+    "id": None,
+    "attachment_id": "attachment",
+    "ids": "issue",
+    "issue": "issue",
+    "issueId": "issue",
+    "issue_id": "issue",
+    "issues": "issue",
+    "comment": "comment",
+    "comment_id": "comment",
+    "comments": "comment",
+    "project": "project",
+    "projectId": "project",
+    "reporterId": "user",
+    "userId": "user",
+    "userIds": "user",
+    "user_id": "user",
+    "users": "user",
+}
+KEPT_STRING_FIELDS = {"type", "status", "priority", "category", "sort", "order", "format", "filter"}
+UNRECORDED_PATH_PREFIXES = ("/test/", "/metrics")
+
+FILTER_ASSIGNEE_REGEX = re.compile(r"\bassignee:([\w,]+)")
+RULE_ARGUMENT_REGEX = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+def _reference(salt: bytes, kind: str, value: Any) -> Dict[str, Any]:
+    digest = hmac.new(salt, f"{kind}:{value}".encode("utf-8"), sha256).hexdigest()
+    return {"$ref": kind, "key": int(digest[:8], 16)}
+
+
+def _anonymize_filter(value: str) -> str:
+    # Assignee ids cannot be mapped inside the filter string; `me` keeps the clause's shape.
+    return FILTER_ASSIGNEE_REGEX.sub(
+        lambda match: "assignee:" + ",".join("me" for _ in match.group(1).split(",")), value
+    )
+
+
+def body_shape(value: Any, salt: bytes, key: Optional[str] = None, kind: Optional[str] = None) -> Any:
+    """Replace free text with its length and ids with salted references, keeping the structure."""
+    kind = ID_KINDS.get(key) or kind
+
+    if isinstance(value, dict):
+        return {name: body_shape(item, salt, name, kind) for name, item in value.items()}
+    if isinstance(value, list):
+        return [body_shape(item, salt, key, kind) for item in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if key in ID_KINDS and kind and isinstance(value, (int, str)):
+        return _reference(salt, kind, value)
+    if isinstance(value, str):
+        if key == "filter":
+            return _anonymize_filter(value)
+        if key in KEPT_STRING_FIELDS:
+            return value
+        return {"$text": len(value)}
+    return value
+
+
+def _query_shape(args, salt: bytes) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    for name, value in args.items(multi=False):
+        if name == "ids":
+            query[name] = [
+                _reference(salt, "issue", item.strip()) for item in value.split(",") if item.strip()
+            ]
+        else:
+            query[name] = body_shape(value, salt, name)
+    return query
+
+
+class TrafficRecorder:
+    """Appends one JSON line per request to `path`; a `.gz` path is written gzip-compressed."""
+
+    def __init__(self, path: str, salt: bytes, sample_rate: float):
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.salt = salt
+        self.sample_rate = sample_rate
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._file: IO[str] = (
+            gzip.open(self.path, "at", encoding="utf-8")
+            if self.path.endswith(".gz")
+            else open(self.path, "a", encoding="utf-8")
+        )
+
+    def _session(self) -> Optional[str]:
+        user = getattr(g, "current_user", None)
+        if user is None:
+            return None
+        return hmac.new(self.salt, f"user:{user.id}".encode("utf-8"), sha256).hexdigest()[:16]
+
+    def _sampled(self, session: Optional[str]) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        # Sample whole sessions so replayed sessions keep their sequence of requests.
+        return session is not None and int(session[:8], 16) / 0xFFFFFFFF < self.sample_rate
+
+    def record(self, response, duration_ms: float):
+        session = self._session()
+        if request.url_rule is None or not self._sampled(session):
+            return
+
+        if request.is_json:
+            body = body_shape(request.get_json(silent=True), self.salt)
+        elif request.content_length:
+            body = {"$bytes": request.content_length, "contentType": request.mimetype}
+        else:
+            body = None
+
+        entry = {
+            "at": round(time.time() - self.started, 3),
+            "session": session,
+            "method": request.method,
+            "rule": request.url_rule.rule,
+            "viewArgs": body_shape(request.view_args or {}, self.salt),
+            "query": _query_shape(request.args, self.salt),
+            "body": body,
+            "status": response.status_code,
+            "durationMs": round(duration_ms, 3),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+        metrics.increment("traffic_recorder.recorded")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    """Read every trace file matching `path` (a file or a glob), tolerating a truncated tail."""
+    for file_path in sorted(glob.glob(path)) or [path]:
+        opener = gzip.open if file_path.endswith(".gz") else open
+        with opener(file_path, "rt", encoding="utf-8") as file:
+            try:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+            except EOFError:
+                continue
+
+
+class ReplaySession:
+    """A guest account standing in for one recorded session."""
+
+    def __init__(self, token: str, refresh_token: str):
+        self.token = token
+        self.refresh_token = refresh_token
+        self.ids: Dict[str, List[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, client: "ReplayClient", expired_token: str) -> bool:
+        """Swap in a new token pair, once however many requests found `expired_token` rejected."""
+        with self._refresh_lock:
+            if self.token != expired_token:
+                return True
+            body = json.dumps({"refreshToken": self.refresh_token}).encode("utf-8")
+            status, payload = client.send("POST", "/authentication/refresh", body)
+            if status != 200:
+                return False
+            self.token, self.refresh_token = payload["authToken"], payload["refreshToken"]
+            return True
+
+    def resolve(self, reference: Dict[str, Any]) -> Optional[int]:
+        with self._lock:
+            pool = self.ids.get(reference["$ref"])
+            if not pool:
+                return None
+            return pool[reference["key"] % len(pool)]
+
+    def _add(self, kind: str, entity_id: Any):
+        if isinstance(entity_id, int) and entity_id not in self.ids[kind]:
+            self.ids[kind].append(entity_id)
+
+    def learn(self, method: str, payload: Any):
+        """Collect the ids a response mentions so later requests can be mapped onto them."""
+        if not isinstance(payload, dict):
+            return
+        with self._lock:
+            project = payload.get("project") or {}
+            if isinstance(project, dict):
+                self._add("project", project.get("id"))
+                for user in project.get("users") or []:
+                    self._add("user", user.get("id"))
+            issues = payload.get("issues") or project.get("issues") or []
+            for issue in [*issues, payload.get("issue")]:
+                if not isinstance(issue, dict):
+                    continue
+                if method == "DELETE":
+                    self._remove("issue", issue.get("id"))
+                    continue
+                self._add("issue", issue.get("id"))
+                for comment in issue.get("comments") or []:
+                    self._add("comment", comment.get("id"))
+            comment = payload.get("comment")
+            if isinstance(comment, dict):
+                if method == "DELETE":
+                    self._remove("comment", comment.get("id"))
+                else:
+                    self._add("comment", comment.get("id"))
+
+    def _remove(self, kind: str, entity_id: Any):
+        if entity_id in self.ids[kind]:
+            self.ids[kind].remove(entity_id)
+
+
+class _Unresolvable(Exception):
+    pass
+
+
+def _synthesize(value: Any, session: ReplaySession) -> Any:
+    if isinstance(value, dict):
+        if "$ref" in value:
+            resolved = session.resolve(value)
+            if resolved is None:
+                raise _Unresolvable(value["$ref"])
+            return resolved
+        if "$text" in value:
+            return ("lorem ipsum " * (value["$text"] // 12 + 1))[: value["$text"]]
+        return {name: _synthesize(item, session) for name, item in value.items()}
+    if isinstance(value, list):
+        return [_synthesize(item, session) for item in value]
+    return value
+
+
+def _build_request(entry: Dict[str, Any], session: ReplaySession) -> Tuple[str, Optional[bytes]]:
+    view_args = _synthesize(entry.get("viewArgs") or {}, session)
+    path = RULE_ARGUMENT_REGEX.sub(lambda match: str(view_args[match.group(1)]), entry["rule"])
+
+    query = {}
+    for name, value in _synthesize(entry.get("query") or {}, session).items():
+        query[name] = ",".join(str(item) for item in value) if isinstance(value, list) else value
+    if query:
+        path = f"{path}?{urlencode(query)}"
+
+    body = entry.get("body")
+    if body is None:
+        return path, None
+    if isinstance(body, dict) and "$bytes" in body:
+        raise _Unresolvable("body")
+    return path, json.dumps(_synthesize(body, session)).encode("utf-8")
+
+
+class ReplayClient:
+    """Keep-alive HTTP client with one connection per worker thread."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            )
+            connection = connection_class(self.netloc, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def send(
+        self, method: str, path: str, body: Optional[bytes] = None, token: Optional[str] = None
+    ) -> Tuple[int, Any]:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        connection = self._connection()
+        try:
+            connection.request(method, f"{self.prefix}{path}", body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+
+        try:
+            payload = json.loads(data) if data else None
+        except ValueError:
+            payload = None
+        return response.status, payload
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class ReplayReport:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.skipped: Dict[str, int] = defaultdict(int)
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, route: str, latency_ms: float, failed: bool):
+        with self._lock:
+            self.latencies[route].append(latency_ms)
+            if failed:
+                self.errors[route] += 1
+
+    def skip(self, route: str):
+        with self._lock:
+            self.skipped[route] += 1
+
+    def lag(self, seconds: float):
+        with self._lock:
+            self.max_lag = max(self.max_lag, seconds)
+
+    def rows(self, elapsed_seconds: float) -> List[Dict[str, Any]]:
+        rows = []
+        for route in sorted(set(self.latencies) | set(self.skipped)):
+            latencies = sorted(self.latencies.get(route, []))
+            rows.append(
+                {
+                    "route": route,
+                    "requests": len(latencies),
+                    "errors": self.errors.get(route, 0),
+                    "skipped": self.skipped.get(route, 0),
+                    "perSecond": len(latencies) / elapsed_seconds if elapsed_seconds else 0,
+                    "p50Ms": percentile(latencies, 0.5) if latencies else 0,
+                    "p95Ms": percentile(latencies, 0.95) if latencies else 0,
+                    "p99Ms": percentile(latencies, 0.99) if latencies else 0,
+                    "maxMs": latencies[-1] if latencies else 0,
+                }
+            )
+        return rows
+
+
+def _is_invalid_token(status: int, payload: Any) -> bool:
+    error = payload.get("error") if isinstance(payload, dict) else None
+    return status == 401 and isinstance(error, dict) and error.get("code") == "INVALID_TOKEN"
+
+
+def _open_sessions(
+    client: ReplayClient, session_keys: List[Optional[str]], concurrency: int
+) -> Dict[Optional[str], ReplaySession]:
+    def open_session(_key):
+        status, payload = client.send("POST", "/authentication/guest")
+        if status != 200:
+            raise click.ClickException(f"Could not create a guest account (HTTP {status}).")
+        session = ReplaySession(payload["authToken"], payload["refreshToken"])
+        session.learn("GET", client.send("GET", "/project", token=session.token)[1])
+        return session
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(zip(session_keys, executor.map(open_session, session_keys)))
+
+
+def replay_trace(
+    entries: List[Dict[str, Any]],
+    client: ReplayClient,
+    speed: float,
+    concurrency: int,
+) -> Tuple[ReplayReport, float]:
+    """Replay `entries` at `speed` times their recorded pace (0 replays as fast as possible)."""
+    entries.sort(key=lambda entry: entry["at"])
+    sessions = _open_sessions(
+        client, list(dict.fromkeys(entry.get("session") for entry in entries)), concurrency
+    )
+
+    report = ReplayReport()
+    slots = threading.BoundedSemaphore(concurrency)
+
+    def run(entry: Dict[str, Any], route: str):
+        session = sessions[entry.get("session")]
+        try:
+            path, body = _build_request(entry, session)
+        except (_Unresolvable, KeyError):
+            report.skip(route)
+            return
+
+        started = time.perf_counter()
+        try:
+            token = session.token
+            status, payload = client.send(entry["method"], path, body, token)
+            # Access tokens outlive few traces; renew like the client does and time the retry.
+            if _is_invalid_token(status, payload) and session.refresh(client, token):
+                started = time.perf_counter()
+                status, payload = client.send(entry["method"], path, body, session.token)
+        except (http.client.HTTPException, OSError):
+            report.add(route, (time.perf_counter() - started) * 1000, failed=True)
+            return
+        failed = status >= 500 or status in (401, 403)
+        report.add(route, (time.perf_counter() - started) * 1000, failed=failed)
+        if status < 300:
+            session.learn(entry["method"], payload)
+
+    def release(_future):
+        slots.release()
+
+    first_at = entries[0]["at"] if entries else 0
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for entry in entries:
+            if speed > 0:
+                due = (entry["at"] - first_at) / speed
+                delay = due - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    report.lag(-delay)
+
+            slots.acquire()
+            route = f"{entry['method']} {entry['rule']}"
+            executor.submit(run, entry, route).add_done_callback(release)
+
+    return report, time.monotonic() - started
+
+
+@click.command("replay-traffic")
+@click.argument("path")
+@click.option("--base-url", default="http://localhost:3000", show_default=True)
+@click.option("--speed", type=float, default=1.0, show_default=True, help="Multiple of the recorded pace; 0 means no pacing.")
+@click.option("--concurrency", type=int, default=8, show_default=True, help="Requests in flight at once.")
+@click.option("--limit", type=int, default=0, help="Replay only the first N recorded requests.")
+@click.option("--timeout", type=float, default=30.0, show_default=True, help="Per-request timeout in seconds.")
+def replay_traffic_command(path, base_url, speed, concurrency, limit, timeout):
+    """Replay a recorded traffic trace against a running API and report latency per route."""
+    entries = []
+    for entry in read_trace(path):
+        # Replayed sessions authenticate with their own guest accounts.
+        if entry["rule"].startswith("/authentication/"):
+            continue
+        entries.append(entry)
+        if limit and len(entries) >= limit:
+            break
+    if not entries:
+        raise click.ClickException(f"No recorded requests found at {path}.")
+
+    concurrency = max(1, concurrency)
+    report, elapsed = replay_trace(entries, ReplayClient(base_url, timeout), speed, concurrency)
+    rows = report.rows(elapsed)
+
+    click.echo(
+        f"{'route':<40} {'reqs':>6} {'err':>5} {'skip':>5} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+    for row in rows:
+        click.echo(
+            f"{row['route']:<40} {row['requests']:>6} {row['errors']:>5} {row['skipped']:>5} "
+            f"{row['perSecond']:>8.1f} {row['p50Ms']:>8.1f} {row['p95Ms']:>8.1f} "
+            f"{row['p99Ms']:>8.1f} {row['maxMs']:>8.1f}"
+        )
+
+    total = sum(row["requests"] for row in rows)
+    click.echo(
+        f"\n{total} requests in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} req/s), "
+        f"{len({entry.get('session') for entry in entries})} sessions, "
+        f"fell behind schedule by up to {report.max_lag:.2f}s"
+    )
+
+
+def register_traffic_recorder(app: Flask) -> Optional[TrafficRecorder]:
+    app.cli.add_command(replay_traffic_command)
+
+    path = os.getenv("TRAFFIC_RECORD_PATH", "")
+    if not path:
+        return None
+
+    salt = os.getenv("TRAFFIC_RECORD_SALT", "").encode("utf-8") or os.urandom(32)
+    recorder = TrafficRecorder(path, salt, float(os.getenv("TRAFFIC_RECORD_SAMPLE_RATE", "1")))
+
+    @app.before_request
+    def _start_recording_timer():
+        g.traffic_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("traffic_started", None)
+        if started is not None and not request.path.startswith(UNRECORDED_PATH_PREFIXES):
+            recorder.record(response, (time.perf_counter() - started) * 1000)
+        return response
+
+    return recorder
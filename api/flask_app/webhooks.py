@@ -0,0 +1,448 @@
+"""Issue and comment change events delivered to `WEBHOOK_URL` off the request path.
+
+Events are inserted into `webhook_outbox` by the same flush that makes the change, so they
+commit or roll back with it and a request never waits on the receiving system. A dispatcher
+thread in each worker claims due rows in batches (`FOR UPDATE SKIP LOCKED`, then leased for
+`WEBHOOK_LEASE_MS` so other workers skip them), posts them concurrently over keep-alive
+connections and deletes what was delivered. Consecutive updates of the same issue within a
+batch are merged into one delivery. A failed delivery is retried with exponential backoff
+until `WEBHOOK_MAX_ATTEMPTS`, and the rows are then kept with `failedAt` set; until then no
+later event for its issue is claimed, so each issue's events arrive in order. Delivery is
+at least once: receivers de-duplicate on `id`.
+"""
+import hmac
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .activity import current_actor_id, flush_change_events
+from .background import start_periodic_task
+from .extensions import db
+from .models import WebhookOutbox, utcnow
+
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+ISSUE_UPDATED = "issue.updated"
+# Key of the transaction-level advisory lock taken by dispatchers while claiming rows.
+CLAIM_LOCK_ID = 0x776562686F6F6B
+
+outbox = WebhookOutbox.__table__
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        "url": os.getenv("WEBHOOK_URL", ""),
+        "secret": os.getenv("WEBHOOK_SECRET", ""),
+        "batch_size": int(os.getenv("WEBHOOK_BATCH_SIZE", "100")),
+        "concurrency": int(os.getenv("WEBHOOK_CONCURRENCY", "8")),
+        "timeout_ms": int(os.getenv("WEBHOOK_TIMEOUT_MS", "5000")),
+        "lease_ms": int(os.getenv("WEBHOOK_LEASE_MS", "120000")),
+        "max_attempts": int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "10")),
+        "backoff_ms": int(os.getenv("WEBHOOK_BACKOFF_MS", "1000")),
+        "max_backoff_ms": int(os.getenv("WEBHOOK_MAX_BACKOFF_MS", "3600000")),
+        "interval_ms": int(os.getenv("WEBHOOK_POLL_INTERVAL_MS", "1000")),
+    }
+
+
+def _outbox_rows(events: List[Dict[str, Any]], actor_id: int) -> List[Dict[str, Any]]:
+    """One row per changed issue or comment; the changed fields are listed under `changes`."""
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    for change in events:
+        key = (change["entity"], change["action"], change["issueId"], change["commentId"])
+        row = rows.get(key)
+        if row is None:
+            event_type = f"{change['entity']}.{change['action']}"
+            row = rows[key] = {
+                "eventType": event_type,
+                "projectId": change["projectId"],
+                "issueId": change["issueId"],
+                "createdAt": change["createdAt"],
+                "nextAttemptAt": change["createdAt"],
+                "attempts": 0,
+                "payload": {
+                    "type": event_type,
+                    "occurredAt": change["createdAt"].isoformat(),
+                    "projectId": change["projectId"],
+                    "issueId": change["issueId"],
+                    "commentId": change["commentId"],
+                    "actorId": actor_id,
+                    "changes": {},
+                },
+            }
+
+        if change["field"] is not None:
+            row["payload"]["changes"][change["field"]] = {
+                "old": change["oldValue"],
+                "new": change["newValue"],
+            }
+        elif change["entity"] == "comment" and change["newValue"] is not None:
+            row["payload"]["changes"]["body"] = {"old": None, "new": change["newValue"]}
+    return list(rows.values())
+
+
+_enabled = False
+
+
+@event.listens_for(Session, "after_flush")
+def _write_outbox(session: Session, flush_context):
+    if not _enabled:
+        return
+
+    actor_id = current_actor_id()
+    if actor_id is None:
+        return
+
+    rows = _outbox_rows(flush_change_events(session, flush_context, actor_id), actor_id)
+    if rows:
+        # Core insert on the flush's connection: part of the same transaction, no new flush.
+        session.connection().execute(insert(outbox), rows)
+
+
+def coalesce(rows) -> List[List[Dict[str, Any]]]:
+    """Group claimed rows into per-issue delivery lists, in id order.
+
+    Consecutive `issue.updated` rows for an issue become one delivery whose changes run from
+    the first old value to the last new value; fields that end where they started are dropped.
+    """
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        group = groups.setdefault(row.issueId, [])
+        previous = group[-1] if group else None
+
+        if previous is not None and row.eventType == ISSUE_UPDATED and previous["type"] == ISSUE_UPDATED:
+            payload = previous["payload"]
+            for field, change in row.payload["changes"].items():
+                if field in payload["changes"]:
+                    payload["changes"][field]["new"] = change["new"]
+                else:
+                    payload["changes"][field] = change
+            payload["changes"] = {
+                field: change for field, change in payload["changes"].items() if change["old"] != change["new"]
+            }
+            payload.update(id=row.id, occurredAt=row.payload["occurredAt"], actorId=row.payload["actorId"])
+            previous["ids"].append(row.id)
+            previous["attempts"] = max(previous["attempts"], row.attempts + 1)
+            metrics.increment("webhooks.coalesced")
+            continue
+
+        group.append(
+            {
+                "ids": [row.id],
+                "type": row.eventType,
+                "attempts": row.attempts + 1,
+                "createdAt": row.createdAt,
+                "payload": {**row.payload, "id": row.id},
+            }
+        )
+    return list(groups.values())
+
+
+class WebhookClient:
+    """Keep-alive HTTP client with one connection per delivery thread."""
+
+    def __init__(self, url: str, timeout: float, secret: str = ""):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.timeout = timeout
+        self.secret = secret.encode("utf-8")
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            )
+            connection = connection_class(self.netloc, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def send(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Post one event; returns None when it was accepted, otherwise the error."""
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            headers[SIGNATURE_HEADER] = "sha256=" + hmac.new(self.secret, body, sha256).hexdigest()
+
+        connection = self._connection()
+        try:
+            connection.request("POST", self.path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError) as exc:
+            connection.close()
+            self._local.connection = None
+            return f"{type(exc).__name__}: {exc}"
+
+        if 200 <= response.status < 300:
+            return None
+        return f"HTTP {response.status}"
+
+
+def _age_ms(created_at: datetime, now: datetime) -> float:
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (now - created_at).total_seconds() * 1000
+
+
+class WebhookDispatcher:
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+        self.batch_size = max(1, settings["batch_size"])
+        self.client = WebhookClient(settings["url"], settings["timeout_ms"] / 1000, settings["secret"])
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, settings["concurrency"]), thread_name_prefix="webhook-delivery"
+        )
+
+    def _backoff(self, attempts: int) -> timedelta:
+        ceiling = min(self.settings["max_backoff_ms"], self.settings["backoff_ms"] * 2 ** (attempts - 1))
+        # Jittered, so deliveries that failed together don't all retry together.
+        return timedelta(milliseconds=random.uniform(ceiling / 2, ceiling))
+
+    def _claim(self):
+        now = utcnow()
+        if db.engine.dialect.name == "postgresql":
+            # Claims are serialized, so none can skip a row another one has locked but not yet
+            # leased and send that issue's later events first.
+            db.session.execute(select(func.pg_advisory_xact_lock(CLAIM_LOCK_ID)))
+
+        # An issue's events wait while an earlier one is leased or backing off after a failure.
+        earlier = outbox.alias("earlier")
+        waiting = (
+            select(earlier.c.id)
+            .where(
+                earlier.c.issueId == outbox.c.issueId,
+                earlier.c.id < outbox.c.id,
+                earlier.c.failedAt.is_(None),
+                earlier.c.nextAttemptAt > now,
+            )
+            .exists()
+        )
+        rows = db.session.execute(
+            select(
+                outbox.c.id,
+                outbox.c.eventType,
+                outbox.c.issueId,
+                outbox.c.payload,
+                outbox.c.attempts,
+                outbox.c.createdAt,
+            )
+            .where(outbox.c.failedAt.is_(None), outbox.c.nextAttemptAt <= now, ~waiting)
+            .order_by(outbox.c.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+        if rows:
+            db.session.execute(
+                update(outbox)
+                .where(outbox.c.id.in_([row.id for row in rows]))
+                .values(
+                    nextAttemptAt=now + timedelta(milliseconds=self.settings["lease_ms"]),
+                    attempts=outbox.c.attempts + 1,
+                )
+            )
+        db.session.commit()
+        return rows
+
+    def _deliver_group(self, group: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple]]:
+        delivered = []
+        for index, delivery in enumerate(group):
+            if delivery["type"] == ISSUE_UPDATED and not delivery["payload"]["changes"]:
+                delivered.append(delivery)
+                continue
+
+            error = self.client.send(delivery["payload"])
+            if error is not None:
+                # The issue's later events wait for this one, so receivers see them in order.
+                return delivered, [(pending, error) for pending in group[index:]]
+            delivered.append(delivery)
+            metrics.increment("webhooks.delivered")
+        return delivered, []
+
+    def _record(self, delivered: List[Dict[str, Any]], failed: List[Tuple]):
+        now = utcnow()
+        delivered_ids = [row_id for delivery in delivered for row_id in delivery["ids"]]
+        if delivered_ids:
+            db.session.execute(delete(outbox).where(outbox.c.id.in_(delivered_ids)))
+
+        retries, abandoned = [], []
+        for delivery, error in failed:
+            for row_id in delivery["ids"]:
+                if delivery["attempts"] >= self.settings["max_attempts"]:
+                    abandoned.append({"row_id": row_id, "last_error": error, "failed_at": now})
+                else:
+                    next_attempt_at = now + self._backoff(delivery["attempts"])
+                    retries.append({"row_id": row_id, "last_error": error, "next_attempt_at": next_attempt_at})
+
+        if retries:
+            db.session.execute(
+                update(outbox)
+                .where(outbox.c.id == bindparam("row_id"))
+                .values(nextAttemptAt=bindparam("next_attempt_at"), lastError=bindparam("last_error")),
+                retries,
+            )
+        if abandoned:
+            db.session.execute(
+                update(outbox)
+                .where(outbox.c.id == bindparam("row_id"))
+                .values(failedAt=bindparam("failed_at"), lastError=bindparam("last_error")),
+                abandoned,
+            )
+        db.session.commit()
+
+        metrics.increment("webhooks.retried", len(retries))
+        if abandoned:
+            metrics.increment("webhooks.abandoned", len(abandoned))
+            logging.warning("Gave up delivering %s webhook events", len(abandoned))
+        if delivered:
+            lag = max(_age_ms(delivery["createdAt"], now) for delivery in delivered)
+            metrics.set_gauge("webhooks.delivery_lag_ms", round(lag, 1))
+
+    def dispatch_batch(self) -> int:
+        """Claim, deliver and record one batch; returns the number of rows claimed."""
+        rows = self._claim()
+        if not rows:
+            return 0
+
+        delivered, failed = [], []
+        for group_delivered, group_failed in self._executor.map(self._deliver_group, coalesce(rows)):
+            delivered.extend(group_delivered)
+            failed.extend(group_failed)
+        self._record(delivered, failed)
+        return len(rows)
+
+    def dispatch(self) -> int:
+        """Deliver due events until a claim comes back short of a full batch."""
+        started = time.perf_counter()
+        claimed = 0
+        while True:
+            count = self.dispatch_batch()
+            claimed += count
+            if count < self.batch_size:
+                break
+
+        if claimed:
+            metrics.set_gauge("webhooks.rows_per_second", round(claimed / (time.perf_counter() - started), 1))
+        report_backlog()
+        return claimed
+
+
+def report_backlog():
+    pending, abandoned, oldest = db.session.execute(
+        select(
+            func.count().filter(outbox.c.failedAt.is_(None)),
+            func.count().filter(outbox.c.failedAt.is_not(None)),
+            func.min(outbox.c.createdAt).filter(outbox.c.failedAt.is_(None)),
+        )
+    ).one()
+    db.session.rollback()
+
+    metrics.set_gauge("webhooks.pending", pending)
+    metrics.set_gauge("webhooks.abandoned_rows", abandoned)
+    metrics.set_gauge("webhooks.oldest_pending_ms", round(_age_ms(oldest, utcnow()), 1) if oldest else 0)
+
+
+def requeue_abandoned() -> int:
+    result = db.session.execute(
+        update(outbox)
+        .where(outbox.c.failedAt.is_not(None))
+        .values(failedAt=None, attempts=0, nextAttemptAt=utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@click.command("dispatch-webhooks")
+@click.option("--retry-abandoned", is_flag=True, help="Re-queue events that ran out of attempts first.")
+@with_appcontext
+def dispatch_webhooks_command(retry_abandoned):
+    """Deliver every due webhook event once, outside the background dispatcher."""
+    settings = _settings()
+    if not settings["url"]:
+        raise click.ClickException("WEBHOOK_URL is not set.")
+
+    if retry_abandoned:
+        click.echo(f"Re-queued {requeue_abandoned()} abandoned events.")
+    click.echo(f"Claimed {WebhookDispatcher(settings).dispatch()} outbox rows.")
+
+
+@click.command("webhook-stub")
+@click.option("--port", type=int, default=9000, show_default=True)
+@click.option("--fail-rate", type=float, default=0.0, show_default=True, help="Fraction answered with 503.")
+@click.option("--latency-ms", type=int, default=0, show_default=True, help="Delay before each answer.")
+def webhook_stub_command(port, fail_rate, latency_ms):
+    """Run a local receiver that prints the webhook events it is sent."""
+    secret = os.getenv("WEBHOOK_SECRET", "").encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+
+            status = 204
+            if secret:
+                expected = "sha256=" + hmac.new(secret, body, sha256).hexdigest()
+                if not hmac.compare_digest(self.headers.get(SIGNATURE_HEADER, ""), expected):
+                    status = 401
+            if status == 204 and random.random() < fail_rate:
+                status = 503
+
+            payload = json.loads(body or b"{}")
+            click.echo(
+                f"{status} {payload.get('id')} {payload.get('type')} issue={payload.get('issueId')}"
+                f" changes={','.join(payload.get('changes') or {}) or '-'}"
+            )
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *_args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    click.echo(f"Listening on http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def register_webhooks(app: Flask) -> Optional[threading.Event]:
+    """Write outbox rows and run a dispatcher when `WEBHOOK_URL` is set."""
+    global _enabled
+
+    app.cli.add_command(dispatch_webhooks_command)
+    app.cli.add_command(webhook_stub_command)
+
+    settings = _settings()
+    _enabled = bool(settings["url"])
+    if not _enabled or settings["interval_ms"] <= 0:
+        return None
+
+    dispatcher = WebhookDispatcher(settings)
+    return start_periodic_task(app, "webhook-dispatcher", settings["interval_ms"] / 1000, dispatcher.dispatch)
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+# Set before the app reads them; background tasks that would race the tests stay off.
+os.environ.setdefault("JWT_SECRET", "test-secret-" + "0" * 32)
+os.environ.setdefault("NODE_ENV", "test")
+os.environ["REVOCATION_REFRESH_INTERVAL_MS"] = "0"
+os.environ["IDEMPOTENCY_CLEANUP_INTERVAL_MS"] = "0"
+os.environ.pop("WEBHOOK_URL", None)
+
+import flask_app  # noqa: E402
+from flask_app.extensions import db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(flask_app, "_build_database_uri", lambda: f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("ATTACHMENT_STORAGE_DIR", str(tmp_path / "attachments"))
+    app = flask_app.create_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class Guest:
+    """A signed-in guest and its seeded project, with helpers for authenticated requests."""
+
+    def __init__(self, client, tokens):
+        self.client = client
+        self.token = tokens["authToken"]
+        self.refresh_token = tokens["refreshToken"]
+        self.project = self.get("/project").json["project"]
+
+    def _headers(self, headers):
+        return {"Authorization": f"Bearer {self.token}", **(headers or {})}
+
+    def get(self, url, headers=None, **kwargs):
+        return self.client.get(url, headers=self._headers(headers), **kwargs)
+
+    def post(self, url, headers=None, **kwargs):
+        return self.client.post(url, headers=self._headers(headers), **kwargs)
+
+    def put(self, url, headers=None, **kwargs):
+        return self.client.put(url, headers=self._headers(headers), **kwargs)
+
+    def delete(self, url, headers=None, **kwargs):
+        return self.client.delete(url, headers=self._headers(headers), **kwargs)
+
+    def issue(self, status: str):
+        return next(issue for issue in self.project["issues"] if issue["status"] == status)
+
+
+@pytest.fixture
+def guest(client):
+    response = client.post("/authentication/guest")
+    assert response.status_code == 200, response.data
+    return Guest(client, response.json)
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from flask_app.analytics import DONE, STATUSES, IssueColumns, compute_analytics
+
+NOW = datetime(2026, 1, 10, 12, tzinfo=timezone.utc)
+
+
+def _at(month: int, day: int) -> float:
+    year = 2025 if month == 12 else 2026
+    return datetime(year, month, day, tzinfo=timezone.utc).timestamp()
+
+
+def _columns() -> IssueColumns:
+    # 1: done in the second week; 2: still open; 3: done in the first week.
+    backlog = STATUSES.index("backlog") + 1
+    columns = IssueColumns()
+    columns.id = np.array([1, 2, 3])
+    columns.createdAt = np.array([_at(12, 20), _at(1, 2), _at(1, 1)])
+    columns.updatedAt = np.array([_at(1, 8), _at(1, 9), _at(1, 3)])
+    columns.type = np.array([1, 1, 1])
+    columns.status = np.array([DONE, backlog, DONE])
+    columns.priority = np.array([1, 1, 1])
+    columns.estimate = np.array([5.0, 3.0, 2.0])
+    columns.timeSpent = np.array([6.0, np.nan, 2.0])
+    # Issue 1 is assigned to user 7, issue 3 to users 7 and 9; issue 2 to nobody.
+    columns.assigneeIssues = np.array([0, 2, 2])
+    columns.assigneeUsers = np.array([7, 7, 9])
+    return columns
+
+
+def test_project_throughput_and_burndown():
+    report = compute_analytics(_columns(), "project", 2, NOW)
+
+    assert report["weekEnds"] == ["2026-01-04T00:00:00+00:00", "2026-01-11T00:00:00+00:00"]
+    [group] = report["groups"]
+    assert (group["issues"], group["done"]) == (3, 2)
+    assert group["throughput"] == [1, 1]
+    assert group["velocity"] == [2.0, 5.0]
+    assert group["burndown"] == [8.0, 3.0]
+    assert group["estimateAccuracy"]["samples"] == 2
+    assert group["estimateAccuracy"]["medianRatio"] == 1.1
+
+
+def test_assignee_groups_include_unassigned_issues():
+    report = compute_analytics(_columns(), "assignee", 2, NOW)
+
+    groups = {group["key"]: group for group in report["groups"]}
+    assert list(groups) == [7, 9, None]
+    assert groups[7]["throughput"] == [1, 1]
+    assert groups[9]["throughput"] == [1, 0]
+    assert groups[None]["issues"] == 1
+    assert groups[None]["done"] == 0
+    assert groups[None]["burndown"] == [3.0, 3.0]
+
+
+def test_weeks_must_be_a_number_in_range(guest):
+    for weeks in ("0", "105", "abc", "²"):
+        response = guest.get("/project/analytics", query_string={"weeks": weeks})
+        assert response.status_code == 400
+        assert "weeks" in response.json["error"]["data"]["fields"]
+    assert guest.get("/project/analytics", query_string={"weeks": "4"}).status_code == 200
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from sqlalchemy import update
+
+from flask_app.archive import archive_done_issues
+from flask_app.extensions import db
+from flask_app.models import Issue, utcnow
+
+
+def test_archive_and_unarchive_round_trip(guest):
+    done = guest.issue("done")
+    before = guest.get(f"/issues/{done['id']}").json["issue"]
+
+    assert archive_done_issues(older_than=timedelta(0), batch_size=10) == 1
+    assert guest.get(f"/issues/{done['id']}").status_code == 404
+    archived = guest.get("/issues/archived").json["issues"]
+    assert [issue["id"] for issue in archived] == [done["id"]]
+
+    restored = guest.post(f"/issues/{done['id']}/unarchive")
+
+    assert restored.status_code == 200, restored.data
+    after = guest.get(f"/issues/{done['id']}").json["issue"]
+    assert after["title"] == before["title"]
+    assert after["userIds"] == before["userIds"]
+    assert [comment["id"] for comment in after["comments"]] == [
+        comment["id"] for comment in before["comments"]
+    ]
+    assert guest.get("/issues/archived").json["issues"] == []
+
+
+def test_unarchived_issue_is_not_archived_again_by_the_next_run(guest):
+    done = guest.issue("done")
+    db.session.execute(
+        update(Issue).where(Issue.id == done["id"]).values(updatedAt=utcnow() - timedelta(days=60))
+    )
+    db.session.commit()
+    assert archive_done_issues(older_than=timedelta(days=30), batch_size=10) == 1
+    guest.post(f"/issues/{done['id']}/unarchive")
+
+    assert archive_done_issues(older_than=timedelta(days=30), batch_size=10) == 0
+    assert guest.get(f"/issues/{done['id']}").status_code == 200
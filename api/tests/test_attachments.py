@@ -0,0 +1,41 @@
+import os
+
+
+def _blobs(storage_dir):
+    return [
+        name
+        for directory, _subdirectories, names in os.walk(storage_dir)
+        if os.path.basename(directory) != "tmp"
+        for name in names
+    ]
+
+
+def test_upload_dedup_and_range_download(guest, tmp_path):
+    issue_id = guest.issue("backlog")["id"]
+    content = b"0123456789" * 100
+
+    def upload(filename):
+        response = guest.post(
+            f"/issues/{issue_id}/attachments",
+            query_string={"filename": filename},
+            data=content,
+            headers={"Content-Type": "text/plain"},
+        )
+        assert response.status_code == 200, response.data
+        return response.json["attachment"]
+
+    first, second = upload("a.txt"), upload("b.txt")
+    assert first["id"] != second["id"] and first["size"] == len(content)
+    # Both rows point at one stored blob.
+    assert len(_blobs(tmp_path / "attachments")) == 1
+
+    full = guest.get(first["url"])
+    assert full.status_code == 200 and full.data == content
+    assert full.headers["X-Content-Type-Options"] == "nosniff"
+    cache_control = {directive.strip() for directive in full.headers["Cache-Control"].split(",")}
+    assert "private" in cache_control and "public" not in cache_control
+
+    partial = guest.get(first["url"], headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(content)}"
+    assert partial.data == content[10:20]
@@ -0,0 +1,33 @@
+from flask_app import revocation
+
+
+def test_refresh_issues_a_new_pair_and_revokes_the_old_refresh_token(guest, client):
+    refreshed = client.post("/authentication/refresh", json={"refreshToken": guest.refresh_token})
+
+    assert refreshed.status_code == 200, refreshed.data
+    assert refreshed.json["refreshToken"] != guest.refresh_token
+    headers = {"Authorization": f"Bearer {refreshed.json['authToken']}"}
+    assert client.get("/currentUser", headers=headers).status_code == 200
+
+    replayed = client.post("/authentication/refresh", json={"refreshToken": guest.refresh_token})
+    assert replayed.status_code == 401
+
+
+def test_logout_revokes_the_access_token(guest):
+    assert guest.post("/authentication/logout", json={"refreshToken": guest.refresh_token}).status_code == 200
+
+    assert guest.get("/currentUser").status_code == 401
+    assert guest.client.post(
+        "/authentication/refresh", json={"refreshToken": guest.refresh_token}
+    ).status_code == 401
+
+
+def test_replayed_refresh_token_is_rejected_on_a_worker_whose_filter_is_behind(guest, client, monkeypatch):
+    monkeypatch.setattr(revocation, "_filter", revocation.RevocationFilter(1000, 0.001))
+    assert client.post("/authentication/refresh", json={"refreshToken": guest.refresh_token}).status_code == 200
+
+    # Another worker, whose filter has not picked the revocation up yet.
+    monkeypatch.setattr(revocation, "_filter", revocation.RevocationFilter(1000, 0.001))
+    replayed = client.post("/authentication/refresh", json={"refreshToken": guest.refresh_token})
+
+    assert replayed.status_code == 401
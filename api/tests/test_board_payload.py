@@ -0,0 +1,12 @@
+import json
+
+import pytest
+
+from flask_app.board_payload import NON_ASCII_REGEX, _escape_non_ascii
+
+
+@pytest.mark.parametrize("value", ["plain", "del\x7f", "café", "emoji 😀"])
+def test_escaping_matches_ensure_ascii(value):
+    # Postgres to_json leaves these characters as they are; the builder escapes them afterwards.
+    raw = f'"{value}"'
+    assert NON_ASCII_REGEX.sub(_escape_non_ascii, raw) == json.dumps(value)
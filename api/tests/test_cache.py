@@ -0,0 +1,41 @@
+import os
+
+from flask_app import cache
+from flask_app.cache import FileCacheStore, PayloadCache
+
+
+def _body(value):
+    return lambda: value
+
+
+def test_cache_is_off_without_a_shared_directory(monkeypatch):
+    monkeypatch.delenv("PAYLOAD_CACHE_SHARED_DIR", raising=False)
+    monkeypatch.setattr(cache, "_cache", None)
+
+    assert cache.configure_payload_cache() is None
+
+
+def test_commit_in_one_worker_invalidates_every_worker_and_variant(tmp_path):
+    first = PayloadCache(1024, FileCacheStore(str(tmp_path)))
+    second = PayloadCache(1024, FileCacheStore(str(tmp_path)))
+    first.get_or_load("project", 1, _body(b"board v1"))
+    second.get_or_load("project", 1, _body(b"board v1"))
+    second.get_or_load("project", 1, _body(b"stats v1"), variant="analytics")
+
+    first.invalidate("project", 1)
+
+    assert second.get_or_load("project", 1, _body(b"board v2")) == b"board v2"
+    assert second.get_or_load("project", 1, _body(b"stats v2"), variant="analytics") == b"stats v2"
+    assert first.get_or_load("project", 1, _body(b"board v3")) == b"board v2"
+
+
+def test_invalidate_drops_stored_variants(tmp_path):
+    store = FileCacheStore(str(tmp_path))
+    payloads = PayloadCache(1024, store)
+    payloads.get_or_load("issue", 1, _body(b"issue"), variant="project:1")
+    payloads.get_or_load("issue", 1, _body(b"issue"), variant="project:2")
+
+    payloads.invalidate("issue", 1)
+
+    assert payloads.local.size == 0
+    assert not os.path.exists(store._group_path("issue:1"))
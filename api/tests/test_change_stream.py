@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from flask_app.change_stream import HEARTBEAT, Subscription, ThreadSubscription
+
+
+def test_subscription_without_a_queue_cannot_be_created():
+    class Incomplete(Subscription):
+        def offer(self, payload):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(1, 10)
+
+
+def test_overflowed_subscription_sends_one_reset_then_resumes():
+    subscription = ThreadSubscription(project_id=7, max_pending=2)
+    for index in range(3):
+        subscription.offer(json.dumps({"n": index}))
+
+    reset = subscription.event_for(subscription.get(timeout=0))
+
+    assert reset.startswith(b"event: reset\n")
+    assert subscription.get(timeout=0) is None
+    assert subscription.event_for(None) == HEARTBEAT
+    subscription.offer('{"n":3}')
+    assert subscription.event_for(subscription.get(timeout=0)) == b'event: change\ndata: {"n":3}\n\n'
@@ -0,0 +1,24 @@
+from flask_app.guest_pool import claim_guest_account, get_guest_pool_size, refill_guest_pool
+from flask_app.models import GuestAccount
+
+
+def test_refill_then_claim_hands_out_each_account_once(app):
+    assert refill_guest_pool(target_size=3, batch_size=2) == 3
+    assert refill_guest_pool(target_size=3, batch_size=2) == 0
+
+    claimed = [claim_guest_account() for _ in range(3)]
+
+    assert len(set(claimed)) == 3
+    assert get_guest_pool_size() == 0
+    assert claim_guest_account() is None
+
+
+def test_sign_in_claims_from_the_pool(app, client):
+    refill_guest_pool(target_size=1, batch_size=1)
+    pooled_user_id = GuestAccount.query.one().userId
+
+    token = client.post("/authentication/guest").json["authToken"]
+    current_user = client.get("/currentUser", headers={"Authorization": f"Bearer {token}"}).json
+
+    assert current_user["currentUser"]["id"] == pooled_user_id
+    assert get_guest_pool_size() == 0
@@ -0,0 +1,70 @@
+import json
+from datetime import timedelta
+from hashlib import sha256
+
+from flask_app.extensions import db
+from flask_app.models import IdempotencyKey, utcnow
+
+
+def _new_issue(guest, title):
+    reporter_id = guest.project["users"][0]["id"]
+    return {
+        "title": title,
+        "type": "task",
+        "status": "backlog",
+        "priority": "3",
+        "reporterId": reporter_id,
+        "projectId": guest.project["id"],
+        "userIds": [reporter_id],
+    }
+
+
+def test_retry_with_same_key_replays_the_first_response(guest):
+    headers = {"Idempotency-Key": "create-1"}
+
+    first = guest.post("/issues", json=_new_issue(guest, "once"), headers=headers)
+    retry = guest.post("/issues", json=_new_issue(guest, "once"), headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json == first.json
+    titles = [issue["title"] for issue in guest.get("/issues").json["issues"]]
+    assert titles.count("once") == 1
+
+
+def test_reusing_a_key_for_another_body_is_rejected(guest):
+    headers = {"Idempotency-Key": "create-2"}
+    guest.post("/issues", json=_new_issue(guest, "first"), headers=headers)
+
+    response = guest.post("/issues", json=_new_issue(guest, "second"), headers=headers)
+
+    assert response.status_code == 422
+
+
+def _reserve(guest, key, body, locked_for):
+    # The row a request leaves behind when its worker dies before storing a response.
+    user_id = guest.get("/currentUser").json["currentUser"]["id"]
+    fingerprint = sha256(b"POST /issues\n" + body).hexdigest()
+    db.session.add(IdempotencyKey(userId=user_id, key=key, fingerprint=fingerprint, lockedUntil=utcnow() + locked_for))
+    db.session.commit()
+
+
+def test_retry_takes_over_a_key_whose_lease_expired(guest):
+    body = json.dumps(_new_issue(guest, "orphaned")).encode()
+    _reserve(guest, "create-3", body, timedelta(minutes=-1))
+
+    response = guest.post("/issues", data=body, content_type="application/json", headers={"Idempotency-Key": "create-3"})
+
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+    replay = guest.post("/issues", data=body, content_type="application/json", headers={"Idempotency-Key": "create-3"})
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+def test_key_within_its_lease_is_in_progress(guest):
+    body = json.dumps(_new_issue(guest, "running")).encode()
+    _reserve(guest, "create-4", body, timedelta(minutes=5))
+
+    response = guest.post("/issues", data=body, content_type="application/json", headers={"Idempotency-Key": "create-4"})
+
+    assert response.status_code == 409
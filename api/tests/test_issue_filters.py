@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+import pytest
+
+from flask_app.issue_filters import parse_issue_filter
+from flask_app.models import utcnow
+
+
+def test_clauses_are_parsed_into_bound_parameters():
+    issue_filter, errors = parse_issue_filter("status:selected,backlog type:bug assignee:me,12 updated:2h", 7)
+
+    assert errors == {}
+    assert issue_filter.params["status"] == ["backlog", "selected"]
+    assert issue_filter.params["type"] == ["bug"]
+    assert issue_filter.params["assignee"] == [7, 12]
+    assert abs(utcnow() - timedelta(hours=2) - issue_filter.params["updated"]) < timedelta(seconds=5)
+    assert issue_filter.shape == {"status", "type", "assignee", "updated"}
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "status",
+        "color:red",
+        "status:nope",
+        "assignee:bob",
+        "assignee:²",
+        "assignee:99999999999",
+        "updated:7w",
+        "updated:²d",
+        "updated:3651d",
+        "updated:800000d",
+        "updated:99999999999d",
+    ],
+)
+def test_invalid_filters_are_reported(value):
+    _issue_filter, errors = parse_issue_filter(value, 1)
+    assert set(errors) == {"filter"}
+
+
+def test_route_answers_invalid_filters_with_400(guest):
+    response = guest.get("/issues", query_string={"filter": "updated:800000d"})
+    assert response.status_code == 400
+    assert "filter" in response.json["error"]["data"]["fields"]
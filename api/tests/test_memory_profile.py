@@ -0,0 +1,18 @@
+from flask_app.memory_profile import PROFILE_HEADER, _should_profile
+
+
+def test_admin_token_header_selects_the_request(app, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+    for header, expected in [("secret", True), ("wrong", False), ("sécret", False), (None, False)]:
+        headers = {PROFILE_HEADER: header} if header is not None else {}
+        with app.test_request_context("/", headers=headers):
+            assert _should_profile(0) is expected
+
+
+def test_admin_routes_answer_404_for_wrong_tokens(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+    for token in ("wrong", "sécret"):
+        assert client.get("/admin/memory-profiles", headers={"X-Admin-Token": token}).status_code == 404
+    assert client.get("/admin/memory-profiles", headers={"X-Admin-Token": "secret"}).status_code == 200
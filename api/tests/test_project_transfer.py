@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+ISSUE = {"record": "issue", "title": "Imported", "type": "task", "status": "backlog", "priority": "3", "reporterId": 1}
+
+
+def _import(guest, records, import_format="ndjson"):
+    if import_format == "ndjson":
+        data = "\n".join(json.dumps(record) for record in records)
+    else:
+        data = records
+    return guest.post("/project/import", query_string={"format": import_format}, data=data)
+
+
+def test_import_keeps_a_zero_list_position(guest):
+    response = _import(guest, [{**ISSUE, "id": 1, "listPosition": 0.0}, {"record": "comment", "issueId": 1, "body": "Hi"}])
+    assert response.status_code == 200, response.data
+    assert response.json["imported"] == {"issues": 1, "comments": 1}
+
+    [issue] = [issue for issue in guest.get("/project").json["project"]["issues"] if issue["title"] == "Imported"]
+    assert issue["listPosition"] == 0.0
+
+
+@pytest.mark.parametrize(
+    "records, field",
+    [
+        ([{**ISSUE, "id": [1]}], "id"),
+        ([{**ISSUE, "id": {"a": 1}}], "id"),
+        ([{**ISSUE, "id": 1}, {"record": "comment", "issueId": [1], "body": "Hi"}], "issueId"),
+        ([{**ISSUE, "id": 1}, {"record": "comment", "issueId": {"id": 1}, "body": "Hi"}], "issueId"),
+    ],
+)
+def test_ndjson_ids_that_are_not_numbers_are_rejected(guest, records, field):
+    response = _import(guest, records)
+    assert response.status_code == 400
+    assert response.json["error"]["data"]["record"] == len(records)
+    assert response.json["error"]["data"]["fields"][field] == "Must be a number"
+
+
+def test_csv_ids_that_are_not_numbers_are_rejected(guest):
+    csv = "record,id,title,type,status,priority,reporterId\nissue,²,Imported,task,backlog,3,1\n"
+    response = _import(guest, csv, "csv")
+    assert response.status_code == 400
+    assert response.json["error"]["data"]["fields"]["id"] == "Must be a number"
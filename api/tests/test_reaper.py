@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from flask_app.extensions import db
+from flask_app.models import Comment, GuestAccount, Issue, Project, User, utcnow
+from flask_app.reaper import reap_expired_guest_projects
+from flask_app.seeds import create_guest_accounts
+
+
+def test_reaps_only_expired_guest_projects(app):
+    [expired] = create_guest_accounts(1, claimed_at=utcnow() - timedelta(days=30))
+    [recent] = create_guest_accounts(1, claimed_at=utcnow())
+    expired_project_id, recent_project_id = expired.projectId, recent.projectId
+
+    result = reap_expired_guest_projects(ttl=timedelta(days=7), batch_size=10)
+
+    assert result.projects == 1
+    assert db.session.get(Project, expired_project_id) is None
+    assert User.query.filter_by(projectId=expired_project_id).count() == 0
+    assert Issue.query.filter_by(projectId=expired_project_id).count() == 0
+    assert GuestAccount.query.filter_by(projectId=expired_project_id).count() == 0
+
+    assert db.session.get(Project, recent_project_id) is not None
+    assert Comment.query.join(Issue).filter(Issue.projectId == recent_project_id).count() == 3
+
+
+def test_guest_added_to_another_project_keeps_their_work_there(app):
+    [expired] = create_guest_accounts(1, claimed_at=utcnow() - timedelta(days=30))
+    [other] = create_guest_accounts(1, claimed_at=utcnow())
+    expired_project_id, expired_user_id = expired.projectId, expired.id
+
+    other_project = db.session.get(Project, other.projectId)
+    other_issue = other_project.issues[0]
+    other_project.members.append(expired)
+    other_issue.users.append(expired)
+    db.session.add(Comment(body="still here", issue=other_issue, user=expired))
+    db.session.commit()
+    other_issue_id = other_issue.id
+
+    reap_expired_guest_projects(ttl=timedelta(days=7), batch_size=10)
+
+    assert db.session.get(Project, expired_project_id) is None
+    kept = db.session.get(User, expired_user_id)
+    assert kept is not None and kept.projectId is None
+    assert [project.id for project in kept.projects] == [other.projectId]
+    assert expired_user_id in [user.id for user in db.session.get(Issue, other_issue_id).users]
+    assert Comment.query.filter_by(userId=expired_user_id, issueId=other_issue_id).count() == 1
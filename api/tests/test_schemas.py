@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from flask_app.schemas import ISSUE_SCHEMA
+from flask_app.serializers import serialize_activity
+
+
+def test_full_load_coerces_values_and_reports_each_invalid_field():
+    values, errors = ISSUE_SCHEMA.load(
+        {"title": "", "type": "bug", "status": "done", "priority": 3, "estimate": "5", "reporterId": "1"}
+    )
+
+    assert errors == {
+        "title": "This field is required",
+        "projectId": "This field is required",
+    }
+    assert values["priority"] == "3"
+    assert values["estimate"] == 5
+    assert values["reporterId"] == 1
+    assert values["description"] is None
+    assert "id" not in values and "createdAt" not in values
+
+
+def test_partial_load_only_reads_sent_fields():
+    values, errors = ISSUE_SCHEMA.load({"status": "nope", "projectId": None, "estimate": "x"}, partial=True)
+
+    assert values == {}
+    assert errors == {
+        "status": "Must be one of: backlog, done, inprogress, selected",
+        "estimate": "Must be a number",
+    }
+
+
+def test_serializer_formats_dates_and_adds_computed_fields():
+    activity = SimpleNamespace(
+        id=1,
+        entity="issue",
+        action="updated",
+        field="status",
+        oldValue="backlog",
+        newValue="done",
+        createdAt=datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        projectId=2,
+        issueId=3,
+        commentId=None,
+        userId=4,
+    )
+
+    assert serialize_activity(activity) == {
+        "id": 1,
+        "entity": "issue",
+        "action": "updated",
+        "field": "status",
+        "oldValue": "backlog",
+        "newValue": "done",
+        "createdAt": "2024-05-01T12:30:00+00:00",
+        "projectId": 2,
+        "issueId": 3,
+        "commentId": None,
+        "userId": 4,
+    }
+    serialize_title = ISSUE_SCHEMA.serializer("id", "title", url=lambda issue: f"/issues/{issue.id}")
+    assert serialize_title(SimpleNamespace(id=5, title="t")) == {"id": 5, "title": "t", "url": "/issues/5"}
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from flask_app.slow_queries import _explain, attach_slow_query_log
+
+
+def test_failed_statements_do_not_leave_timers_behind():
+    engine = create_engine("sqlite://")
+    attach_slow_query_log(engine, threshold_ms=60_000, capture_explain=False)
+
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing_table"))
+        connection.execute(text("SELECT 1"))
+
+        assert connection.info["slow_query_started"] == []
+
+
+def test_failed_explain_leaves_the_transaction_usable():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+        connection.execute(text("INSERT INTO item (id) VALUES (1)"))
+        cursor = connection.connection.cursor()
+
+        # SQLite has no EXPLAIN (ANALYZE ...), so this fails like a bad plan on Postgres.
+        assert "error" in _explain(cursor, "SELECT id FROM item", ())
+
+        connection.execute(text("INSERT INTO item (id) VALUES (2)"))
+        assert connection.execute(text("SELECT count(*) FROM item")).scalar() == 2
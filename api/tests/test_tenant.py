@@ -0,0 +1,50 @@
+from flask_app.extensions import db
+from flask_app.models import Project, User
+
+
+def test_my_issues_only_lists_the_selected_project(client, guest):
+    other = client.post("/authentication/guest").json
+    other_project_id = client.get(
+        "/project", headers={"Authorization": f"Bearer {other['authToken']}"}
+    ).json["project"]["id"]
+
+    me = db.session.get(User, guest.get("/currentUser").json["currentUser"]["id"])
+    other_project = db.session.get(Project, other_project_id)
+    other_project.members.append(me)
+    other_project.issues[0].users.append(me)
+    db.session.commit()
+    other_issue_id = other_project.issues[0].id
+
+    own = guest.get("/users/me/issues").json["issues"]
+    selected = guest.get("/users/me/issues", headers={"X-Project-Id": str(other_project_id)}).json["issues"]
+
+    own_project_issue_ids = {issue["id"] for issue in guest.project["issues"]}
+    assert own and {issue["id"] for issue in own} <= own_project_issue_ids
+    assert [issue["id"] for issue in selected] == [other_issue_id]
+
+
+def test_only_users_sharing_a_project_can_be_added_as_members(client, guest):
+    other = client.post("/authentication/guest").json
+    other_headers = {"Authorization": f"Bearer {other['authToken']}"}
+    other_user_id = client.get("/currentUser", headers=other_headers).json["currentUser"]["id"]
+
+    response = guest.post("/project/members", json={"userId": other_user_id})
+    assert response.status_code == 404
+    assert "users" not in response.json
+
+    # Once they share a project, the caller may bring them into their own.
+    me = db.session.get(User, guest.get("/currentUser").json["currentUser"]["id"])
+    other_project = db.session.get(User, other_user_id).project
+    other_project.members.append(me)
+    db.session.commit()
+
+    response = guest.post("/project/members", json={"userId": other_user_id})
+    assert response.status_code == 200
+    assert other_user_id in {user["id"] for user in response.json["users"]}
+
+
+def test_project_header_must_be_a_number(guest):
+    for header in ("abc", "²"):
+        response = guest.get("/project", headers={"X-Project-Id": header})
+        assert response.status_code == 400
+        assert response.json["error"]["data"]["fields"] == {"X-Project-Id": "Must be a number"}
@@ -0,0 +1,51 @@
+import pytest
+
+from flask_app.traffic import ReplayClient, body_shape, replay_trace
+
+
+class FlaskReplayClient(ReplayClient):
+    """Sends replayed requests through the test client; revokes the first token it replays with."""
+
+    def __init__(self, client):
+        self.client = client
+        self.statuses = []
+        self.revoked = False
+
+    def send(self, method, path, body=None, token=None):
+        if path == "/currentUser" and not self.revoked:
+            self.revoked = True
+            self.send("POST", "/authentication/logout", token=token)
+
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        response = self.client.open(path, method=method, data=body, headers=headers)
+        self.statuses.append((path, response.status_code))
+        return response.status_code, response.get_json(silent=True)
+
+
+def test_replay_refreshes_rejected_access_tokens(client):
+    replay_client = FlaskReplayClient(client)
+    entries = [{"at": 0, "method": "GET", "rule": "/currentUser", "session": "a"}]
+
+    report, _elapsed = replay_trace(entries, replay_client, speed=0, concurrency=1)
+
+    replayed = [status for path, status in replay_client.statuses if path == "/currentUser"]
+    assert replayed == [401, 200]
+    assert len(report.latencies["GET /currentUser"]) == 1
+    assert report.errors.get("GET /currentUser", 0) == 0
+
+
+@pytest.mark.parametrize(
+    "view_args, kind",
+    [
+        ({"issue_id": 5}, "issue"),
+        ({"comment_id": 5}, "comment"),
+        ({"attachment_id": 5}, "attachment"),
+        ({"user_id": 5}, "user"),
+    ],
+)
+def test_view_arg_ids_are_recorded_as_references(view_args, kind):
+    [shape] = body_shape(view_args, b"salt").values()
+    assert shape["$ref"] == kind
+    assert set(shape) == {"$ref", "key"}
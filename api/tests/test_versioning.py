@@ -0,0 +1,51 @@
+from sqlalchemy import update
+
+from flask_app import metrics
+from flask_app.extensions import db
+from flask_app.models import Issue
+
+
+def test_stale_if_match_returns_409_with_the_current_state(guest):
+    issue = guest.issue("backlog")
+    url = f"/issues/{issue['id']}"
+
+    first = guest.put(url, json={"title": "First"}, headers={"If-Match": f'"{issue["version"]}"'})
+    assert first.status_code == 200
+
+    stale = guest.put(url, json={"title": "Second"}, headers={"If-Match": f'"{issue["version"]}"'})
+    assert stale.status_code == 409
+    assert stale.json["error"]["code"] == "VERSION_CONFLICT"
+    current = stale.json["error"]["data"]["current"]
+    assert current["title"] == "First"
+    assert current["version"] == issue["version"] + 1
+
+
+def test_invalid_if_match_is_rejected(guest):
+    url = f"/issues/{guest.issue('backlog')['id']}"
+    for value in ('"abc"', '"²"'):
+        response = guest.put(url, json={"title": "Changed"}, headers={"If-Match": value})
+        assert response.status_code == 400
+        assert response.json["error"]["data"]["fields"] == {"If-Match": "Must be a version number"}
+
+
+def test_blind_write_is_reapplied_after_a_concurrent_commit(guest, monkeypatch):
+    issue = guest.issue("backlog")
+    commit = db.session.commit
+
+    def commit_after_someone_else():
+        # Another writer commits between this request's read and its write.
+        monkeypatch.setattr(db.session, "commit", commit)
+        with db.engine.begin() as connection:
+            connection.execute(update(Issue).where(Issue.id == issue["id"]).values(version=Issue.version + 1))
+        commit()
+
+    monkeypatch.setattr(db.session, "commit", commit_after_someone_else)
+    retries = metrics.snapshot()["counters"].get("version_retries", 0)
+
+    response = guest.put(f"/issues/{issue['id']}", json={"title": "Blind"})
+
+    assert response.status_code == 200
+    assert metrics.snapshot()["counters"]["version_retries"] == retries + 1
+    stored = guest.get(f"/issues/{issue['id']}").json["issue"]
+    assert stored["title"] == "Blind"
+    assert stored["version"] == issue["version"] + 2
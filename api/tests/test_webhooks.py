@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+
+from flask_app.extensions import db
+from flask_app.models import utcnow
+from flask_app.webhooks import WebhookDispatcher, _settings, coalesce, outbox
+
+
+def _row(row_id, issue_id, event_type, changes):
+    return SimpleNamespace(
+        id=row_id,
+        issueId=issue_id,
+        eventType=event_type,
+        attempts=0,
+        createdAt=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        payload={"type": event_type, "occurredAt": f"t{row_id}", "actorId": 1, "changes": changes},
+    )
+
+
+def test_consecutive_updates_of_an_issue_are_merged_in_order():
+    groups = coalesce(
+        [
+            _row(1, 10, "issue.created", {}),
+            _row(2, 10, "issue.updated", {"status": {"old": "backlog", "new": "selected"}}),
+            _row(3, 20, "issue.updated", {"title": {"old": "a", "new": "b"}}),
+            _row(4, 10, "issue.updated", {"status": {"old": "selected", "new": "done"}}),
+            _row(5, 10, "issue.updated", {"title": {"old": "x", "new": "y"}}),
+            _row(6, 10, "issue.updated", {"title": {"old": "y", "new": "x"}}),
+        ]
+    )
+
+    first, second = groups
+    assert [delivery["ids"] for delivery in first] == [[1], [2, 4, 5, 6]]
+    assert first[1]["payload"]["id"] == 6
+    assert first[1]["payload"]["changes"] == {"status": {"old": "backlog", "new": "done"}}
+    assert [delivery["ids"] for delivery in second] == [[3]]
+
+
+def test_events_wait_for_an_earlier_event_of_their_issue_that_is_backing_off(app):
+    now = utcnow()
+
+    def event(issue_id, next_attempt_at):
+        return {
+            "eventType": "issue.updated",
+            "payload": {"type": "issue.updated", "issueId": issue_id, "changes": {}},
+            "projectId": 1,
+            "issueId": issue_id,
+            "createdAt": now,
+            "nextAttemptAt": next_attempt_at,
+        }
+
+    db.session.execute(
+        insert(outbox),
+        [
+            event(10, now + timedelta(minutes=5)),
+            event(10, now - timedelta(seconds=1)),
+            event(20, now - timedelta(seconds=1)),
+        ],
+    )
+    db.session.commit()
+    dispatcher = WebhookDispatcher({**_settings(), "url": "http://127.0.0.1:9/"})
+
+    claimed = dispatcher._claim()
+
+    assert [row.issueId for row in claimed] == [20]
@@ -4,7 +4,7 @@ import 'regenerator-runtime/runtime';
 import '@4tw/cypress-drag-drop';
 
 import { objectToQueryString } from 'shared/utils/url';
-import { getStoredAuthToken, storeAuthToken } from 'shared/utils/authToken';
+import { getStoredAuthToken, storeAuthToken, storeRefreshToken } from 'shared/utils/authToken';
 
 import { testid } from './utils';
 
@@ -71,5 +71,6 @@ Cypress.Commands.add('resetDatabase', () => {
 Cypress.Commands.add('createTestAccount', () => {
   cy.apiRequest('POST', '/test/create-account').then(response => {
     storeAuthToken(response.body.authToken);
+    storeRefreshToken(response.body.refreshToken);
   });
 });
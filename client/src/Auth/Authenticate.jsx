@@ -3,7 +3,7 @@ import { useHistory } from 'react-router-dom';
 
 import api from 'shared/utils/api';
 import toast from 'shared/utils/toast';
-import { getStoredAuthToken, storeAuthToken } from 'shared/utils/authToken';
+import { getStoredAuthToken, storeAuthToken, storeRefreshToken } from 'shared/utils/authToken';
 import { PageLoader } from 'shared/components';
 
 const Authenticate = () => {
@@ -12,8 +12,9 @@ const Authenticate = () => {
   useEffect(() => {
     const createGuestAccount = async () => {
       try {
-        const { authToken } = await api.post('/authentication/guest');
+        const { authToken, refreshToken } = await api.post('/authentication/guest');
         storeAuthToken(authToken);
+        storeRefreshToken(refreshToken);
         history.push('/');
       } catch (error) {
         toast.error(error);
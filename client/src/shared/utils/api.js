@@ -3,7 +3,14 @@ import axios from 'axios';
 import history from 'browserHistory';
 import toast from 'shared/utils/toast';
 import { objectToQueryString } from 'shared/utils/url';
-import { getStoredAuthToken, removeStoredAuthToken } from 'shared/utils/authToken';
+import {
+  getStoredAuthToken,
+  storeAuthToken,
+  removeStoredAuthToken,
+  getStoredRefreshToken,
+  storeRefreshToken,
+  removeStoredRefreshToken,
+} from 'shared/utils/authToken';
 
 const defaults = {
   baseURL: process.env.API_URL || 'http://localhost:3000',
@@ -19,7 +26,31 @@ const defaults = {
   },
 };
 
-const api = (method, url, variables) =>
+let pendingRefresh = null;
+
+// Concurrent requests that hit an expired access token share one refresh.
+const refreshAuthToken = () => {
+  if (!pendingRefresh) {
+    pendingRefresh = axios
+      .post(`${defaults.baseURL}/authentication/refresh`, { refreshToken: getStoredRefreshToken() })
+      .then(response => {
+        storeAuthToken(response.data.authToken);
+        storeRefreshToken(response.data.refreshToken);
+      })
+      .finally(() => {
+        pendingRefresh = null;
+      });
+  }
+  return pendingRefresh;
+};
+
+const signOut = () => {
+  removeStoredAuthToken();
+  removeStoredRefreshToken();
+  history.push('/authenticate');
+};
+
+const api = (method, url, variables, { isRetry = false } = {}) =>
   new Promise((resolve, reject) => {
     axios({
       url: `${defaults.baseURL}${url}`,
@@ -35,8 +66,14 @@ const api = (method, url, variables) =>
       error => {
         if (error.response) {
           if (error.response.data.error.code === 'INVALID_TOKEN') {
-            removeStoredAuthToken();
-            history.push('/authenticate');
+            if (!isRetry && getStoredRefreshToken()) {
+              refreshAuthToken().then(
+                () => api(method, url, variables, { isRetry: true }).then(resolve, reject),
+                signOut,
+              );
+            } else {
+              signOut();
+            }
           } else {
             reject(error.response.data.error);
           }
@@ -3,3 +3,9 @@ export const getStoredAuthToken = () => localStorage.getItem('authToken');
 export const storeAuthToken = token => localStorage.setItem('authToken', token);
 
 export const removeStoredAuthToken = () => localStorage.removeItem('authToken');
+
+export const getStoredRefreshToken = () => localStorage.getItem('refreshToken');
+
+export const storeRefreshToken = token => localStorage.setItem('refreshToken', token);
+
+export const removeStoredRefreshToken = () => localStorage.removeItem('refreshToken');